@@ -0,0 +1,9 @@
+import os
+import sys
+
+# The application imports its modules as top-level packages (rag_app, api), see src/api/routes.py
+sys.path.append(os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "src"))
+
+# The benchmarks run offline with fake providers: the credentials required by PrivateSettings are never used
+for _name in ("DATABASE_URL", "OCI_API_KEY", "COHERE_API_KEY"):
+    os.environ.setdefault(_name, "unused")
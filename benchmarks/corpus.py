@@ -0,0 +1,69 @@
+"""
+Synthetic corpus for FileStorage: one folder per domain with .txt documents.
+
+    python -m benchmarks.corpus /tmp/corpus --domains 10 --docs-per-domain 100 --doc-chars 8000
+"""
+import argparse
+import json
+import math
+import os
+import random
+from typing import Dict, List
+
+def _words(rng: random.Random, count: int) -> List[str]:
+    letters = "abcdefghijklmnopqrstuvwxyz"
+    return ["".join(rng.choice(letters) for _ in range(rng.randint(2, 10))) for _ in range(count)]
+
+def _sentences(rng: random.Random, count: int, vocabulary: List[str]) -> List[str]:
+    sentences = []
+    for _ in range(count):
+        words = rng.choices(vocabulary, k=rng.randint(6, 24))
+        sentences.append(" ".join(words).capitalize() + rng.choice([".", ".", ".", "?", "!"]))
+    return sentences
+
+def documents_for_chunks(n_chunks: int, doc_chars: int, chunk_size: int, chunk_overlap: int) -> int:
+    """Number of documents of doc_chars characters giving about n_chunks fixed-size chunks."""
+    chunks_per_document = math.ceil(doc_chars / (chunk_size - chunk_overlap))
+    return max(1, math.ceil(n_chunks / chunks_per_document))
+
+def generate_corpus(base_path: str, domains: int, docs_per_domain: int, doc_chars: int = 8000, seed: int = 0) -> Dict:
+    """
+    Write domains x docs_per_domain documents of about doc_chars characters each.
+    The same seed always gives the same corpus.
+    """
+    rng = random.Random(seed)
+    vocabulary = _words(rng, 5000)
+    # Documents are assembled from a pool of sentences, much faster than drawing every word
+    pool = _sentences(rng, 20000, vocabulary)
+
+    total_chars = 0
+    for d in range(domains):
+        domain_path = os.path.join(base_path, f"domain_{d:03d}")
+        os.makedirs(domain_path, exist_ok=True)
+        for i in range(docs_per_domain):
+            parts, size = [], 0
+            while size < doc_chars:
+                if parts and rng.random() < 0.1:
+                    parts.append("\n\n")
+                sentence = rng.choice(pool)
+                parts.append(sentence + " ")
+                size += len(sentence) + 1
+            text = "".join(parts)[:doc_chars]
+            with open(os.path.join(domain_path, f"document_{i:05d}.txt"), "w", encoding="utf-8") as f:
+                f.write(text)
+            total_chars += len(text)
+
+    return {"domains": domains, "documents": domains * docs_per_domain, "characters": total_chars}
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("path")
+    parser.add_argument("--domains", type=int, default=1)
+    parser.add_argument("--docs-per-domain", type=int, default=100)
+    parser.add_argument("--doc-chars", type=int, default=8000)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+    print(json.dumps(generate_corpus(args.path, args.domains, args.docs_per_domain, args.doc_chars, args.seed), indent=2))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,197 @@
+"""
+Offline end-to-end benchmark: ingestion and query latency with fake providers.
+
+For every scale (chunks x domains) a synthetic corpus is written to a temporary
+directory and ingested with initialize_rag_components and apply_chunking_strategy
+into Chroma, using FakeEmbeddingModel and FakeChatModel. Queries then go through
+QueryEngine.ask_question with streaming. Every scale runs in its own process, so
+the peak RSS is that of the scale alone.
+
+    python -m benchmarks.e2e --scales 1000x1,10000x10,100000x100 --queries 200 --output e2e.json
+
+Results are printed as JSON; compare two runs by diffing the output files.
+"""
+import argparse
+import asyncio
+import json
+import logging
+import os
+import random
+import resource
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from typing import Dict, List, Tuple
+
+import numpy as np
+
+from .corpus import generate_corpus, documents_for_chunks
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+def parse_scales(value: str) -> List[Tuple[int, int]]:
+    scales = []
+    for scale in value.split(","):
+        chunks, _, domains = scale.strip().partition("x")
+        scales.append((int(chunks), int(domains or 1)))
+    return scales
+
+def percentiles(values: List[float]) -> Dict[str, float]:
+    if not values:
+        return {}
+    p50, p95, p99 = np.percentile(np.asarray(values) * 1000, [50, 95, 99])
+    return {"p50_ms": round(float(p50), 3), "p95_ms": round(float(p95), 3), "p99_ms": round(float(p99), 3),
+            "mean_ms": round(float(np.mean(values)) * 1000, 3)}
+
+def peak_rss_mb() -> float:
+    # ru_maxrss is in kilobytes on Linux, in bytes on macOS
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return round(rss / (1024 * 1024 if sys.platform == "darwin" else 1024), 1)
+
+def build_config(data_folder: str, chroma_directory: str, args) -> dict:
+    from rag_app.private_config import private_settings
+    from api.routes import merge_configs
+
+    with open(os.path.join(REPO_ROOT, "docs", "rag_setup_template.json")) as f:
+        template = json.load(f)["template"]
+    config = merge_configs(private_settings.dict(), template)
+    config["DATA_FOLDER"] = data_folder
+    config["vector_store"] = {"DEFAULT_PROVIDER": "Chroma", "CHROMA_PERSIST_DIRECTORY": chroma_directory}
+    config["document"]["IMPLEMENTATION"] = "Python"
+    # Every output stays in the working directory of the run, next to the vector store
+    work_directory = os.path.dirname(chroma_directory)
+    config["CHUNK_ARCHIVE_DIR"] = os.path.join(work_directory, "chunks")
+    config["DOMAIN_CATALOG_FILE"] = os.path.join(work_directory, "catalog", "domains.json")
+    config["response_cache"]["DIRECTORY"] = os.path.join(work_directory, "cache", "responses")
+    # The corpus is plain text: nothing to cache
+    config["EXTRACTED_TEXT_CACHE_DIR"] = None
+    config["chunking"].update({"STRATEGY": "fixed", "CHUNK_SIZE": args.chunk_size, "CHUNK_OVERLAP": args.chunk_overlap})
+    config["query_engine"]["N_RESULTS"] = args.n_results
+    return config
+
+async def run_queries(query_engine, questions: List[str]) -> Tuple[List[float], List[float]]:
+    latencies, first_tokens = [], []
+    for question in questions:
+        start = time.perf_counter()
+        results = await query_engine.ask_question(question=question, stream=True)
+        first = None
+        async for chunk, sources in results:
+            if first is None and chunk:
+                first = time.perf_counter() - start
+        latencies.append(time.perf_counter() - start)
+        first_tokens.append(first if first is not None else latencies[-1])
+    return latencies, first_tokens
+
+def run_scale(args) -> Dict:
+    """Run one scale in the current process."""
+    workdir = tempfile.mkdtemp(prefix="rag_e2e_")
+    data_folder = os.path.join(workdir, "data")
+    try:
+        n_documents = documents_for_chunks(args.chunks, args.doc_chars, args.chunk_size, args.chunk_overlap)
+        docs_per_domain = max(1, -(-n_documents // args.domains))
+        corpus = generate_corpus(data_folder, args.domains, docs_per_domain, args.doc_chars, args.seed)
+
+        # DomainManager writes the debug chunk files next to DATA_FOLDER: keep them in the work directory
+        os.environ["DATA_FOLDER"] = data_folder
+        from rag_app.initialization import initialize_rag_components, build_query_engine
+        from .fakes import FakeEmbeddingModel, FakeChatModel
+        logging.getLogger().setLevel(logging.WARNING)
+
+        config = build_config(data_folder, os.path.join(workdir, "chroma"), args)
+        embedding_model = FakeEmbeddingModel(args.dimension, args.embed_request_ms, args.embed_text_ms)
+        chat_model = FakeChatModel(args.tokens, args.first_token_ms, args.token_interval_ms)
+
+        start = time.perf_counter()
+        domain_manager, chat_model, embedding_model, chunk_strategy = initialize_rag_components(
+            config, chat_model=chat_model, embedding_model=embedding_model)
+        setup_seconds = time.perf_counter() - start
+        start = time.perf_counter()
+        domain_manager.apply_chunking_strategy()
+        ingest_seconds = time.perf_counter() - start
+        n_chunks = sum(store.collection.count() for store in domain_manager.vector_stores.values())
+        rss_after_ingestion = peak_rss_mb()
+
+        query_engine = build_query_engine(config, domain_manager, chat_model, embedding_model, chunk_strategy)
+        rng = random.Random(args.seed)
+        questions = [f"What is {' '.join(rng.sample(['index', 'vector', 'table', 'query', 'backup', 'cluster', 'schema', 'user'], 3))}?"
+                     for _ in range(args.queries)]
+        latencies, first_tokens = asyncio.run(run_queries(query_engine, questions))
+
+        return {
+            "chunks_target": args.chunks,
+            "domains": args.domains,
+            "documents": corpus["documents"],
+            "chunks": n_chunks,
+            "setup_seconds": round(setup_seconds, 3),
+            "ingest_seconds": round(ingest_seconds, 3),
+            "docs_per_second": round(corpus["documents"] / ingest_seconds, 1),
+            "chunks_per_second": round(n_chunks / ingest_seconds, 1),
+            "embedding_calls": embedding_model.calls,
+            "queries": args.queries,
+            "query_latency": percentiles(latencies),
+            "time_to_first_token": percentiles(first_tokens),
+            "peak_rss_mb_after_ingestion": rss_after_ingestion,
+            "peak_rss_mb": peak_rss_mb()
+        }
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+def worker_arguments(args, chunks: int, domains: int) -> List[str]:
+    arguments = ["--chunks", str(chunks), "--domains", str(domains)]
+    for key, value in vars(args).items():
+        if key not in ("scales", "output", "chunks", "domains") and value is not None:
+            arguments += [f"--{key.replace('_', '-')}", str(value)]
+    return arguments
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--scales", default="1000x1,10000x10", help="comma separated CHUNKSxDOMAINS, e.g. 1000x1,10000x10,100000x100")
+    parser.add_argument("--queries", type=int, default=100)
+    parser.add_argument("--n-results", type=int, default=5)
+    parser.add_argument("--doc-chars", type=int, default=8000)
+    parser.add_argument("--chunk-size", type=int, default=1000)
+    parser.add_argument("--chunk-overlap", type=int, default=200)
+    parser.add_argument("--dimension", type=int, default=64, help="embedding dimension")
+    parser.add_argument("--embed-request-ms", type=float, default=0, help="simulated latency per embedding request")
+    parser.add_argument("--embed-text-ms", type=float, default=0, help="simulated latency per embedded text")
+    parser.add_argument("--tokens", type=int, default=50, help="tokens per chat response")
+    parser.add_argument("--first-token-ms", type=float, default=0)
+    parser.add_argument("--token-interval-ms", type=float, default=0)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="also write the results to this file")
+    # Internal: run a single scale in this process
+    parser.add_argument("--chunks", type=int, help=argparse.SUPPRESS)
+    parser.add_argument("--domains", type=int, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.chunks is not None:
+        print(json.dumps(run_scale(args)))
+        return
+
+    results = []
+    for chunks, domains in parse_scales(args.scales):
+        completed = subprocess.run(
+            [sys.executable, "-m", "benchmarks.e2e", *worker_arguments(args, chunks, domains)],
+            cwd=REPO_ROOT, capture_output=True, text=True
+        )
+        if completed.returncode != 0:
+            sys.stderr.write(completed.stderr)
+            raise SystemExit(f"Scale {chunks}x{domains} failed")
+        results.append(json.loads(completed.stdout.strip().splitlines()[-1]))
+        print(f"{chunks}x{domains}: {results[-1]['chunks_per_second']} chunks/s, "
+              f"p95 {results[-1]['query_latency'].get('p95_ms')} ms", file=sys.stderr)
+
+    report = {
+        "settings": {key: value for key, value in vars(args).items() if key not in ("chunks", "domains", "output")},
+        "results": results
+    }
+    output = json.dumps(report, indent=2)
+    print(output)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(output)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,125 @@
+"""
+Offline, deterministic stand-ins for the embedding and chat providers and the vector store.
+
+FakeEmbeddingModel maps every text to a fixed pseudo-random unit vector derived from
+its hash, so repeated runs store and retrieve the same vectors. FakeChatModel streams
+a fixed number of tokens. Both can simulate the latency of the real providers.
+InMemoryVectorStore is an exact cosine-distance search over a numpy matrix.
+"""
+import asyncio
+import hashlib
+import time
+from typing import Any, AsyncIterator, Dict, List, Optional, Union
+
+import numpy as np
+
+from rag_app.core.interfaces.embedding_model_interface import EmbeddingModelInterface
+from rag_app.core.interfaces.chat_model_interface import ChatModelInterface
+from rag_app.core.interfaces.conversation_interface import ConversationInterface
+from rag_app.core.interfaces.vector_store_interface import VectorStoreInterface
+
+class FakeEmbeddingModel(EmbeddingModelInterface):
+    """
+    :param dimension: Size of the vectors.
+    :param request_latency_ms: Simulated latency of every call (one provider request).
+    :param per_text_latency_ms: Additional simulated latency per embedded text.
+    """
+
+    def __init__(self, dimension: int = 64, request_latency_ms: float = 0, per_text_latency_ms: float = 0):
+        self.dimension = dimension
+        self.request_latency = request_latency_ms / 1000
+        self.per_text_latency = per_text_latency_ms / 1000
+        self.calls = 0
+        self.texts = 0
+
+    @property
+    def model_name(self) -> str:
+        return f"fake-embedding-{self.dimension}"
+
+    def _vector(self, text: str) -> List[float]:
+        seed = int.from_bytes(hashlib.blake2b(text.encode("utf-8"), digest_size=8).digest(), "little")
+        vector = np.random.default_rng(seed).standard_normal(self.dimension)
+        return (vector / np.linalg.norm(vector)).tolist()
+
+    def generate_embedding(self, chunks: Union[str, List[str]]) -> Union[List[float], List[List[float]]]:
+        if isinstance(chunks, str):
+            chunks = [chunks]
+        self.calls += 1
+        self.texts += len(chunks)
+        latency = self.request_latency + self.per_text_latency * len(chunks)
+        if latency > 0:
+            time.sleep(latency)
+        embeddings = [self._vector(chunk) for chunk in chunks]
+        # Same convention as the real providers: a single text gives a single vector
+        return embeddings[0] if len(embeddings) == 1 else embeddings
+
+class FakeChatModel(ChatModelInterface):
+    """
+    :param tokens: Number of tokens of every response.
+    :param first_token_ms: Simulated time to the first token.
+    :param token_interval_ms: Simulated time between two tokens.
+    """
+
+    def __init__(self, tokens: int = 50, first_token_ms: float = 0, token_interval_ms: float = 0):
+        self.tokens = tokens
+        self.first_token = first_token_ms / 1000
+        self.token_interval = token_interval_ms / 1000
+
+    async def chat(self, system_prompt: str, query: str, conversation: Optional[ConversationInterface] = None,
+                   stream: bool = False) -> Union[str, AsyncIterator[str]]:
+        if stream:
+            return self._stream_response()
+        return "".join([token async for token in self._stream_response()])
+
+    async def _stream_response(self) -> AsyncIterator[str]:
+        await asyncio.sleep(self.first_token)
+        for i in range(self.tokens):
+            if i and self.token_interval:
+                await asyncio.sleep(self.token_interval)
+            yield f" token{i}"
+
+class InMemoryVectorStore(VectorStoreInterface):
+    def __init__(self):
+        self._embeddings = np.empty((0, 0), dtype=np.float32)
+        self._metadata: List[Dict[str, Any]] = []
+        self._ids: List[str] = []
+        self._documents: List[str] = []
+
+    def store_embeddings(self, embeddings: List[List[float]], metadata: List[Dict[str, Any]], ids: List[str], documents: List[str]) -> None:
+        new = np.asarray(embeddings, dtype=np.float32).reshape(len(ids), -1)
+        new /= np.maximum(np.linalg.norm(new, axis=1, keepdims=True), 1e-12)
+        self._embeddings = new if not self._ids else np.vstack([self._embeddings, new])
+        self._metadata.extend(metadata)
+        self._ids.extend(ids)
+        self._documents.extend(documents)
+
+    def delete_documents(self, document_ids: List[str]) -> None:
+        deleted = set(document_ids)
+        keep = [i for i, metadata in enumerate(self._metadata) if metadata.get("document_id") not in deleted]
+        self._embeddings = self._embeddings[keep] if keep else np.empty((0, 0), dtype=np.float32)
+        self._metadata = [self._metadata[i] for i in keep]
+        self._ids = [self._ids[i] for i in keep]
+        self._documents = [self._documents[i] for i in keep]
+
+    def clear(self) -> None:
+        self._embeddings = np.empty((0, 0), dtype=np.float32)
+        self._metadata, self._ids, self._documents = [], [], []
+
+    def query(self, query_embedding: List[float], n_results: int = 10, include_embeddings: bool = False) -> List[Dict[str, Any]]:
+        if not self._ids:
+            return []
+        query = np.asarray(query_embedding, dtype=np.float32)
+        distances = 1 - self._embeddings @ (query / max(np.linalg.norm(query), 1e-12))
+        n_results = min(n_results, len(self._ids))
+        top = np.argpartition(distances, n_results - 1)[:n_results]
+        top = top[np.argsort(distances[top])]
+        results = []
+        for i in top:
+            result = {"id": self._ids[i], "distance": float(distances[i]), "metadata": dict(self._metadata[i]), "document": self._documents[i]}
+            if include_embeddings:
+                result["embedding"] = self._embeddings[i].tolist()
+            results.append(result)
+        return results
+
+    def __len__(self) -> int:
+        return len(self._ids)
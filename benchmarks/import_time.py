@@ -0,0 +1,82 @@
+"""
+Import-time report of the application, from `python -X importtime` in a fresh interpreter.
+
+Prints the total import time, the slowest modules (cumulative time, including their own
+imports) and the time spent per top-level package, and which provider SDKs were loaded:
+with lazy provider imports, none of them should be imported before a configuration
+selects them.
+
+    python -m benchmarks.import_time
+    python -m benchmarks.import_time --module rag_app.initialization --top 30
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+from collections import defaultdict
+from typing import Dict, List
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+PROVIDER_PACKAGES = ["chromadb", "oci", "langchain_community", "langchain_core", "cohere", "oracledb",
+                     "docx", "PyPDF2", "chardet"]
+
+def import_times(module: str) -> List[Dict]:
+    """One entry per imported module, in import order: name, depth, self_us, cumulative_us."""
+    environment = dict(os.environ)
+    environment["PYTHONPATH"] = os.pathsep.join(filter(None, [REPO_ROOT, os.path.join(REPO_ROOT, "src"),
+                                                              environment.get("PYTHONPATH")]))
+    for name in ("DATABASE_URL", "OCI_API_KEY", "COHERE_API_KEY"):
+        environment.setdefault(name, "unused")
+    completed = subprocess.run([sys.executable, "-X", "importtime", "-c", f"import {module}"],
+                               cwd=REPO_ROOT, env=environment, capture_output=True, text=True)
+    if completed.returncode != 0:
+        sys.stderr.write(completed.stderr)
+        raise SystemExit(f"Importing {module} failed")
+
+    entries = []
+    for line in completed.stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|")
+        entries.append({
+            "name": name.strip(),
+            "depth": (len(name) - len(name.lstrip()) - 1) // 2,
+            "self_us": int(self_us),
+            "cumulative_us": int(cumulative_us)
+        })
+    return entries
+
+def report(module: str, top: int) -> Dict:
+    entries = import_times(module)
+    per_package = defaultdict(int)
+    for entry in entries:
+        per_package[entry["name"].split(".")[0]] += entry["self_us"]
+    loaded = {entry["name"] for entry in entries}
+    return {
+        "module": module,
+        "total_ms": round(sum(entry["self_us"] for entry in entries) / 1000, 1),
+        "modules_imported": len(entries),
+        "providers_loaded": [package for package in PROVIDER_PACKAGES if package in loaded],
+        "slowest_modules_ms": {entry["name"]: round(entry["cumulative_us"] / 1000, 1)
+                               for entry in sorted(entries, key=lambda e: e["cumulative_us"], reverse=True)[:top]},
+        "packages_ms": {package: round(us / 1000, 1)
+                        for package, us in sorted(per_package.items(), key=lambda item: item[1], reverse=True)[:top]}
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--module", default="src.rag_app.main")
+    parser.add_argument("--top", type=int, default=20)
+    parser.add_argument("--output", help="also write the report to this file")
+    args = parser.parse_args()
+
+    output = json.dumps(report(args.module, args.top), indent=2)
+    print(output)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(output)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,291 @@
+"""
+In-process HTTP load test of the API routes.
+
+The real routes.router is mounted in a FastAPI app and driven through a minimal ASGI
+client (no sockets), with a QueryEngine built on fake embedding/chat models and
+in-memory vector stores. Requests follow a mix of /ask, /init and /rag_config, either
+closed-loop (--rate 0: --concurrency clients back to back) or open-loop (Poisson
+arrivals at --rate requests/s, at most --concurrency in flight; latency includes the
+queueing delay). Reports throughput, time to first byte and full response latency
+percentiles per endpoint, and the event loop lag measured by a probe task.
+
+FakeEmbeddingModel sleeps synchronously, like the real providers' blocking HTTP calls,
+so --embed-ms shows the effect of a blocking call inside the async handlers:
+
+    python -m benchmarks.load_test --requests 500 --concurrency 20 --embed-ms 0
+    python -m benchmarks.load_test --requests 500 --concurrency 20 --embed-ms 20
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+from types import SimpleNamespace
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+class ResponseTiming:
+    __slots__ = ("endpoint", "status", "ttfb", "total", "bytes")
+
+    def __init__(self, endpoint: str):
+        self.endpoint = endpoint
+        self.status = 0
+        self.ttfb: Optional[float] = None
+        self.total = 0.0
+        self.bytes = 0
+
+async def asgi_request(app, method: str, path: str, body: Optional[dict] = None,
+                       headers: Optional[Dict[str, str]] = None, start: Optional[float] = None,
+                       endpoint: str = "") -> ResponseTiming:
+    """
+    Send one request to the ASGI app, timing the first body bytes and the end of the response.
+    Unlike httpx's ASGITransport, the response is not buffered, so the time to first byte
+    of a streamed response is measured.
+    """
+    start = time.perf_counter() if start is None else start
+    timing = ResponseTiming(endpoint or path)
+    payload = json.dumps(body).encode() if body is not None else b""
+    raw_headers = [(b"host", b"loadtest"), (b"content-length", str(len(payload)).encode())]
+    if body is not None:
+        raw_headers.append((b"content-type", b"application/json"))
+    for name, value in (headers or {}).items():
+        raw_headers.append((name.lower().encode(), value.encode()))
+    scope = {
+        "type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1", "method": method,
+        "scheme": "http", "path": path, "raw_path": path.encode(), "query_string": b"", "root_path": "",
+        "headers": raw_headers, "client": ("127.0.0.1", 50000), "server": ("loadtest", 80)
+    }
+    done = asyncio.Event()
+    request_sent = False
+
+    async def receive():
+        nonlocal request_sent
+        if not request_sent:
+            request_sent = True
+            return {"type": "http.request", "body": payload, "more_body": False}
+        # Starlette listens for a client disconnect while streaming: report it once the response is complete
+        await done.wait()
+        return {"type": "http.disconnect"}
+
+    async def send(message):
+        if message["type"] == "http.response.start":
+            timing.status = message["status"]
+        elif message["type"] == "http.response.body":
+            chunk = message.get("body", b"")
+            if chunk and timing.ttfb is None:
+                timing.ttfb = time.perf_counter() - start
+            timing.bytes += len(chunk)
+            if not message.get("more_body", False):
+                timing.total = time.perf_counter() - start
+                done.set()
+
+    await app(scope, receive, send)
+    done.set()
+    if timing.ttfb is None:
+        timing.ttfb = timing.total
+    return timing
+
+class LoopLagProbe:
+    """Measure how late the event loop wakes up a task sleeping for interval seconds."""
+
+    def __init__(self, interval: float = 0.01):
+        self.interval = interval
+        self.lags: List[float] = []
+        self._task: Optional[asyncio.Task] = None
+
+    async def _run(self):
+        while True:
+            start = time.perf_counter()
+            await asyncio.sleep(self.interval)
+            self.lags.append(max(0.0, time.perf_counter() - start - self.interval))
+
+    def start(self):
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+
+def percentiles(values: List[float]) -> Dict[str, float]:
+    if not values:
+        return {}
+    p50, p95, p99 = np.percentile(np.asarray(values) * 1000, [50, 95, 99])
+    return {"p50_ms": round(float(p50), 3), "p95_ms": round(float(p95), 3), "p99_ms": round(float(p99), 3),
+            "max_ms": round(max(values) * 1000, 3)}
+
+def parse_mix(value: str) -> List[Tuple[str, float]]:
+    mix = []
+    for item in value.split(","):
+        endpoint, _, weight = item.strip().partition("=")
+        if endpoint not in ("ask", "init", "rag_config"):
+            raise ValueError(f"Unknown endpoint in mix: {endpoint}")
+        mix.append((endpoint, float(weight or 1)))
+    return mix
+
+def build_app(args):
+    """The routes app with a QueryEngine on fake providers and in-memory vector stores."""
+    # /rag_config serves the latest file of CONFIGS_FOLDER
+    configs_folder = tempfile.mkdtemp(prefix="rag_load_configs_")
+    with open(os.path.join(REPO_ROOT, "docs", "rag_setup_template.json")) as f:
+        template = json.load(f)["template"]
+    with open(os.path.join(configs_folder, "config_20240101000000.json"), "w") as f:
+        json.dump(template, f)
+    os.environ["CONFIGS_FOLDER"] = configs_folder
+
+    import logging
+    from fastapi import FastAPI
+    from api import routes
+    from rag_app.core.implementations.query_engine.query_engine import QueryEngine
+    from rag_app.core.implementations.reranker.reranker import ResultReRanker
+    from .fakes import FakeEmbeddingModel, FakeChatModel, InMemoryVectorStore
+    logging.getLogger().setLevel(logging.WARNING)
+
+    indexing_model = FakeEmbeddingModel(args.dimension)
+    rng = random.Random(args.seed)
+    words = ["index", "vector", "table", "query", "backup", "cluster", "schema", "user", "database", "storage"]
+    vector_stores = {}
+    for d in range(args.domains):
+        store = InMemoryVectorStore()
+        documents = [" ".join(rng.choices(words, k=150)) + "." for _ in range(args.chunks_per_domain)]
+        ids = [f"domain{d}_{i}_chunk_0" for i in range(len(documents))]
+        metadata = [{"document_id": f"domain{d}_{i}", "document_name": f"document_{i}.txt", "start": 0, "end": len(text)}
+                    for i, text in enumerate(documents)]
+        store.store_embeddings(indexing_model.generate_embedding(documents), metadata, ids, documents)
+        vector_stores[f"domain_{d}"] = store
+
+    query_engine = QueryEngine(
+        domain_manager=SimpleNamespace(vector_stores=vector_stores),
+        vector_stores=vector_stores,
+        embedding_model=FakeEmbeddingModel(args.dimension, request_latency_ms=args.embed_ms),
+        chat_model=FakeChatModel(args.tokens, args.first_token_ms, args.token_interval_ms),
+        chunk_strategy=None,
+        query_optimizer=None,
+        result_re_ranker=ResultReRanker(),
+        n_results=args.n_results
+    )
+    routes.query_engine = query_engine
+
+    app = FastAPI()
+    app.include_router(routes.router)
+    return app
+
+def request_for(endpoint: str, i: int, args) -> Tuple[str, str, Optional[dict], Dict[str, str]]:
+    headers = {"X-Session-ID": f"session-{i % args.sessions}"} if args.sessions > 0 else {}
+    if endpoint == "ask":
+        return "POST", "/ask", {"message": f"What is the backup of table {i}?", "genModel": "fake"}, headers
+    if endpoint == "init":
+        return "POST", "/init", {"genModel": "fake"}, headers
+    return "GET", "/rag_config", None, {}
+
+async def run_load(app, args) -> Dict:
+    rng = random.Random(args.seed)
+    endpoints, weights = zip(*parse_mix(args.mix))
+    plan = rng.choices(endpoints, weights=weights, k=args.requests)
+    timings: List[ResponseTiming] = []
+    errors = 0
+
+    async def one(i: int, endpoint: str, start: Optional[float] = None):
+        nonlocal errors
+        method, path, body, headers = request_for(endpoint, i, args)
+        try:
+            timing = await asgi_request(app, method, path, body, headers, start=start, endpoint=endpoint)
+        except Exception:
+            errors += 1
+            return
+        if timing.status >= 400:
+            errors += 1
+        timings.append(timing)
+
+    probe = LoopLagProbe(args.lag_interval_ms / 1000)
+    probe.start()
+    started = time.perf_counter()
+
+    if args.rate <= 0:
+        # Closed loop: each client sends its next request when the previous one is complete
+        queue = iter(enumerate(plan))
+
+        async def client():
+            for i, endpoint in queue:
+                await one(i, endpoint)
+        await asyncio.gather(*(client() for _ in range(args.concurrency)))
+    else:
+        # Open loop: arrivals do not wait for responses, latency includes the wait for a free slot
+        slots = asyncio.Semaphore(args.concurrency)
+        tasks = []
+
+        async def gated(i: int, endpoint: str, arrival: float):
+            async with slots:
+                await one(i, endpoint, start=arrival)
+
+        next_arrival = time.perf_counter()
+        for i, endpoint in enumerate(plan):
+            next_arrival += rng.expovariate(args.rate)
+            delay = next_arrival - time.perf_counter()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            tasks.append(asyncio.create_task(gated(i, endpoint, next_arrival)))
+        await asyncio.gather(*tasks)
+
+    elapsed = time.perf_counter() - started
+    await probe.stop()
+
+    per_endpoint = {}
+    for endpoint in endpoints:
+        selected = [t for t in timings if t.endpoint == endpoint]
+        per_endpoint[endpoint] = {
+            "requests": len(selected),
+            "throughput_rps": round(len(selected) / elapsed, 1),
+            "time_to_first_byte": percentiles([t.ttfb for t in selected]),
+            "latency": percentiles([t.total for t in selected]),
+            "mean_response_bytes": round(sum(t.bytes for t in selected) / len(selected)) if selected else 0
+        }
+    return {
+        "requests": len(timings),
+        "errors": errors,
+        "elapsed_seconds": round(elapsed, 3),
+        "throughput_rps": round(len(timings) / elapsed, 1),
+        "time_to_first_byte": percentiles([t.ttfb for t in timings]),
+        "latency": percentiles([t.total for t in timings]),
+        "event_loop_lag": percentiles(probe.lags),
+        "endpoints": per_endpoint
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=500)
+    parser.add_argument("--concurrency", type=int, default=20)
+    parser.add_argument("--rate", type=float, default=0, help="arrivals per second (0: closed loop)")
+    parser.add_argument("--mix", default="ask=8,init=1,rag_config=1", help="endpoint weights")
+    parser.add_argument("--sessions", type=int, default=0, help="spread requests over N X-Session-ID values (0: shared default session)")
+    parser.add_argument("--domains", type=int, default=3)
+    parser.add_argument("--chunks-per-domain", type=int, default=1000)
+    parser.add_argument("--n-results", type=int, default=5)
+    parser.add_argument("--dimension", type=int, default=64)
+    parser.add_argument("--embed-ms", type=float, default=0, help="blocking latency of the query embedding call")
+    parser.add_argument("--tokens", type=int, default=50)
+    parser.add_argument("--first-token-ms", type=float, default=50)
+    parser.add_argument("--token-interval-ms", type=float, default=5)
+    parser.add_argument("--lag-interval-ms", type=float, default=10)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="also write the results to this file")
+    args = parser.parse_args()
+
+    app = build_app(args)
+    report = {"settings": vars(args), "results": asyncio.run(run_load(app, args))}
+    output = json.dumps(report, indent=2)
+    print(output)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(output)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,251 @@
+"""
+Micro-benchmarks of the CPU-bound building blocks, with a regression gate.
+
+Every benchmark runs over a range of input sizes, so the scaling curve is tracked and
+not only a single point. Each case is timed with enough loops to last --min-time
+seconds, repeated --repeat times; the median time per call is kept.
+
+    python -m benchmarks.micro run                       # print the results
+    python -m benchmarks.micro save-baseline             # store them in benchmarks/baselines/micro.json
+    python -m benchmarks.micro compare --threshold 0.25  # exit 1 if a case is >25% slower than the baseline
+    python -m benchmarks.micro compare --filter rerank   # only the matching benchmarks
+
+Baselines depend on the machine: save one on the machine that runs the comparison.
+"""
+import argparse
+import atexit
+import json
+import logging
+import os
+import platform
+import random
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+from typing import Callable, Dict, Iterable, List, Tuple
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DEFAULT_BASELINE = os.path.join(REPO_ROOT, "benchmarks", "baselines", "micro.json")
+
+# name -> (parameter name, parameter values, setup(value) -> zero-argument function to time)
+BENCHMARKS: Dict[str, Tuple[str, List[int], Callable[[int], Callable[[], object]]]] = {}
+
+def benchmark(name: str, parameter: str, values: List[int]):
+    def register(setup: Callable[[int], Callable[[], object]]):
+        BENCHMARKS[name] = (parameter, values, setup)
+        return setup
+    return register
+
+_WORDS = ["oracle", "database", "vector", "index", "table", "query", "backup", "cluster", "schema",
+          "partition", "storage", "network", "session", "memory", "replication", "recovery"]
+
+def _text(n_chars: int, seed: int = 0) -> str:
+    rng = random.Random(seed)
+    sentences, size = [], 0
+    while size < n_chars:
+        sentence = " ".join(rng.choices(_WORDS, k=rng.randint(6, 20))).capitalize()
+        sentences.append(sentence)
+        size += len(sentence) + 2
+    return ". ".join(sentences)[:n_chars]
+
+@benchmark("fixed_chunker", "document_chars", [10_000, 100_000, 1_000_000])
+def _fixed_chunker(n_chars: int):
+    from rag_app.core.implementations.chunk_strategy.fixed_size_strategy import FixedSizeChunkStrategy
+    strategy = FixedSizeChunkStrategy(chunk_size=1000, overlap=200)
+    content = _text(n_chars)
+    return lambda: strategy.chunk_text(content, "doc_1")
+
+@benchmark("semantic_chunker", "sentences", [50, 200, 800])
+def _semantic_chunker(n_sentences: int):
+    from rag_app.core.implementations.chunk_strategy.semantic_strategy import SemanticChunkStrategy
+    from .fakes import FakeEmbeddingModel
+    strategy = SemanticChunkStrategy(embedding_model=FakeEmbeddingModel(dimension=64), max_chunk_size=1000)
+    rng = random.Random(0)
+    content = ". ".join(" ".join(rng.choices(_WORDS, k=12)) for _ in range(n_sentences))
+    return lambda: strategy.chunk_text(content, "doc_1")
+
+def _candidates(n: int, dimension: int = 64) -> List[dict]:
+    import numpy as np
+    rng = np.random.default_rng(0)
+    embeddings = rng.standard_normal((n, dimension))
+    return [{"id": f"domain{i % 3}_{i}_chunk_0", "distance": float(d), "domain": f"domain_{i % 3}",
+             "metadata": {}, "document": "text", "embedding": embeddings[i].tolist()}
+            for i, d in enumerate(rng.random(n))]
+
+@benchmark("rerank_distance", "candidates", [10, 100, 1000])
+def _rerank_distance(n: int):
+    from rag_app.core.implementations.reranker.reranker import ResultReRanker
+    reranker, results = ResultReRanker(mode="distance"), _candidates(n)
+    return lambda: reranker.re_rank(results, "question")
+
+@benchmark("rerank_mmr", "candidates", [10, 100, 1000])
+def _rerank_mmr(n: int):
+    from rag_app.core.implementations.reranker.reranker import ResultReRanker
+    reranker, results = ResultReRanker(mode="mmr", top_k=10), _candidates(n)
+    return lambda: reranker.re_rank(results, "question")
+
+def _history(n_messages: int) -> List[Tuple[str, str]]:
+    return [("User" if i % 2 == 0 else "Assistant", _text(300, seed=i)) for i in range(n_messages)]
+
+@benchmark("conversation_format", "messages", [10, 100, 1000])
+def _conversation_format(n_messages: int):
+    from rag_app.core.implementations.conversation.conversation import Conversation
+    conversation = Conversation()
+    for role, content in _history(n_messages):
+        conversation.add_message(role, content)
+    return conversation.get_formatted_history
+
+@benchmark("windowed_conversation_turn", "messages", [10, 100, 1000])
+def _windowed_conversation_turn(n_messages: int):
+    # A turn on a long conversation: add the two messages and format the history for the prompt
+    from rag_app.core.implementations.conversation.conversation import WindowedConversation
+    conversation = WindowedConversation()
+    for role, content in _history(n_messages):
+        conversation.add_message(role, content)
+    question, answer = _text(200, seed=1), _text(600, seed=2)
+
+    def turn():
+        conversation.add_message("User", question)
+        conversation.add_message("Assistant", answer)
+        return conversation.get_formatted_history()
+    return turn
+
+@benchmark("merge_configs", "keys", [10, 100, 1000])
+def _merge_configs(n_keys: int):
+    from api.routes import merge_configs
+    base = {f"section_{i}": {f"KEY_{j}": j for j in range(10)} for i in range(n_keys // 10 or 1)}
+    base.update({f"LIST_{i}": list(range(10)) for i in range(n_keys // 10)})
+    new = {f"section_{i}": {f"KEY_{j}": -j for j in range(0, 10, 2)} for i in range(n_keys // 10 or 1)}
+    new.update({f"LIST_{i}": list(range(5, 15)) for i in range(n_keys // 10)})
+    return lambda: merge_configs(base, new)
+
+@benchmark("read_text_file", "kilobytes", [4, 64, 512])
+def _read_text_file(kilobytes: int):
+    from rag_app.core.implementations.storage.file_storage import FileStorage
+    directory = tempfile.mkdtemp(prefix="rag_micro_")
+    atexit.register(shutil.rmtree, directory, ignore_errors=True)
+    path = os.path.join(directory, "document.txt")
+    with open(path, "w", encoding="utf-8") as f:
+        f.write(_text(kilobytes * 1024).replace("Oracle", "Oracle®", 3))
+    storage = FileStorage(directory)
+    return lambda: storage._read_text_file(path)
+
+def measure(fn: Callable[[], object], min_time: float, repeat: int) -> float:
+    """Median time per call in seconds."""
+    loops = 1
+    while True:
+        start = time.perf_counter()
+        for _ in range(loops):
+            fn()
+        elapsed = time.perf_counter() - start
+        if elapsed >= min_time:
+            break
+        loops = max(loops * 2, int(loops * min_time / max(elapsed, 1e-9)))
+    times = [elapsed / loops]
+    for _ in range(repeat - 1):
+        start = time.perf_counter()
+        for _ in range(loops):
+            fn()
+        times.append((time.perf_counter() - start) / loops)
+    return statistics.median(times)
+
+def case_name(name: str, parameter: str, value: int) -> str:
+    return f"{name}[{parameter}={value}]"
+
+def cases(selected: Iterable[str]) -> Dict[str, Callable[[], Callable[[], object]]]:
+    """Case name -> setup of the function to time."""
+    return {case_name(name, BENCHMARKS[name][0], value): (lambda setup=BENCHMARKS[name][2], value=value: setup(value))
+            for name in selected for value in BENCHMARKS[name][1]}
+
+def run(selected: Dict[str, Callable[[], Callable[[], object]]], min_time: float, repeat: int) -> Dict[str, float]:
+    results = {}
+    for case, setup in selected.items():
+        results[case] = measure(setup(), min_time, repeat)
+        print(f"{case:<50} {results[case] * 1e6:>14.2f} us", file=sys.stderr)
+    return results
+
+def compare(results: Dict[str, float], baseline: Dict[str, float], threshold: float) -> List[str]:
+    """Print the comparison and return the regressed cases."""
+    regressions = []
+    print(f"{'case':<50} {'baseline us':>14} {'current us':>14} {'change':>8}")
+    for case, seconds in results.items():
+        reference = baseline.get(case)
+        if reference is None:
+            print(f"{case:<50} {'-':>14} {seconds * 1e6:>14.2f} {'new':>8}")
+            continue
+        change = seconds / reference - 1
+        flag = ""
+        if change > threshold:
+            regressions.append(case)
+            flag = "  REGRESSION"
+        print(f"{case:<50} {reference * 1e6:>14.2f} {seconds * 1e6:>14.2f} {change:>+8.1%}{flag}")
+    return regressions
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("command", choices=["run", "save-baseline", "compare", "list"])
+    parser.add_argument("--filter", default="", help="only run the benchmarks whose name contains this")
+    parser.add_argument("--baseline", default=DEFAULT_BASELINE)
+    parser.add_argument("--threshold", type=float, default=0.25, help="allowed slowdown before failing (0.25 = 25%%)")
+    parser.add_argument("--min-time", type=float, default=0.05, help="seconds per timed repetition")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--retries", type=int, default=2, help="re-measure a regressed case up to this many times before failing")
+    parser.add_argument("--output", help="write the results to this file")
+    args = parser.parse_args()
+
+    logging.disable(logging.CRITICAL)
+    names = [name for name in BENCHMARKS if args.filter in name]
+    if args.command == "list":
+        for name in names:
+            parameter, values, _ = BENCHMARKS[name]
+            print(f"{name}: {parameter} in {values}")
+        return
+
+    selected = cases(names)
+    results = run(selected, args.min_time, args.repeat)
+    report = {
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "machine": platform.machine(),
+        "results": results
+    }
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+
+    if args.command == "run":
+        print(json.dumps(report, indent=2))
+    elif args.command == "save-baseline":
+        os.makedirs(os.path.dirname(args.baseline), exist_ok=True)
+        baseline = {}
+        if os.path.exists(args.baseline):
+            with open(args.baseline) as f:
+                baseline = json.load(f).get("results", {})
+        # Keep the cases that were not run (--filter)
+        baseline.update(results)
+        with open(args.baseline, "w") as f:
+            json.dump(dict(report, results=baseline), f, indent=2)
+        print(f"Saved {len(results)} cases to {args.baseline}")
+    else:
+        if not os.path.exists(args.baseline):
+            raise SystemExit(f"No baseline at {args.baseline}: run save-baseline first")
+        with open(args.baseline) as f:
+            baseline = json.load(f)["results"]
+        # A noisy neighbour can slow down a single measurement: keep the best of a few runs before failing
+        for _ in range(args.retries):
+            suspects = [case for case, seconds in results.items()
+                        if case in baseline and seconds / baseline[case] - 1 > args.threshold]
+            if not suspects:
+                break
+            retry = run({case: selected[case] for case in suspects}, args.min_time, args.repeat)
+            results.update({case: min(results[case], seconds) for case, seconds in retry.items()})
+        regressions = compare(results, baseline, args.threshold)
+        if regressions:
+            print(f"{len(regressions)} case(s) regressed by more than {args.threshold:.0%}: {', '.join(regressions)}")
+            sys.exit(1)
+        print(f"No regression beyond {args.threshold:.0%}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,123 @@
+"""
+Streams per core of the /ask and /init SSE content generators.
+
+Compares the previous generator (per-token info logging, string concatenation,
+json.dumps of a dict per token) with the current one (pre-encoded frames, list
+buffer), optionally with token coalescing. Many concurrent streams receive tokens
+at a fixed rate; the CPU time of the process gives the number of concurrent
+streams a single core can sustain.
+
+    python -m benchmarks.sse_streaming --streams 200 --tokens 300 --token-interval-ms 10
+"""
+import argparse
+import asyncio
+import json
+import logging
+import os
+import time
+from typing import AsyncIterator, Dict, List
+
+from api.sse import encode_sse, content_frame, split_sources, coalesce
+
+async def fake_token_stream(n_tokens: int, token_interval: float) -> AsyncIterator:
+    for i in range(n_tokens):
+        await asyncio.sleep(token_interval)
+        yield f" token{i}", None
+    yield "", [{"id": "doc_1_chunk_0", "distance": 0.1, "document": "source text", "metadata": {}}]
+
+async def legacy_generator(results) -> AsyncIterator[str]:
+    # Content generator of /ask before the streaming fast path
+    full_response = ""
+    sources = []
+    async for result in results:
+        if isinstance(result, tuple):
+            chunk, chunk_sources = result
+            if chunk_sources is not None:
+                sources = chunk_sources
+                continue
+        else:
+            chunk = result
+
+        full_response += chunk
+        response = {
+            'content': chunk,
+            'type': 'content',
+            'timestamp': time.time()
+        }
+        logging.info(f"Yielding content: {response}")
+        yield f"data: {json.dumps(response)}\n\n"
+
+    done_response = {'type': 'done', 'timestamp': time.time(), 'conversation': [], 'sources': sources}
+    yield f"data: {json.dumps(done_response)}\n\n"
+
+async def fast_generator(results, flush_interval: float) -> AsyncIterator[bytes]:
+    response_parts = []
+    sources = []
+    async for text in coalesce(split_sources(results, sources), flush_interval):
+        response_parts.append(text)
+        yield content_frame(text)
+    full_response = "".join(response_parts)
+
+    done_response = {'type': 'done', 'timestamp': time.time(), 'conversation': [], 'sources': sources}
+    yield encode_sse(done_response)
+
+async def consume(generator) -> int:
+    frames = 0
+    async for _ in generator:
+        frames += 1
+    return frames
+
+async def run_variant(name: str, n_streams: int, n_tokens: int, token_interval: float, flush_interval: float) -> Dict:
+    def make():
+        results = fake_token_stream(n_tokens, token_interval)
+        if name == "legacy":
+            return legacy_generator(results)
+        return fast_generator(results, flush_interval)
+
+    # Baseline: the token source alone, to subtract the cost of the simulated LLM stream
+    cpu_start = time.process_time()
+    await asyncio.gather(*(consume(fake_token_stream(n_tokens, token_interval)) for _ in range(n_streams)))
+    source_cpu = time.process_time() - cpu_start
+
+    cpu_start, wall_start = time.process_time(), time.perf_counter()
+    frames = await asyncio.gather(*(consume(make()) for _ in range(n_streams)))
+    cpu = time.process_time() - cpu_start
+    wall = time.perf_counter() - wall_start
+
+    # CPU seconds spent per second of streaming, per stream
+    cpu_per_stream = max(cpu - source_cpu, 1e-9) / wall / n_streams
+    return {
+        "variant": name,
+        "flush_interval_ms": flush_interval * 1000,
+        "frames_per_stream": sum(frames) / n_streams,
+        "cpu_seconds": round(cpu, 4),
+        "generator_cpu_seconds": round(cpu - source_cpu, 4),
+        "streams_per_core": round(1 / cpu_per_stream, 1),
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--streams", type=int, default=200)
+    parser.add_argument("--tokens", type=int, default=300)
+    parser.add_argument("--token-interval-ms", type=float, default=10)
+    parser.add_argument("--flush-ms", type=float, default=50, help="flush interval of the coalesced variant")
+    args = parser.parse_args()
+
+    # Same logging setup as the application: INFO on the root logger, written to a stream
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s',
+                        stream=open(os.devnull, "w"))
+
+    token_interval = args.token_interval_ms / 1000
+    results: List[Dict] = []
+    for name, flush_interval in (("legacy", 0), ("fast", 0), ("fast_coalesced", args.flush_ms / 1000)):
+        results.append(asyncio.run(run_variant(name, args.streams, args.tokens, token_interval, flush_interval)))
+
+    print(json.dumps({
+        "streams": args.streams,
+        "tokens_per_stream": args.tokens,
+        "token_interval_ms": args.token_interval_ms,
+        "results": results
+    }, indent=2))
+
+if __name__ == "__main__":
+    main()
@@ -1,15 +1,18 @@
 import os
 import sys
+import asyncio
 import logging
 import json
-from fastapi import APIRouter, Depends, HTTPException, Body, Request
-from fastapi.responses import JSONResponse, StreamingResponse
+from fastapi import APIRouter, Depends, HTTPException, Body, Request, Header
+from fastapi.responses import JSONResponse, StreamingResponse, Response, FileResponse
 from datetime import datetime
 import glob
 import traceback
 from pydantic import BaseModel
-from typing import List, Dict, Optional, Tuple
+from typing import List, Dict, Optional, Tuple, AsyncIterator
+from contextlib import asynccontextmanager
 import time
+import uuid
 
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
@@ -18,13 +21,18 @@ from rag_app.core.interfaces.query_engine_interface import QueryEngineInterface
 from rag_app.core.interfaces.domain_manager_interface import DomainManagerInterface
 
 # Implementations
-from rag_app.core.implementations.conversation.conversation import Conversation
+from rag_app.core.implementations.conversation.conversation import create_conversation
+from rag_app.core.implementations.conversation.conversation_store import ConversationStore
 from rag_app.core.implementations.query_engine.query_engine import QueryEngine
-from rag_app.core.implementations.query_optimizer.query_optimizer import QueryOptimizer
 from rag_app.private_config import private_settings
+from rag_app.metrics import REGISTRY, CONTENT_TYPE
+from rag_app import tracing, profiling
 
 # Config
-from rag_app.initialization import initialize_rag_components
+from rag_app.initialization import initialize_rag_components, build_query_engine
+
+# Streaming
+from .sse import encode_sse, content_frame, split_sources, coalesce, compact_sources
 
 # Logs
 logger = logging.getLogger(__name__)
@@ -35,14 +43,22 @@ router = APIRouter()
 # These will be updated in the /setup_RAG endpoint
 query_engine: QueryEngine = None
 domain_manager = None
+# "conversation" section of the active configuration
+conversation_config: dict = {}
+# True while main loads the last configuration in the background
+initializing: bool = False
 
 def get_query_engine():
     if query_engine is None:
+        if initializing:
+            raise HTTPException(status_code=503, detail="Query engine is initializing", headers={"Retry-After": "5"})
         raise HTTPException(status_code=500, detail="Query engine not initialized")
     return query_engine
 
 def get_domain_manager():
     if domain_manager is None:
+        if initializing:
+            raise HTTPException(status_code=503, detail="Domain manager is initializing", headers={"Retry-After": "5"})
         raise HTTPException(status_code=500, detail="Domain manager not initialized")
     return domain_manager
 
@@ -52,23 +68,113 @@ class AskRequest(BaseModel):
     message: str
     genModel: str
     conversation: List[Dict[str, str]] = []
+    session_id: Optional[str] = None
+    compact: Optional[bool] = None
 
 # **New: InitRequest Model**
 class InitRequest(BaseModel):
     genModel: str
+    session_id: Optional[str] = None
+    compact: Optional[bool] = None
+
+class ChunksRequest(BaseModel):
+    ids: List[str]
+
+class CleanConversationRequest(BaseModel):
+    session_id: Optional[str] = None
+
+def new_conversation():
+    return create_conversation(conversation_config)
+
+# Conversations are kept per session. Clients that don't send a session id get a new one in the X-Session-ID header.
+SESSION_HEADER = "X-Session-ID"
+TRACE_HEADER = "X-Trace-ID"
+PROFILE_ID_HEADER = "X-Profile-ID"
+
+conversation_store = ConversationStore(
+    conversation_factory=new_conversation,
+    max_sessions=private_settings.session.MAX_SESSIONS,
+    idle_ttl=private_settings.session.IDLE_TTL_SECONDS,
+    spill_directory=private_settings.session.SPILL_DIRECTORY
+)
+
+# Tokens received within this interval are sent in a single SSE frame (0: one frame per token)
+STREAM_FLUSH_INTERVAL = private_settings.STREAM_FLUSH_INTERVAL_MS / 1000
+
+# Chunks returned by one POST /chunks request
+MAX_CHUNKS_PER_REQUEST = 100
+
+def done_frame(conversation, new_messages: List[Dict[str, str]], sources: List, compact: Optional[bool]) -> bytes:
+    """
+    Final SSE frame of a response. The compact frame has only the messages of this turn
+    (conversation_delta) and the sources used in the prompt, without their text.
+    """
+    if compact is None:
+        compact = private_settings.COMPACT_RESPONSES
+    if compact:
+        return encode_sse({
+            'type': 'done',
+            'timestamp': time.time(),
+            'conversation_delta': new_messages,
+            'sources': compact_sources(sources, private_settings.SOURCE_SNIPPET_CHARS)
+        })
+    return encode_sse({
+        'type': 'done',
+        'timestamp': time.time(),
+        'conversation': [{"role": msg.role, "content": msg.content} for msg in conversation.get_history()],
+        'sources': sources
+    })
 
-# Add this global variable to store the single conversation
-global_conversation: Optional[Conversation] = Conversation()
+def resolve_session_id(body_session_id: Optional[str], header_session_id: Optional[str]) -> str:
+    return body_session_id or header_session_id or uuid.uuid4().hex
+
+@asynccontextmanager
+async def request_conversation(session_id: str, messages: Optional[List[Dict[str, str]]] = None) -> AsyncIterator:
+    """
+    The conversation given by the request, or else the conversation of the session, held in the
+    store for the whole block so that it is not evicted while a response is streamed.
+    """
+    if messages:
+        conversation = new_conversation()
+        for msg in messages:
+            conversation.add_message(role=msg['role'], content=msg['content'])
+        yield conversation
+        return
+    async with conversation_store.session(session_id) as conversation:
+        yield conversation
+
+def request_id(trace) -> str:
+    return trace.trace_id or uuid.uuid4().hex
+
+def response_headers(session_id: str, trace, profile_id: Optional[str] = None) -> Dict[str, str]:
+    headers = {SESSION_HEADER: session_id}
+    if trace.trace_id:
+        headers[TRACE_HEADER] = trace.trace_id
+    if profile_id:
+        headers[PROFILE_ID_HEADER] = profile_id
+    return headers
 
 @router.post("/clean_conversation")
-async def clean_conversation():
-    global global_conversation
-    global_conversation = Conversation()
-    return {"message": "Conversation has been cleaned."}
+async def clean_conversation(
+    request: Optional[CleanConversationRequest] = None,
+    x_session_id: Optional[str] = Header(None)
+):
+    session_id = resolve_session_id(request.session_id if request else None, x_session_id)
+    await conversation_store.reset(session_id)
+    return {"message": "Conversation has been cleaned.", "session_id": session_id}
 
 @router.post("/setup_rag")
-async def setup_rag(config_data: dict = Body(...)):
-    global query_engine, domain_manager
+async def setup_rag(config_data: dict = Body(...), x_profile: Optional[str] = Header(None)):
+    with tracing.start_trace("POST /setup_rag") as root:
+        profile = profiling.start_profile(x_profile, "POST /setup_rag", request_id(root))
+        try:
+            return await _setup_rag(config_data)
+        finally:
+            if profile is not None:
+                profile.stop()
+
+async def _setup_rag(config_data: dict):
+    global query_engine, domain_manager, conversation_config
     
     try:
         # Merge public settings with incoming config_data
@@ -84,15 +190,9 @@ async def setup_rag(config_data: dict = Body(...)):
         domain_manager.apply_chunking_strategy()
         
         # Initialize the query engine with the components
-        query_engine = QueryEngine(
-            domain_manager=domain_manager,
-            vector_stores=domain_manager.vector_stores,
-            embedding_model=embedding_model,
-            chat_model=chat_model,
-            chunk_strategy=chunk_strategy,
-            query_optimizer=QueryOptimizer() if merged_config['query_engine'].get('USE_QUERY_OPTIMIZER', True) else None,
-            result_re_ranker=ResultReRanker() if merged_config['query_engine'].get('USE_RESULT_RE_RANKER', True) else None
-        )
+        query_engine = build_query_engine(merged_config, domain_manager, chat_model, embedding_model, chunk_strategy)
+        conversation_config = merged_config.get('conversation', {})
+        await conversation_store.clear()
         
         # Store the original config_data with timestamp
         timestamp = datetime.now().strftime("%Y%m%d%H%M%S")
@@ -125,72 +225,62 @@ async def get_setup_rag_template():
 @router.post("/ask")
 async def ask(
     request: AskRequest,
-    query_engine: QueryEngineInterface = Depends(get_query_engine)
+    query_engine: QueryEngineInterface = Depends(get_query_engine),
+    x_session_id: Optional[str] = Header(None),
+    x_profile: Optional[str] = Header(None)
 ):
     """
     Ask a question within a specific domain.
     """
     try:
-        global global_conversation
-        
-        if not request.conversation:
-            # Use the global conversation if the request doesn't provide one
-            if global_conversation is None:
-                global_conversation = Conversation()
-            conversation = global_conversation
-        else:
-            # Create a new Conversation instance with the provided messages
-            conversation = Conversation()
-            for msg in request.conversation:
-                conversation.add_message(role=msg['role'], content=msg['content'])
+        session_id = resolve_session_id(request.session_id, x_session_id)
+        # Ended by the content generator, once the response has been streamed
+        root = tracing.start_trace("POST /ask", session_id=session_id, model=request.genModel,
+                                   history_messages=len(request.conversation))
         
-        full_response = ""
-        sources = []
+        profile_id = request_id(root) if profiling.is_requested(x_profile) else None
         
         async def content_generator():
-            nonlocal full_response, sources
-            async for result in await query_engine.ask_question(
-                question=request.message,
-                model_name=request.genModel,
-                conversation=conversation,
-                domain_names=None,
-                stream=True
-            ):
-                if isinstance(result, tuple):
-                    chunk, chunk_sources = result
-                    if chunk_sources is not None:
-                        # This is the last message containing sources, don't yield the chunk
-                        sources = chunk_sources
-                        continue
-                else:
-                    # If it's not a tuple, it's just a chunk
-                    chunk = result
-
-                full_response += chunk
-                response = {
-                    'content': chunk, 
-                    'type': 'content',
-                    'timestamp': time.time()
-                }
-                logging.info(f"Yielding content: {response}")
-                yield f"data: {json.dumps(response)}\n\n"
-            
-            # Add the user's message to the conversation
-            conversation.add_message("User", request.message)
-
-            # Add the assistant's message to the conversation
-            global_conversation.add_message("Assistant", full_response)
-            
-            done_response = {
-                'type': 'done', 
-                'timestamp': time.time(),
-                'conversation': [{"role": msg.role, "content": msg.content} for msg in global_conversation.get_history()],
-                'sources': sources
-            }
-            yield f"data: {json.dumps(done_response)}\n\n"
+            # Profile from the generator: a response that is never streamed must not leave the profiler running
+            profile = profiling.start_profile(x_profile, "POST /ask", profile_id) if profile_id else None
+            try:
+                # The session conversation if the request doesn't provide one
+                async with request_conversation(session_id, request.conversation) as conversation:
+                    response_parts = []
+                    sources = []
+                    with tracing.use_span(root):
+                        results = await query_engine.ask_question(
+                            question=request.message,
+                            model_name=request.genModel,
+                            conversation=conversation,
+                            domain_names=None,
+                            stream=True
+                        )
+                    async for text in coalesce(split_sources(results, sources), STREAM_FLUSH_INTERVAL):
+                        response_parts.append(text)
+                        yield content_frame(text)
+                    full_response = "".join(response_parts)
+                    logger.debug(f"Streamed {len(response_parts)} frames, {len(full_response)} characters")
+                    root.set_attributes(frames=len(response_parts), response_chars=len(full_response), sources=len(sources))
+
+                    # Add the user's message to the conversation
+                    conversation.add_message("User", request.message)
+
+                    # Add the assistant's message to the conversation
+                    conversation.add_message("Assistant", full_response)
+
+                    new_messages = [{"role": "User", "content": request.message}, {"role": "Assistant", "content": full_response}]
+                    yield done_frame(conversation, new_messages, sources, request.compact)
+            except Exception as e:
+                root.record_error(e)
+                raise
+            finally:
+                root.end()
+                if profile is not None:
+                    profile.stop()
         
         logging.info("Successfully generated response, returning StreamingResponse")
-        return StreamingResponse(content_generator(), media_type="text/event-stream")
+        return StreamingResponse(content_generator(), media_type="text/event-stream", headers=response_headers(session_id, root, profile_id))
     except Exception as e:
         error_message = str(e)
         logging.error(f"Error in /ask endpoint: {error_message}")
@@ -199,61 +289,93 @@ async def ask(
 @router.post("/init")
 async def initialize(
     request: InitRequest,
-    query_engine: QueryEngineInterface = Depends(get_query_engine)
+    query_engine: QueryEngineInterface = Depends(get_query_engine),
+    x_session_id: Optional[str] = Header(None)
 ):
     """
     Initialize the chat model with the specified generation model.
     """
     try:
+        session_id = resolve_session_id(request.session_id, x_session_id)
+        root = tracing.start_trace("POST /init", session_id=session_id, model=request.genModel)
         init_prompt = private_settings.INIT_PROMPT
-        full_response = ""
-        sources = []
-
         async def content_generator():
-            nonlocal full_response, sources
-
-            async for result in await query_engine.send_initial_message(
-                model_name=request.genModel,
-                prompt=init_prompt,
-                stream=True
-            ):
-                if isinstance(result, tuple):
-                    chunk, chunk_sources = result
-                    if chunk_sources is not None:
-                        # This is the last message containing sources, don't yield the chunk
-                        sources = chunk_sources
-                        continue
-                else:
-                    # If it's not a tuple, it's just a chunk
-                    chunk = result
-
-                full_response += chunk
-                response = {
-                    'content': chunk, 
-                    'type': 'content',
-                    'timestamp': time.time()
-                }
-                logging.info(f"Yielding content: {response}")
-                yield f"data: {json.dumps(response)}\n\n"
-            
-            # Add the assistant's message to the conversation
-            global_conversation.add_message("Assistant", full_response)
-            
-            done_response = {
-                'type': 'done', 
-                'timestamp': time.time(),
-                'conversation': [{"role": msg.role, "content": msg.content} for msg in global_conversation.get_history()],
-                'sources': sources
-            }
-            yield f"data: {json.dumps(done_response)}\n\n"
+            try:
+                async with request_conversation(session_id) as conversation:
+                    response_parts = []
+                    sources = []
+                    with tracing.use_span(root):
+                        results = await query_engine.send_initial_message(
+                            model_name=request.genModel,
+                            prompt=init_prompt,
+                            stream=True
+                        )
+                    async for text in coalesce(split_sources(results, sources), STREAM_FLUSH_INTERVAL):
+                        response_parts.append(text)
+                        yield content_frame(text)
+                    full_response = "".join(response_parts)
+                    root.set_attributes(frames=len(response_parts), response_chars=len(full_response))
+
+                    # Add the assistant's message to the conversation
+                    conversation.add_message("Assistant", full_response)
+
+                    yield done_frame(conversation, [{"role": "Assistant", "content": full_response}], sources, request.compact)
+            except Exception as e:
+                root.record_error(e)
+                raise
+            finally:
+                root.end()
         
         logging.info("Successfully generated response, returning StreamingResponse")
-        return StreamingResponse(content_generator(), media_type="text/event-stream")
+        return StreamingResponse(content_generator(), media_type="text/event-stream", headers=response_headers(session_id, root))
     except Exception as e:
         error_message = str(e)
         logging.error(f"Error in /init endpoint: {error_message}")
         raise HTTPException(status_code=500, detail=error_message)
 
+@router.get("/chunks/{chunk_id}")
+async def get_chunk(chunk_id: str, domain_manager: DomainManagerInterface = Depends(get_domain_manager)):
+    """
+    Full text and metadata of a source chunk, e.g. from the ids of a compact response.
+    """
+    # Reads and decompresses archived records: off the event loop
+    chunk = (await asyncio.to_thread(domain_manager.get_chunks, [chunk_id])).get(chunk_id)
+    if chunk is None:
+        raise HTTPException(status_code=404, detail=f"Chunk '{chunk_id}' not found")
+    return chunk
+
+@router.post("/chunks")
+async def get_chunks(request: ChunksRequest, domain_manager: DomainManagerInterface = Depends(get_domain_manager)):
+    """
+    Full text and metadata of several source chunks, by id. The ids that are not found are listed in "missing".
+    """
+    if len(request.ids) > MAX_CHUNKS_PER_REQUEST:
+        raise HTTPException(status_code=400, detail=f"At most {MAX_CHUNKS_PER_REQUEST} chunks per request")
+    chunks = await asyncio.to_thread(domain_manager.get_chunks, request.ids)
+    return {"chunks": chunks, "missing": [chunk_id for chunk_id in request.ids if chunk_id not in chunks]}
+
+@router.get("/profiles")
+async def list_profiles():
+    """
+    List the saved request profiles, most recent first.
+    """
+    profiler = profiling.get_profiler()
+    if profiler is None:
+        raise HTTPException(status_code=404, detail="Profiling is disabled")
+    return {"profiles": profiler.list_profiles()}
+
+@router.get("/profiles/{name}")
+async def get_profile(name: str):
+    """
+    Download a profile (.prof, pstats format) or its summary (.txt).
+    """
+    profiler = profiling.get_profiler()
+    path = profiler.profile_path(name) if profiler is not None else None
+    if path is None:
+        raise HTTPException(status_code=404, detail="Profile not found")
+    media_type = "text/plain" if name.endswith(".txt") else "application/octet-stream"
+    return FileResponse(path, media_type=media_type, filename=name)
+
 @router.get("/rag_config")
 async def rag_config():
     """
@@ -278,6 +400,13 @@ async def rag_config():
         logger.error(f"Error retrieving RAG configuration: {str(e)}")
         raise HTTPException(status_code=500, detail="An error occurred while retrieving the configuration")
 
+@router.get("/metrics")
+async def metrics():
+    """
+    Latency histograms and counters in the Prometheus text format.
+    """
+    return Response(content=REGISTRY.render(), media_type=CONTENT_TYPE)
+
 def merge_configs(base_config: dict, new_config: dict) -> dict:
     """
     Merge two configuration dictionaries. If both dictionaries have the same key
@@ -0,0 +1,124 @@
+import asyncio
+import json
+import time
+from typing import Any, AsyncIterator, Dict, List, Optional, Tuple, Union
+
+# Server-Sent Events framing for the streaming endpoints.
+# Frames are built as bytes directly: content frames only json-encode the token itself.
+
+_CONTENT_PREFIX = b'data: {"content": '
+_CONTENT_SUFFIX = b', "type": "content", "timestamp": '
+_FRAME_END = b'}\n\n'
+
+def encode_sse(payload: Dict[str, Any]) -> bytes:
+    return b"data: " + json.dumps(payload).encode("utf-8") + b"\n\n"
+
+def content_frame(content: str) -> bytes:
+    """Same frame as encode_sse({'content': content, 'type': 'content', 'timestamp': time.time()})."""
+    return b"".join((_CONTENT_PREFIX, json.dumps(content).encode("utf-8"), _CONTENT_SUFFIX,
+                     repr(time.time()).encode("ascii"), _FRAME_END))
+
+def compact_sources(sources: List[Dict[str, Any]], snippet_chars: int) -> List[Dict[str, Any]]:
+    """
+    The sources given to the model in the prompt, without their text: id, domain, document and a
+    snippet. The full text is served by /chunks.
+    """
+    compact = []
+    for source in sources:
+        if not source.get("in_context", True):
+            continue
+        metadata = source.get("metadata") or {}
+        text = source.get("document") or ""
+        compact.append({
+            "id": source.get("id"),
+            "domain": source.get("domain"),
+            "document_id": metadata.get("document_id"),
+            "title": metadata.get("document_name"),
+            "distance": source.get("distance"),
+            "snippet": text if len(text) <= snippet_chars else text[:snippet_chars].rstrip() + "..."
+        })
+    return compact
+
+async def split_sources(results: AsyncIterator[Union[str, Tuple[str, Any]]], sources: List[Any]) -> AsyncIterator[str]:
+    """
+    Yield the text chunks of a query engine stream. The final (chunk, sources) item
+    is not yielded: its sources are appended to the given list.
+    """
+    async for result in results:
+        if isinstance(result, tuple):
+            chunk, chunk_sources = result
+            if chunk_sources is not None:
+                # This is the last message containing sources, don't yield the chunk
+                sources.extend(chunk_sources)
+                continue
+        else:
+            # If it's not a tuple, it's just a chunk
+            chunk = result
+        if chunk:
+            yield chunk
+
+async def coalesce(chunks: AsyncIterator[str], flush_interval: float) -> AsyncIterator[str]:
+    """
+    Group the chunks received within flush_interval seconds into a single chunk.
+
+    A chunk is held back at most flush_interval seconds: the buffer is flushed when the
+    interval has elapsed, even if the model stalls, and at the end of the stream. With a
+    flush_interval of 0 every chunk is passed through.
+    """
+    if flush_interval <= 0:
+        async for chunk in chunks:
+            yield chunk
+        return
+
+    # The stream is read by a task that fills the buffer; this generator wakes up once per flush,
+    # when the interval has elapsed (on a timer if the model stalls) or the stream ends
+    loop = asyncio.get_running_loop()
+    buffer: List[str] = []
+    last_flush = time.monotonic()
+    wakeup: Optional[asyncio.Future] = None
+    timer: Optional[asyncio.TimerHandle] = None
+    ended = False
+    error: Optional[Exception] = None
+
+    def wake() -> None:
+        if wakeup is not None and not wakeup.done():
+            wakeup.set_result(None)
+
+    async def read() -> None:
+        nonlocal timer, ended, error
+        try:
+            async for chunk in chunks:
+                buffer.append(chunk)
+                delay = last_flush + flush_interval - time.monotonic()
+                if delay <= 0:
+                    wake()
+                elif timer is None:
+                    timer = loop.call_later(delay, wake)
+        except Exception as e:
+            error = e
+        ended = True
+        wake()
+
+    reader = asyncio.ensure_future(read())
+    try:
+        while True:
+            wakeup = loop.create_future()
+            if not ended and not (buffer and time.monotonic() - last_flush >= flush_interval):
+                await wakeup
+            if timer is not None:
+                timer.cancel()
+                timer = None
+            if buffer:
+                text = "".join(buffer)
+                buffer.clear()
+                last_flush = time.monotonic()
+                yield text
+            if ended:
+                break
+        if error is not None:
+            raise error
+    finally:
+        # Stops reading when the client goes away
+        reader.cancel()
+        if timer is not None:
+            timer.cancel()
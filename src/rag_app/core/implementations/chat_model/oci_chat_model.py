@@ -1,4 +1,5 @@
 import logging
+import time
 from abc import ABC, abstractmethod
 from langchain_community.chat_models import ChatOCIGenAI
 from langchain_core.prompts import PromptTemplate
@@ -7,15 +8,20 @@ import oci
 from rag_app.core.interfaces.chat_model_interface import ChatModelInterface
 from ...interfaces.conversation_interface import ConversationInterface
 from rag_app.core.implementations.conversation.conversation import Conversation
+from rag_app.core.implementations.context_builder.token_counter import estimate_tokens, CHARS_PER_TOKEN
+from rag_app.metrics import CHAT_SECONDS
+from rag_app import tracing
 
 # Enable debug logging for the entire oci package
 #logging.getLogger('oci').setLevel(logging.DEBUG)
 
-# Enable request logging
-oci.base_client.is_http_log_enabled(True)
-
 logger = logging.getLogger(__name__)
 
+def enable_http_log(settings: dict):
+    # Request logging of the oci SDK is global to the process: only enabled on request
+    if settings.get("OCI_HTTP_LOG", False):
+        oci.base_client.is_http_log_enabled(True)
+
 class ChatModel(ChatModelInterface):
     @abstractmethod
     def __init__(self):
@@ -27,43 +33,77 @@ class ChatModel(ChatModelInterface):
         pass
 
     async def chat(self, system_prompt: str, query: str, conversation: Optional[ConversationInterface] = Conversation(), stream: bool = False) -> Union[str, AsyncIterator[str]]:
+        start = time.perf_counter()
         prompt_template = f"{system_prompt}\n\n"
         
-        if conversation:
-            prompt_template += f"{conversation.get_formatted_history()}\n\n"
+        # Format the history once, it is only logged at debug level
+        history = conversation.get_formatted_history() if conversation else ""
+        if history:
+            prompt_template += f"{history}\n\n"
         
         prompt_template += "User: {query}\n\nAssistant:"
         prompt = PromptTemplate(input_variables=["query"], template=prompt_template)
         
         # Log the final prompt
-        logger.info(f"History: {conversation.get_formatted_history()}\n\n")
-        logger.info(f"Final prompt: {prompt.format(query=query)}")
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug(f"History: {history}\n\n")
+            logger.debug(f"Final prompt: {prompt.format(query=query)}")
         
         llm_chain = prompt | self.llm
+        # Ended by the response methods, when the response has been received or fully streamed
+        span = tracing.start_span("chat_model.chat", model=self.__class__.__name__, stream=stream)
+        if span.is_recording:
+            span.set_attribute("prompt_tokens", estimate_tokens(prompt_template) + estimate_tokens(query))
 
         if stream:
-            return self._stream_response(llm_chain, query)
+            return self._stream_response(llm_chain, query, start, span)
         else:
-            return await self._generate_response(llm_chain, query)
+            return await self._generate_response(llm_chain, query, start, span)
 
-    async def _generate_response(self, llm_chain, query: str) -> str:
+    async def _generate_response(self, llm_chain, query: str, start: float, span=tracing.NOOP_SPAN) -> str:
         logger.info(f"Generating response with {self.__class__.__name__} for query: {query[:50]}...")
-        response = await llm_chain.ainvoke(query)
+        try:
+            response = await llm_chain.ainvoke(query)
+        except Exception as e:
+            span.record_error(e)
+            raise
+        finally:
+            span.end()
+        CHAT_SECONDS.observe(time.perf_counter() - start, model=self.__class__.__name__, phase="total")
         
         return response
 
-    async def _stream_response(self, llm_chain, query: str) -> AsyncIterator[str]:
+    async def _stream_response(self, llm_chain, query: str, start: float, span=tracing.NOOP_SPAN) -> AsyncIterator[str]:
         logger.info(f"Streaming response with {self.__class__.__name__} for query: {query[:50]}...")
-        full_response = ""
         
-        async for chunk in llm_chain.astream(query):
-            if chunk.content is not None:
-                full_response += chunk.content
-                yield chunk.content
+        model = self.__class__.__name__
+        first_token = True
+        chunks = 0
+        output_chars = 0
+        try:
+            async for chunk in llm_chain.astream(query):
+                if chunk.content is not None:
+                    if first_token:
+                        first_token_seconds = time.perf_counter() - start
+                        CHAT_SECONDS.observe(first_token_seconds, model=model, phase="first_token")
+                        span.set_attribute("first_token_ms", round(first_token_seconds * 1000, 3))
+                        first_token = False
+                    chunks += 1
+                    output_chars += len(chunk.content)
+                    yield chunk.content
+            CHAT_SECONDS.observe(time.perf_counter() - start, model=model, phase="total")
+        except Exception as e:
+            span.record_error(e)
+            raise
+        finally:
+            # Also reached when the client disconnects and the stream is closed
+            span.set_attributes(chunks=chunks, output_chars=output_chars, output_tokens=-(-output_chars // CHARS_PER_TOKEN))
+            span.end()
 
 class OCI_CommandRplus(ChatModel, ChatModelInterface):
     def __init__(self, settings: dict):
         logger.info("Initializing OCI_CommandRplus chat model")
+        enable_http_log(settings)
         
         # Use the settings dictionary to fetch parameters
         llm_params = {
@@ -88,6 +128,7 @@ class OCI_CommandRplus(ChatModel, ChatModelInterface):
 class OCI_Llama3_70(ChatModel, ChatModelInterface):
     def __init__(self, settings: dict):
         logger.info("Initializing OCI_Llama3-70 chat model")
+        enable_http_log(settings)
         llm_params = {
             "model_id": settings["MODEL_ID_LLAMA3"],
             "service_endpoint": settings["OCI_GENAI_ENDPOINT"],
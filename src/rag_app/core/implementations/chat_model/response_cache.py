@@ -0,0 +1,247 @@
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, AsyncIterator, Dict, List, Optional, Tuple, Union
+from ...interfaces.chat_model_interface import ChatModelInterface
+from ...interfaces.conversation_interface import ConversationInterface
+from ....metrics import CACHE_LOOKUPS
+
+logger = logging.getLogger(__name__)
+
+ENTRY_SUFFIX = ".json"
+
+class ResponseCache:
+    """
+    Chat responses by key, as the list of streamed tokens: a memory LRU of max_entries entries
+    in front of an optional directory of JSON files bounded by max_disk_bytes (oldest files evicted).
+    Entries older than ttl seconds are not returned.
+
+    get() and put() are blocking; lookup() and store() are their coroutine versions, which do
+    the file I/O in a worker thread (store() does not wait for the write).
+    """
+
+    def __init__(self, max_entries: int = 1000, ttl: Optional[float] = 86400,
+                 directory: Optional[str] = None, max_disk_bytes: int = 256 * 1024 ** 2):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.directory = directory
+        self.max_disk_bytes = max_disk_bytes
+        self._lock = threading.Lock()
+        # Key -> (creation time, tokens), least recently used first
+        self._memory: "OrderedDict[str, Tuple[float, List[str]]]" = OrderedDict()
+        # Entry file path -> size, oldest first; the directory is only scanned here
+        self._files: "OrderedDict[str, int]" = OrderedDict()
+        self._disk_bytes = 0
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+            self._scan_disk()
+
+    def _expired(self, created: float) -> bool:
+        return self.ttl is not None and time.time() - created > self.ttl
+
+    def get(self, key: str) -> Optional[List[str]]:
+        tokens = self._get_memory(key)
+        return tokens if tokens is not None else self._get_disk(key)
+
+    def put(self, key: str, tokens: List[str]) -> None:
+        entry = (time.time(), list(tokens))
+        self._remember(key, entry)
+        self._write(key, entry)
+
+    async def lookup(self, key: str) -> Optional[List[str]]:
+        tokens = self._get_memory(key)
+        if tokens is None and self.directory:
+            tokens = await asyncio.to_thread(self._get_disk, key)
+        return tokens
+
+    async def store(self, key: str, tokens: List[str]) -> None:
+        entry = (time.time(), list(tokens))
+        self._remember(key, entry)
+        if self.directory:
+            # Written in the background: the response does not wait for the disk
+            asyncio.get_running_loop().run_in_executor(None, self._write, key, entry)
+
+    def _get_memory(self, key: str) -> Optional[List[str]]:
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is None:
+                return None
+            if not self._expired(entry[0]):
+                self._memory.move_to_end(key)
+                return entry[1]
+            del self._memory[key]
+            return None
+
+    def _get_disk(self, key: str) -> Optional[List[str]]:
+        entry = self._read(key)
+        if entry is None:
+            return None
+        self._remember(key, entry)
+        return entry[1]
+
+    def _remember(self, key: str, entry: Tuple[float, List[str]]) -> None:
+        with self._lock:
+            self._memory[key] = entry
+            self._memory.move_to_end(key)
+            while len(self._memory) > self.max_entries:
+                self._memory.popitem(last=False)
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.directory, key + ENTRY_SUFFIX)
+
+    def _read(self, key: str) -> Optional[Tuple[float, List[str]]]:
+        if not self.directory:
+            return None
+        path = self._path(key)
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                entry = json.load(f)
+        except FileNotFoundError:
+            return None
+        except (OSError, ValueError) as e:
+            logger.warning(f"Ignoring unreadable response cache entry {path}: {e}")
+            return None
+        if self._expired(entry["created"]):
+            self._remove(path)
+            return None
+        return entry["created"], entry["tokens"]
+
+    def _write(self, key: str, entry: Tuple[float, List[str]]) -> None:
+        if not self.directory:
+            return
+        path = self._path(key)
+        temporary_path = f"{path}.{threading.get_ident()}.tmp"
+        try:
+            with open(temporary_path, "w", encoding="utf-8") as f:
+                json.dump({"created": entry[0], "tokens": entry[1]}, f, ensure_ascii=False, separators=(",", ":"))
+                size = f.tell()
+            os.replace(temporary_path, path)
+        except OSError as e:
+            logger.warning(f"Could not write response cache entry {path}: {e}")
+            return
+        with self._lock:
+            self._disk_bytes += size - self._files.pop(path, 0)
+            self._files[path] = size
+        self._evict_disk()
+
+    def _scan_disk(self) -> None:
+        files = []
+        with os.scandir(self.directory) as entries:
+            for entry in entries:
+                if entry.name.endswith(ENTRY_SUFFIX) and entry.is_file():
+                    stat = entry.stat()
+                    files.append((stat.st_mtime, stat.st_size, entry.path))
+        for _, size, path in sorted(files):
+            self._files[path] = size
+        self._disk_bytes = sum(self._files.values())
+        # max_disk_bytes may have been lowered since the last run
+        self._evict_disk()
+
+    def _evict_disk(self) -> None:
+        evicted = []
+        with self._lock:
+            while self._disk_bytes > self.max_disk_bytes and self._files:
+                path, size = self._files.popitem(last=False)
+                self._disk_bytes -= size
+                evicted.append(path)
+        for path in evicted:
+            self._remove(path)
+
+    def _remove(self, path: str) -> None:
+        with self._lock:
+            self._disk_bytes -= self._files.pop(path, 0)
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+class CachedChatModel(ChatModelInterface):
+    """
+    Chat model answering repeated prompts from a ResponseCache.
+
+    The key is a hash of the model parameters and of what the prompt is rendered from (system
+    prompt, conversation history, question). A cached response is replayed as the same token
+    stream, so streaming clients see no difference. Only complete streams are cached: a response
+    interrupted by an error or a client disconnect is not.
+
+    :param chat_model: The chat model to call on a miss.
+    :param cache: The response cache.
+    :param parameters: The model parameters (model id, temperature, ...), part of the key.
+    """
+
+    def __init__(self, chat_model: ChatModelInterface, cache: ResponseCache, parameters: Dict[str, Any]):
+        self.chat_model = chat_model
+        self.cache = cache
+        self.model_key = json.dumps({"model": type(chat_model).__name__, "parameters": parameters}, sort_keys=True, default=str)
+
+    def __getattr__(self, name: str):
+        # llm and the other attributes of the wrapped model
+        if name == "chat_model":
+            raise AttributeError(name)
+        return getattr(self.chat_model, name)
+
+    def cache_key(self, system_prompt: str, query: str, conversation: Optional[ConversationInterface]) -> str:
+        history = conversation.get_formatted_history() if conversation else ""
+        digest = hashlib.sha256(self.model_key.encode("utf-8"))
+        for part in (system_prompt, history, query):
+            # Length-prefixed: the parts cannot be shifted into one another
+            encoded = part.encode("utf-8")
+            digest.update(len(encoded).to_bytes(8, "little"))
+            digest.update(encoded)
+        return digest.hexdigest()
+
+    async def chat(self, system_prompt: str, query: str, conversation: Optional[ConversationInterface] = None,
+                   stream: bool = False) -> Union[str, AsyncIterator[str]]:
+        key = self.cache_key(system_prompt, query, conversation)
+        tokens = await self.cache.lookup(key)
+        if tokens is not None:
+            CACHE_LOOKUPS.inc(cache="chat_response", result="hit")
+            logger.info(f"Chat response served from the cache for query: {query[:50]}...")
+            return self._replay(tokens) if stream else "".join(tokens)
+
+        CACHE_LOOKUPS.inc(cache="chat_response", result="miss")
+        response = await self.chat_model.chat(system_prompt, query, conversation=conversation, stream=stream)
+        if stream:
+            return self._record(key, response)
+        # A string either way, as on a hit
+        content = response.content if hasattr(response, "content") else str(response)
+        await self.cache.store(key, [content])
+        return content
+
+    @staticmethod
+    async def _replay(tokens: List[str]) -> AsyncIterator[str]:
+        for token in tokens:
+            yield token
+
+    async def _record(self, key: str, response: AsyncIterator[str]) -> AsyncIterator[str]:
+        tokens = []
+        async for token in response:
+            tokens.append(token)
+            yield token
+        # Not reached when the stream fails or is closed early
+        await self.cache.store(key, tokens)
+
+def cached_chat_model(chat_model: ChatModelInterface, chat_model_config: Dict[str, Any], settings: Dict[str, Any]) -> ChatModelInterface:
+    """
+    chat_model behind a response cache when the response_cache settings enable it and the
+    generation is close to deterministic (TEMPERATURE at most MAX_TEMPERATURE).
+    """
+    if not settings.get("ENABLED", False):
+        return chat_model
+    temperature = chat_model_config.get("TEMPERATURE")
+    if temperature is not None and temperature > settings.get("MAX_TEMPERATURE", 0.1):
+        logger.info(f"Chat response cache disabled: TEMPERATURE {temperature} is above {settings.get('MAX_TEMPERATURE', 0.1)}")
+        return chat_model
+    cache = ResponseCache(
+        max_entries=settings.get("MAX_ENTRIES", 1000),
+        ttl=settings.get("TTL_SECONDS", 86400),
+        directory=settings.get("DIRECTORY"),
+        max_disk_bytes=settings.get("MAX_DISK_MB", 256) * 1024 ** 2
+    )
+    logger.info(f"Chat responses cached ({cache.max_entries} in memory, directory: {cache.directory})")
+    return CachedChatModel(chat_model, cache, chat_model_config)
@@ -0,0 +1,158 @@
+from typing import List, Dict, Any, Callable, Optional, Set, Tuple
+import logging
+from ...interfaces.context_builder_interface import ContextBuilderInterface
+from .token_counter import estimate_tokens
+
+logger = logging.getLogger(__name__)
+
+class ContextBuilder(ContextBuilderInterface):
+    """
+    Packs re-ranked results into a token budget.
+
+    Overlapping or adjacent chunks of the same document are merged back into a
+    single passage (using the start/end metadata written by the chunk strategies),
+    near-duplicate passages are dropped and the budget is filled greedily by score.
+    """
+
+    def __init__(self, max_tokens: int = 1500, duplicate_threshold: float = 0.9,
+                 token_counter: Callable[[str], int] = estimate_tokens):
+        if max_tokens <= 0:
+            raise ValueError("max_tokens must be a positive integer")
+        self.max_tokens = max_tokens
+        self.duplicate_threshold = duplicate_threshold
+        self.token_counter = token_counter
+
+    def build(self, results: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        passages = self._merge_chunks(results)
+        passages.sort(key=self._sort_key)
+
+        selected = []
+        selected_shingles: List[Set[Tuple[str, ...]]] = []
+        used_tokens = 0
+
+        for passage in passages:
+            shingles = self._shingles(passage["document"])
+            tokens = self.token_counter(passage["document"])
+
+            duplicate_of = next((i for i, other in enumerate(selected_shingles) if self._is_duplicate(shingles, other)), None)
+            if duplicate_of is not None:
+                # Prefer the larger of two near-duplicates (e.g. a merged passage over one of its chunks) if it fits
+                kept_tokens = self.token_counter(selected[duplicate_of]["document"])
+                if len(shingles) > len(selected_shingles[duplicate_of]) and used_tokens - kept_tokens + tokens <= self.max_tokens:
+                    passage["distance"] = min(passage.get("distance", float("inf")), selected[duplicate_of].get("distance", float("inf")))
+                    selected[duplicate_of] = passage
+                    selected_shingles[duplicate_of] = shingles
+                    used_tokens += tokens - kept_tokens
+                else:
+                    logger.debug(f"Dropping near-duplicate passage {passage['id']}")
+                continue
+
+            remaining = self.max_tokens - used_tokens
+            if tokens > remaining:
+                if selected:
+                    continue
+                # Nothing fits yet: keep the best passage, truncated to the budget
+                passage["document"] = passage["document"][:len(passage["document"]) * remaining // tokens]
+                tokens = self.token_counter(passage["document"])
+
+            selected.append(passage)
+            selected_shingles.append(shingles)
+            used_tokens += tokens
+            if used_tokens >= self.max_tokens:
+                break
+
+        logger.info(f"Built context from {len(results)} results: {len(passages)} passages after merging, "
+                    f"{len(selected)} selected, ~{used_tokens}/{self.max_tokens} tokens")
+        return selected
+
+    @staticmethod
+    def _sort_key(passage: Dict[str, Any]):
+        # Keep the re-ranker order when it provides one (e.g. MMR), then higher score, then lower distance
+        if passage.get("rank") is not None:
+            return passage["rank"]
+        if passage.get("score") is not None:
+            return -passage["score"]
+        return passage.get("distance", 0.0)
+
+    def _merge_chunks(self, results: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        groups: Dict[Tuple[Any, Any], List[Dict[str, Any]]] = {}
+        passages = []
+
+        for result in results:
+            metadata = result.get("metadata") or {}
+            document_id = metadata.get("document_id")
+            if document_id is None or self._span(metadata) is None:
+                passages.append(self._new_passage(result))
+                continue
+            groups.setdefault((result.get("domain"), document_id), []).append(result)
+
+        for group in groups.values():
+            group.sort(key=lambda r: self._span(r["metadata"])[1])
+            current = None
+            for result in group:
+                if current is not None and self._try_merge(current, result):
+                    continue
+                current = self._new_passage(result)
+                passages.append(current)
+
+        return passages
+
+    @staticmethod
+    def _span(metadata: Dict[str, Any]) -> Optional[Tuple[str, int]]:
+        if "start" in metadata:
+            return "chars", metadata["start"]
+        if "start_sentence" in metadata:
+            return "sentences", metadata["start_sentence"]
+        return None
+
+    @staticmethod
+    def _new_passage(result: Dict[str, Any]) -> Dict[str, Any]:
+        passage = dict(result)
+        passage["ids"] = [result.get("id")]
+        passage["metadata"] = dict(result.get("metadata") or {})
+        metadata = passage["metadata"]
+        if "start" in metadata:
+            # The fixed size strategy records start + chunk_size as end, even for the last chunk
+            metadata["end"] = metadata["start"] + len(result["document"])
+        return passage
+
+    def _try_merge(self, passage: Dict[str, Any], result: Dict[str, Any]) -> bool:
+        metadata = passage["metadata"]
+        other = result["metadata"]
+        text = result["document"]
+
+        if "start" in metadata:
+            if other["start"] > metadata["end"]:
+                return False
+            overlap = metadata["end"] - other["start"]
+            if overlap < len(text):
+                passage["document"] += text[overlap:]
+                metadata["end"] = other["start"] + len(text)
+        else:
+            if other["start_sentence"] > metadata["end_sentence"] + 1:
+                return False
+            if other["end_sentence"] > metadata["end_sentence"]:
+                passage["document"] += ". " + text
+                metadata["end_sentence"] = other["end_sentence"]
+
+        passage["ids"].append(result.get("id"))
+        if result.get("rank") is not None:
+            passage["rank"] = min(r for r in (passage.get("rank"), result["rank"]) if r is not None)
+        passage["distance"] = min(passage.get("distance", float("inf")), result.get("distance", float("inf")))
+        if result.get("score") is not None:
+            passage["score"] = max(s for s in (passage.get("score"), result["score"]) if s is not None)
+        return True
+
+    @staticmethod
+    def _shingles(text: str, size: int = 3) -> Set[Tuple[str, ...]]:
+        words = text.lower().split()
+        if len(words) < size:
+            return {tuple(words)}
+        return {tuple(words[i:i + size]) for i in range(len(words) - size + 1)}
+
+    def _is_duplicate(self, a: Set[Tuple[str, ...]], b: Set[Tuple[str, ...]]) -> bool:
+        smallest = min(len(a), len(b))
+        if smallest == 0:
+            return len(a) == len(b)
+        # Containment rather than Jaccard, so a chunk fully contained in a larger passage counts as a duplicate
+        return len(a & b) / smallest >= self.duplicate_threshold
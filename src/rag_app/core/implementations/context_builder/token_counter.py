@@ -0,0 +1,10 @@
+import math
+
+# Average number of characters per token for English text with the
+# Cohere / Llama tokenizers. Good enough for budgeting, no tokenizer needed.
+CHARS_PER_TOKEN = 4
+
+def estimate_tokens(text: str) -> int:
+    if not text:
+        return 0
+    return math.ceil(len(text) / CHARS_PER_TOKEN)
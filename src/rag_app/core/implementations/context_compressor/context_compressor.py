@@ -0,0 +1,157 @@
+from typing import List, Dict, Any, Callable, Optional, Tuple
+from collections import OrderedDict
+import logging
+import re
+import threading
+import numpy as np
+from ...interfaces.context_compressor_interface import ContextCompressorInterface
+from ...interfaces.embedding_model_interface import EmbeddingModelInterface
+from ..context_builder.token_counter import estimate_tokens
+from ....metrics import CACHE_LOOKUPS
+
+logger = logging.getLogger(__name__)
+
+_SENTENCE_BOUNDARY = re.compile(r'(?<=[.!?])\s+|\n+')
+
+class SentenceEmbeddingCache:
+    """Thread-safe LRU cache of sentence embeddings, shared across requests."""
+
+    def __init__(self, max_entries: int = 10000):
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[Tuple[str, str], np.ndarray]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, model_name: str, sentence: str) -> Optional[np.ndarray]:
+        key = (model_name, sentence)
+        with self._lock:
+            embedding = self._entries.get(key)
+            if embedding is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return embedding
+
+    def put(self, model_name: str, sentence: str, embedding: np.ndarray) -> None:
+        if self.max_entries <= 0:
+            return
+        key = (model_name, sentence)
+        with self._lock:
+            self._entries[key] = embedding
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+class SentenceContextCompressor(ContextCompressorInterface):
+    """
+    Query-aware extractive compression of the prompt context.
+
+    The passages are split into sentences, every sentence is scored by cosine
+    similarity to the query embedding and the best sentences are kept, in their
+    original order, until the budget is reached. Uncached sentences are embedded
+    in a single batched call.
+    """
+
+    def __init__(self, embedding_model: EmbeddingModelInterface, max_tokens: int = 750, ratio: float = 0.5,
+                 cache: Optional[SentenceEmbeddingCache] = None,
+                 token_counter: Callable[[str], int] = estimate_tokens):
+        if max_tokens <= 0:
+            raise ValueError("max_tokens must be a positive integer")
+        if not 0 < ratio <= 1:
+            raise ValueError("ratio must be in (0, 1]")
+        self.embedding_model = embedding_model
+        self.max_tokens = max_tokens
+        self.ratio = ratio
+        self.cache = cache if cache is not None else SentenceEmbeddingCache()
+        self.token_counter = token_counter
+
+    @staticmethod
+    def split_sentences(text: str) -> List[str]:
+        return [sentence.strip() for sentence in _SENTENCE_BOUNDARY.split(text) if sentence.strip()]
+
+    def compress(self, passages: List[Dict[str, Any]], question: str, query_embedding: List[float]) -> List[Dict[str, Any]]:
+        sentences: List[str] = []
+        owners: List[int] = []
+        for passage_idx, passage in enumerate(passages):
+            for sentence in self.split_sentences(passage["document"]):
+                sentences.append(sentence)
+                owners.append(passage_idx)
+
+        if not sentences:
+            return passages
+
+        tokens = np.array([self.token_counter(sentence) for sentence in sentences])
+        total_tokens = int(tokens.sum())
+        budget = min(self.max_tokens, max(1, int(total_tokens * self.ratio)))
+        if total_tokens <= budget:
+            return passages
+
+        scores = self._score(sentences, query_embedding)
+
+        keep = np.zeros(len(sentences), dtype=bool)
+        used_tokens = 0
+        for idx in np.argsort(-scores, kind="stable"):
+            if used_tokens + tokens[idx] > budget:
+                continue
+            keep[idx] = True
+            used_tokens += int(tokens[idx])
+
+        kept_sentences: Dict[int, List[str]] = {}
+        for idx in np.flatnonzero(keep):
+            kept_sentences.setdefault(owners[idx], []).append(sentences[idx])
+
+        if not kept_sentences:
+            # Every sentence is longer than the budget: keep the best one, cut to the budget
+            best = int(np.argmax(scores))
+            truncated = self._truncate(sentences[best], budget)
+            kept_sentences[owners[best]] = [truncated]
+            keep[best] = True
+            used_tokens = self.token_counter(truncated)
+
+        compressed = []
+        for passage_idx, passage in enumerate(passages):
+            if passage_idx not in kept_sentences:
+                continue
+            compressed.append({**passage, "document": " ".join(kept_sentences[passage_idx])})
+
+        logger.info(f"Compressed context from ~{total_tokens} to ~{used_tokens} tokens "
+                    f"({int(keep.sum())}/{len(sentences)} sentences, {len(compressed)}/{len(passages)} passages)")
+        return compressed
+
+    def _truncate(self, sentence: str, budget: int) -> str:
+        words = sentence.split()
+        # Cut proportionally, then drop words until the counter agrees (at least one word is kept)
+        words = words[:max(1, len(words) * budget // max(1, self.token_counter(sentence)))]
+        while len(words) > 1 and self.token_counter(" ".join(words)) > budget:
+            words.pop()
+        return " ".join(words)
+
+    def _score(self, sentences: List[str], query_embedding: List[float]) -> np.ndarray:
+        embeddings = self._embed(sentences)
+        query = np.asarray(query_embedding, dtype=np.float32)
+        norms = np.linalg.norm(embeddings, axis=1) * np.linalg.norm(query)
+        return (embeddings @ query) / np.maximum(norms, 1e-12)
+
+    def _embed(self, sentences: List[str]) -> np.ndarray:
+        model_name = self.embedding_model.model_name
+        cached = [self.cache.get(model_name, sentence) for sentence in sentences]
+        missing = list(dict.fromkeys(sentence for sentence, embedding in zip(sentences, cached) if embedding is None))
+        hits = sum(embedding is not None for embedding in cached)
+        CACHE_LOOKUPS.inc(hits, cache="sentence_embedding", result="hit")
+        CACHE_LOOKUPS.inc(len(sentences) - hits, cache="sentence_embedding", result="miss")
+        logger.debug(f"Sentence embeddings: {hits} cached, {len(missing)} to compute")
+
+        if missing:
+            new_embeddings = np.asarray(self.embedding_model.generate_embedding(missing), dtype=np.float32)
+            # generate_embedding returns a flat vector when given a single text
+            new_embeddings = new_embeddings.reshape(len(missing), -1)
+            fresh = dict(zip(missing, new_embeddings))
+            for sentence, embedding in fresh.items():
+                self.cache.put(model_name, sentence, embedding)
+            cached = [embedding if embedding is not None else fresh[sentence] for sentence, embedding in zip(sentences, cached)]
+        return np.vstack(cached)
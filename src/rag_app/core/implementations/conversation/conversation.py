@@ -1,5 +1,7 @@
-from typing import List
+from typing import List, Optional, Callable, Deque, Dict, Any
+from collections import deque
 from ...interfaces.conversation_interface import ConversationInterface, Message
+from ..context_builder.token_counter import estimate_tokens
 
 class Conversation(ConversationInterface):
     def __init__(self, initial_messages: List[Message] = None):
@@ -21,3 +23,135 @@ class Conversation(ConversationInterface):
         filtered_messages = [msg for msg in self.history if msg.role == role]
         last_n_messages = filtered_messages[-n:] if filtered_messages else []
         return "\n".join([f"{msg.role}: {msg.content}" for msg in last_n_messages]) or "No messages found."
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {"messages": [msg.model_dump() for msg in self.history]}
+
+    def load_dict(self, data: Dict[str, Any]) -> None:
+        self.history = [Message(**msg) for msg in data.get("messages", [])]
+
+def summarize_messages(summary: str, messages: List[Message], max_chars_per_message: int = 200) -> str:
+    """
+    Default extractive summarizer: keeps the first sentence of every evicted message.
+    """
+    parts = [summary] if summary else []
+    for msg in messages:
+        first_sentence = msg.content.strip().split(". ", 1)[0].replace("\n", " ")
+        if len(first_sentence) > max_chars_per_message:
+            first_sentence = first_sentence[:max_chars_per_message].rstrip() + "..."
+        parts.append(f"{msg.role}: {first_sentence}")
+    return " | ".join(parts)
+
+class WindowedConversation(ConversationInterface):
+    """
+    Conversation bounded by a token and/or turn budget.
+
+    Only the most recent messages are kept. The formatted history is maintained
+    incrementally as messages are added and evicted, and evicted messages are
+    folded into a rolling summary capped at summary_max_tokens, so the history
+    added to each prompt stays roughly constant in size.
+    """
+
+    def __init__(self, max_tokens: Optional[int] = 2000, max_turns: Optional[int] = 10, summary_max_tokens: int = 300,
+                 summarizer: Callable[[str, List[Message]], str] = summarize_messages,
+                 token_counter: Callable[[str], int] = estimate_tokens,
+                 initial_messages: List[Message] = None):
+        self.max_tokens = max_tokens
+        # A turn is a user message and the assistant reply
+        self.max_messages = max_turns * 2 if max_turns else None
+        self.summary_max_tokens = summary_max_tokens
+        self.summarizer = summarizer
+        self.token_counter = token_counter
+
+        self._messages: Deque[Message] = deque()
+        self._lines: Deque[str] = deque()
+        self._line_tokens: Deque[int] = deque()
+        self._window_tokens = 0
+        self._window_text = ""
+        self._formatted: Optional[str] = ""
+        self.summary = ""
+
+        for msg in initial_messages or []:
+            self.add_message(msg.role, msg.content)
+
+    def add_message(self, role: str, content: str) -> None:
+        line = f"{role}: {content}"
+        self._messages.append(Message(role=role, content=content))
+        self._lines.append(line)
+        self._line_tokens.append(self.token_counter(line))
+        self._window_tokens += self._line_tokens[-1]
+        self._window_text = f"{self._window_text}\n{line}" if len(self._lines) > 1 else line
+
+        evicted = []
+        while len(self._messages) > 1 and self._over_budget():
+            evicted.append(self._messages.popleft())
+            evicted_line = self._lines.popleft()
+            self._window_tokens -= self._line_tokens.popleft()
+            self._window_text = self._window_text[len(evicted_line) + 1:]
+        if evicted:
+            self._update_summary(evicted)
+
+        self._formatted = None
+
+    def _over_budget(self) -> bool:
+        if self.max_messages is not None and len(self._messages) > self.max_messages:
+            return True
+        return self.max_tokens is not None and self._window_tokens > self.max_tokens
+
+    def _update_summary(self, evicted: List[Message]) -> None:
+        summary = self.summarizer(self.summary, evicted)
+        tokens = self.token_counter(summary)
+        while tokens > self.summary_max_tokens:
+            # Drop the oldest part of the summary, in proportion to the tokens over the budget
+            keep = int(len(summary) * self.summary_max_tokens / tokens) - 3
+            summary = "..." + summary[-keep:] if keep > 0 else ""
+            tokens = self.token_counter(summary)
+        self.summary = summary
+
+    def get_history(self) -> List[Message]:
+        return list(self._messages)
+
+    def get_formatted_history(self) -> str:
+        if self._formatted is None:
+            if self.summary:
+                self._formatted = f"Summary of the earlier conversation: {self.summary}\n{self._window_text}"
+            else:
+                self._formatted = self._window_text
+        return self._formatted
+
+    def clear(self) -> None:
+        self._messages.clear()
+        self._lines.clear()
+        self._line_tokens.clear()
+        self._window_tokens = 0
+        self._window_text = ""
+        self._formatted = ""
+        self.summary = ""
+
+    def get_last_n_messages_by_role(self, role: str, n: int) -> str:
+        filtered_messages = [msg for msg in self._messages if msg.role == role]
+        last_n_messages = filtered_messages[-n:] if filtered_messages else []
+        return "\n".join([f"{msg.role}: {msg.content}" for msg in last_n_messages]) or "No messages found."
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {"messages": [msg.model_dump() for msg in self._messages], "summary": self.summary}
+
+    def load_dict(self, data: Dict[str, Any]) -> None:
+        self.clear()
+        for msg in data.get("messages", []):
+            self.add_message(msg["role"], msg["content"])
+        self.summary = data.get("summary") or self.summary
+        self._formatted = None
+
+def create_conversation(config: Optional[dict] = None) -> ConversationInterface:
+    """
+    Create a conversation from the "conversation" section of the configuration.
+    """
+    config = config or {}
+    if config.get("MODE", "unbounded") == "windowed":
+        return WindowedConversation(
+            max_tokens=config.get("MAX_TOKENS", 2000),
+            max_turns=config.get("MAX_TURNS", 10),
+            summary_max_tokens=config.get("SUMMARY_MAX_TOKENS", 300)
+        )
+    return Conversation()
@@ -0,0 +1,263 @@
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import time
+from collections import OrderedDict
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Callable, Dict, List, Optional, Tuple
+from ...interfaces.conversation_interface import ConversationInterface
+
+logger = logging.getLogger(__name__)
+
+class ConversationStore:
+    """
+    Per-session conversations with bounded memory.
+
+    Sessions are kept in LRU order: idle sessions older than idle_ttl seconds and
+    the least recently used sessions beyond max_sessions are evicted on access.
+    When a spill_directory is configured, evicted sessions are written to disk and
+    transparently restored the next time the session is used; spilled sessions idle
+    for longer than idle_ttl are deleted. Sessions held by session()
+    (e.g. by a response being streamed) are never evicted.
+    All the methods are coroutines; the in-memory state is guarded by a single asyncio
+    lock and the disk I/O runs in worker threads outside of it, ordered per session.
+    """
+
+    def __init__(self, conversation_factory: Callable[[], ConversationInterface], max_sessions: int = 1000,
+                 idle_ttl: Optional[float] = 3600, spill_directory: Optional[str] = None,
+                 clock: Callable[[], float] = time.monotonic):
+        if max_sessions <= 0:
+            raise ValueError("max_sessions must be a positive integer")
+        self.conversation_factory = conversation_factory
+        self.max_sessions = max_sessions
+        self.idle_ttl = idle_ttl
+        self.spill_directory = spill_directory
+        self.clock = clock
+        self._sessions: "OrderedDict[str, Tuple[ConversationInterface, float]]" = OrderedDict()
+        # Session id -> number of session() blocks holding it
+        self._pins: Dict[str, int] = {}
+        # Session id -> last disk operation on its file, the next one waits for it
+        self._io: Dict[str, asyncio.Task] = {}
+        # Session id -> load of its spilled state, shared by the concurrent requests of the session
+        self._restoring: Dict[str, asyncio.Task] = {}
+        self._purge: Optional[asyncio.Task] = None
+        self._prune: Optional[asyncio.Task] = None
+        self._lock = asyncio.Lock()
+        if spill_directory:
+            os.makedirs(spill_directory, exist_ok=True)
+            self._prune_spilled()
+        self._last_prune = clock()
+
+    def __len__(self) -> int:
+        return len(self._sessions)
+
+    async def get(self, session_id: str) -> ConversationInterface:
+        """Return the conversation of the session, creating or restoring it if needed."""
+        spill = None
+        async with self._lock:
+            conversation = self._touch(session_id)
+            if conversation is None and not self.spill_directory:
+                conversation = self.conversation_factory()
+                self._sessions[session_id] = (conversation, self.clock())
+            if conversation is not None:
+                spill = self._evict_and_spill()
+            else:
+                loading = self._restoring.get(session_id)
+                if loading is None:
+                    loading = self._restoring[session_id] = self._schedule_io([session_id], self._load_spilled, session_id)
+
+        if conversation is None:
+            data = await asyncio.shield(loading)
+            async with self._lock:
+                if self._restoring.get(session_id) is loading:
+                    del self._restoring[session_id]
+                # Restored by a concurrent request, or reset while loading
+                conversation = self._touch(session_id)
+                if conversation is None:
+                    conversation = self.conversation_factory()
+                    if data is not None:
+                        conversation.load_dict(data)
+                        logger.debug(f"Restored conversation session {session_id} from disk")
+                    self._sessions[session_id] = (conversation, self.clock())
+                spill = self._evict_and_spill()
+
+        if spill is not None:
+            await asyncio.shield(spill)
+        return conversation
+
+    @asynccontextmanager
+    async def session(self, session_id: str) -> AsyncIterator[ConversationInterface]:
+        """
+        The conversation of the session, which stays in memory until the block ends: the messages
+        added to it cannot be lost by a concurrent eviction.
+        """
+        async with self._lock:
+            self._pins[session_id] = self._pins.get(session_id, 0) + 1
+        try:
+            yield await self.get(session_id)
+        finally:
+            async with self._lock:
+                self._pins[session_id] -= 1
+                if not self._pins[session_id]:
+                    del self._pins[session_id]
+                entry = self._sessions.get(session_id)
+                if entry is not None:
+                    # Idle from now on
+                    self._sessions[session_id] = (entry[0], self.clock())
+                    self._sessions.move_to_end(session_id)
+                spill = self._evict_and_spill()
+            if spill is not None:
+                await asyncio.shield(spill)
+
+    async def reset(self, session_id: str) -> ConversationInterface:
+        """Replace the conversation of the session with an empty one."""
+        removal = None
+        async with self._lock:
+            conversation = self.conversation_factory()
+            self._sessions[session_id] = (conversation, self.clock())
+            self._sessions.move_to_end(session_id)
+            if self.spill_directory:
+                removal = self._schedule_io([session_id], self._remove_spilled, session_id)
+            spill = self._evict_and_spill()
+
+        for task in (removal, spill):
+            if task is not None:
+                await asyncio.shield(task)
+        return conversation
+
+    async def clear(self) -> None:
+        """Drop all the sessions, in memory and spilled to disk."""
+        async with self._lock:
+            self._sessions.clear()
+            if not self.spill_directory:
+                return
+            # After the pending writes, and before any later disk operation
+            purge = self._purge = self._schedule_io(list(self._io), self._remove_all_spilled)
+        await asyncio.shield(purge)
+
+    def _touch(self, session_id: str) -> Optional[ConversationInterface]:
+        entry = self._sessions.get(session_id)
+        if entry is None:
+            return None
+        self._sessions[session_id] = (entry[0], self.clock())
+        self._sessions.move_to_end(session_id)
+        return entry[0]
+
+    def _schedule_io(self, session_ids: List[str], function: Callable, *args) -> asyncio.Task:
+        # Called under the lock: the disk operations on a session file run in the order they are scheduled
+        previous = {self._io[session_id] for session_id in session_ids if session_id in self._io}
+        if self._purge is not None and not self._purge.done():
+            previous.add(self._purge)
+
+        async def run():
+            if previous:
+                await asyncio.gather(*previous, return_exceptions=True)
+            return await asyncio.to_thread(function, *args)
+
+        task = asyncio.ensure_future(run())
+        for session_id in session_ids:
+            self._io[session_id] = task
+
+        def forget(task: asyncio.Task) -> None:
+            for session_id in session_ids:
+                if self._io.get(session_id) is task:
+                    del self._io[session_id]
+        task.add_done_callback(forget)
+        return task
+
+    def _evict_and_spill(self) -> Optional[asyncio.Task]:
+        """Evict under the lock; the write of the evicted sessions, if any, to await once it is released."""
+        now = self.clock()
+        evicted = self._evict(now)
+        if not self.spill_directory:
+            return None
+        if self.idle_ttl is not None and now - self._last_prune >= self.idle_ttl:
+            self._last_prune = now
+            self._prune = self._schedule_io([], self._prune_spilled)
+        if not evicted:
+            return None
+        # Serialized now: the conversations can change once the lock is released
+        states = {session_id: conversation.to_dict() for session_id, conversation in evicted}
+        return self._schedule_io(list(states), self._write_spilled, states)
+
+    def _evict(self, now: float) -> List[Tuple[str, ConversationInterface]]:
+        evicted = []
+        # Sessions are in access order, so the expired ones are at the front
+        for session_id, (conversation, last_access) in self._sessions.items():
+            expired = self.idle_ttl is not None and now - last_access > self.idle_ttl
+            if not expired and len(self._sessions) - len(evicted) <= self.max_sessions:
+                break
+            if session_id in self._pins:
+                continue  # Evicted once released
+            evicted.append((session_id, conversation))
+        for session_id, _ in evicted:
+            del self._sessions[session_id]
+
+        if evicted:
+            logger.debug(f"Evicted {len(evicted)} conversation session(s), {len(self._sessions)} in memory")
+        return evicted
+
+    def _spill_path(self, session_id: str) -> str:
+        digest = hashlib.sha256(session_id.encode("utf-8")).hexdigest()
+        return os.path.join(self.spill_directory, f"{digest}.json")
+
+    def _write_spilled(self, states: Dict[str, dict]) -> None:
+        for session_id, state in states.items():
+            path = self._spill_path(session_id)
+            try:
+                tmp_path = f"{path}.tmp"
+                with open(tmp_path, "w", encoding="utf-8") as f:
+                    json.dump(state, f, ensure_ascii=False, separators=(",", ":"))
+                os.replace(tmp_path, path)
+            except OSError as e:
+                logger.error(f"Error spilling conversation session {session_id} to {path}: {str(e)}")
+
+    def _load_spilled(self, session_id: str) -> Optional[dict]:
+        path = self._spill_path(session_id)
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+        except FileNotFoundError:
+            return None
+        except (OSError, ValueError) as e:
+            logger.error(f"Error restoring conversation session {session_id} from {path}: {str(e)}")
+            return None
+        self._remove_spilled(session_id)
+        return data
+
+    def _remove_spilled(self, session_id: str) -> None:
+        try:
+            os.remove(self._spill_path(session_id))
+        except FileNotFoundError:
+            pass
+
+    def _remove_all_spilled(self) -> None:
+        removed = 0
+        for name in os.listdir(self.spill_directory):
+            if name.endswith(".json"):
+                try:
+                    os.remove(os.path.join(self.spill_directory, name))
+                    removed += 1
+                except FileNotFoundError:
+                    pass
+        logger.debug(f"Removed {removed} spilled conversation session(s)")
+
+    def _prune_spilled(self) -> None:
+        if self.idle_ttl is None:
+            return
+        # File times are wall clock times, unlike the clock of the sessions in memory
+        expiry = time.time() - self.idle_ttl
+        pruned = 0
+        for entry in os.scandir(self.spill_directory):
+            if not entry.name.endswith(".json"):
+                continue
+            try:
+                if entry.stat().st_mtime < expiry:
+                    os.remove(entry.path)
+                    pruned += 1
+            except OSError:
+                pass
+        if pruned:
+            logger.debug(f"Deleted {pruned} spilled conversation session(s) idle for more than {self.idle_ttl} s")
@@ -1,15 +1,28 @@
-from typing import List, Optional, Dict
-import oracledb
+from typing import List, Optional
 from ...interfaces.document_interface import DocumentInterface, Chunk
-import uuid
+from .document_database import DocumentDatabase
+
+# Marks a field that is not cached (never read, or released)
+_NOT_LOADED = object()
 
 class DBDocument(DocumentInterface):
-    def __init__(self, id: str, name: str, collection: str, title: str, content: Optional[str] = None, db_connection: oracledb.Connection = None):
+    """
+    Document stored in the documents tables. Each field is read from the database once and cached;
+    writes update the cache and go through the write-behind buffer of the DocumentDatabase.
+    Setting content to None, or chunks to an empty list, releases the cached copy (as the ingestion
+    does once a document is stored): the stored rows are kept. Setting a new content replaces the
+    stored keywords and chunks.
+    """
+
+    def __init__(self, id: str, name: str, collection: str, title: str, content: Optional[str] = None, db_connection: DocumentDatabase = None):
         self._id = id
         self._name = name
         self._collection = collection
         self._title = title
         self._db_connection = db_connection
+        self._content = _NOT_LOADED
+        self._keywords = _NOT_LOADED
+        self._chunks = _NOT_LOADED
         if content:
             self.content = content
 
@@ -31,50 +44,49 @@ class DBDocument(DocumentInterface):
 
     @property
     def content(self) -> Optional[str]:
-        cursor = self._db_connection.cursor()
-        cursor.execute("SELECT content FROM documents WHERE id = :id", id=self._id)
-        result = cursor.fetchone()
-        return result[0] if result else None
+        if self._content is _NOT_LOADED:
+            self._content = self._db_connection.load_content(self._id, self._name)
+        return self._content
 
     @content.setter
     def content(self, value: str) -> None:
-        cursor = self._db_connection.cursor()
-        cursor.execute("MERGE INTO documents d USING (SELECT :id AS id FROM DUAL) s "
-                       "ON (d.id = s.id) "
-                       "WHEN MATCHED THEN UPDATE SET d.content = :content "
-                       "WHEN NOT MATCHED THEN INSERT (id, name, collection, title, content) "
-                       "VALUES (:id, :name, :collection, :title, :content)",
-                       id=self._id, name=self._name, collection=self._collection, title=self._title, content=value)
-        self._db_connection.commit()
+        if value is None:
+            self._content = _NOT_LOADED
+            return
+        self._content = value
+        self._keywords = []
+        self._chunks = []
+        self._db_connection.write_content(self._id, self._name, self._collection, self._title, value)
 
     @property
     def keywords(self) -> List[str]:
-        cursor = self._db_connection.cursor()
-        cursor.execute("SELECT keyword FROM document_keywords WHERE document_id = :id", id=self._id)
-        return [row[0] for row in cursor.fetchall()]
+        if self._keywords is _NOT_LOADED:
+            self._keywords = self._db_connection.load_keywords(self._id, self._name)
+        return self._keywords
 
     @keywords.setter
     def keywords(self, value: List[str]) -> None:
-        cursor = self._db_connection.cursor()
-        cursor.execute("DELETE FROM document_keywords WHERE document_id = :id", id=self._id)
-        cursor.executemany("INSERT INTO document_keywords (document_id, keyword) VALUES (:id, :keyword)",
-                           [(self._id, keyword) for keyword in value])
-        self._db_connection.commit()
+        self._keywords = list(value)
+        self._db_connection.write_keywords(self._id, self._keywords)
 
     @property
     def chunks(self) -> List[Chunk]:
-        cursor = self._db_connection.cursor()
-        cursor.execute("SELECT chunk_id, metadata, content FROM document_chunks WHERE document_id = :id ORDER BY chunk_id",
-                       id=self._id)
-        return [Chunk(self._id, row[0], eval(row[1]), row[2]) for row in cursor.fetchall()]
+        if self._chunks is _NOT_LOADED:
+            self._chunks = [Chunk(self._id, chunk_id, content, metadata)
+                            for chunk_id, metadata, content in self._db_connection.load_chunks(self._id, self._name)]
+        return self._chunks
 
     @chunks.setter
     def chunks(self, value: List[Chunk]) -> None:
-        cursor = self._db_connection.cursor()
-        cursor.execute("DELETE FROM document_chunks WHERE document_id = :id", id=self._id)
-        cursor.executemany("INSERT INTO document_chunks (document_id, chunk_id, metadata, content) VALUES (:document_id, :chunk_id, :metadata, :content)",
-                           [(chunk.document_id, chunk.chunk_id, str({**chunk.metadata, 'document_name': self._name}), chunk.content) for chunk in value])
-        self._db_connection.commit()
+        if not value:
+            self._chunks = _NOT_LOADED
+            return
+        self._chunks = [Chunk(document_id=chunk.document_id,
+                              chunk_id=chunk.chunk_id,
+                              content=chunk.content,
+                              metadata={**chunk.metadata, 'document_name': self._name})
+                        for chunk in value]
+        self._db_connection.write_chunks(self._id, [(chunk.chunk_id, chunk.metadata, chunk.content) for chunk in self._chunks])
 
     def __repr__(self):
         return f"DBDocument(id='{self.id}', name='{self.name}', collection='{self.collection}', title='{self.title}')"
@@ -0,0 +1,219 @@
+from typing import Any, Callable, ContextManager, Dict, List, Optional, Tuple
+from contextlib import contextmanager
+import atexit
+import json
+import logging
+import sqlite3
+import threading
+
+logger = logging.getLogger(__name__)
+
+# Upsert of a document: Oracle MERGE, or SQLite INSERT ... ON CONFLICT (for tests and local runs)
+UPSERT_DOCUMENT_SQL = {
+    "oracle": ("MERGE INTO documents d USING (SELECT :id AS id FROM DUAL) s "
+               "ON (d.id = s.id) "
+               "WHEN MATCHED THEN UPDATE SET d.name = :name, d.collection = :collection, d.title = :title, d.content = :content "
+               "WHEN NOT MATCHED THEN INSERT (id, name, collection, title, content) "
+               "VALUES (:id, :name, :collection, :title, :content)"),
+    "sqlite": ("INSERT INTO documents (id, name, collection, title, content) "
+               "VALUES (:id, :name, :collection, :title, :content) "
+               "ON CONFLICT (id) DO UPDATE SET name = excluded.name, collection = excluded.collection, "
+               "title = excluded.title, content = excluded.content")
+}
+
+CREATE_TABLES_SQL = {
+    "oracle": [
+        "CREATE TABLE IF NOT EXISTS documents (id VARCHAR2(512) PRIMARY KEY, name VARCHAR2(1024), "
+        "collection VARCHAR2(512), title VARCHAR2(1024), content CLOB)",
+        "CREATE TABLE IF NOT EXISTS document_keywords (document_id VARCHAR2(512), keyword VARCHAR2(512))",
+        "CREATE INDEX IF NOT EXISTS document_keywords_idx ON document_keywords (document_id)",
+        "CREATE TABLE IF NOT EXISTS document_chunks (document_id VARCHAR2(512), position NUMBER(10), "
+        "chunk_id VARCHAR2(512), metadata CLOB, content CLOB)",
+        "CREATE INDEX IF NOT EXISTS document_chunks_idx ON document_chunks (document_id)"
+    ],
+    "sqlite": [
+        "CREATE TABLE IF NOT EXISTS documents (id TEXT PRIMARY KEY, name TEXT, collection TEXT, title TEXT, content TEXT)",
+        "CREATE TABLE IF NOT EXISTS document_keywords (document_id TEXT, keyword TEXT)",
+        "CREATE INDEX IF NOT EXISTS document_keywords_idx ON document_keywords (document_id)",
+        "CREATE TABLE IF NOT EXISTS document_chunks (document_id TEXT, position INTEGER, chunk_id TEXT, metadata TEXT, content TEXT)",
+        "CREATE INDEX IF NOT EXISTS document_chunks_idx ON document_chunks (document_id)"
+    ]
+}
+
+class SQLiteConnections:
+    """DB-API connection source over a SQLite file, one connection per thread."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._local = threading.local()
+
+    @contextmanager
+    def acquire(self):
+        connection = getattr(self._local, "connection", None)
+        if connection is None:
+            connection = sqlite3.connect(self.path)
+            self._local.connection = connection
+        yield connection
+
+class DocumentDatabase:
+    """
+    The documents, document_keywords and document_chunks tables, reached through a connection
+    source (acquire() gives a DB-API connection as a context manager, e.g. an oracledb pool).
+
+    Writes are buffered per document (the last value wins) and written by flush() in a single
+    transaction with one executemany per statement; flush() runs by itself once flush_rows
+    rows are pending. Reads see the pending writes.
+
+    Document ids are not stable across ingestions (they follow the order of the files), so the
+    reads are by id and name: the rows stored for another file under the same id are not returned.
+    Writing the content of a document replaces it: its previous keywords and chunks are deleted.
+    """
+
+    def __init__(self, acquire: Callable[[], ContextManager], dialect: str = "oracle", flush_rows: int = 1000):
+        if dialect not in UPSERT_DOCUMENT_SQL:
+            raise ValueError(f"Unsupported dialect: {dialect}. Must be one of {tuple(UPSERT_DOCUMENT_SQL)}")
+        self.acquire = acquire
+        self.dialect = dialect
+        self.flush_rows = flush_rows
+        self._lock = threading.RLock()
+        self._contents: Dict[str, Dict[str, Any]] = {}
+        self._keywords: Dict[str, List[str]] = {}
+        self._chunks: Dict[str, List[Tuple[str, str, str]]] = {}
+        self._pending_rows = 0
+
+    def create_tables(self) -> None:
+        with self.acquire() as connection:
+            cursor = connection.cursor()
+            for statement in CREATE_TABLES_SQL[self.dialect]:
+                cursor.execute(statement)
+            connection.commit()
+
+    # Reads
+
+    def _fetch(self, sql: str, parameters: Dict[str, Any]) -> List[Tuple]:
+        with self.acquire() as connection:
+            cursor = connection.cursor()
+            cursor.execute(sql, parameters)
+            return cursor.fetchall()
+
+    def load_content(self, document_id: str, name: str) -> Optional[str]:
+        with self._lock:
+            if document_id in self._contents:
+                pending = self._contents[document_id]
+                return pending["content"] if pending["name"] == name else None
+        rows = self._fetch("SELECT content FROM documents WHERE id = :id AND name = :name", {"id": document_id, "name": name})
+        # Oracle returns the CLOB as a LOB
+        return _read_lob(rows[0][0]) if rows else None
+
+    def _pending_for(self, document_id: str, name: str, pending: Dict[str, Any]) -> Optional[Any]:
+        # The buffered rows of the document, [] when the buffered content belongs to another file
+        if document_id in self._contents and self._contents[document_id]["name"] != name:
+            return []
+        return pending.get(document_id)
+
+    def load_keywords(self, document_id: str, name: str) -> List[str]:
+        with self._lock:
+            keywords = self._pending_for(document_id, name, self._keywords)
+            if keywords is not None:
+                return list(keywords)
+        rows = self._fetch("SELECT k.keyword FROM document_keywords k JOIN documents d ON d.id = k.document_id "
+                           "WHERE k.document_id = :id AND d.name = :name", {"id": document_id, "name": name})
+        return [row[0] for row in rows]
+
+    def load_chunks(self, document_id: str, name: str) -> List[Tuple[str, Dict[str, Any], str]]:
+        """(chunk_id, metadata, content) of the chunks of a document."""
+        with self._lock:
+            rows = self._pending_for(document_id, name, self._chunks)
+            if rows is not None:
+                return [(chunk_id, json.loads(metadata), content) for chunk_id, metadata, content in rows]
+        rows = self._fetch("SELECT c.chunk_id, c.metadata, c.content FROM document_chunks c JOIN documents d ON d.id = c.document_id "
+                           "WHERE c.document_id = :id AND d.name = :name ORDER BY c.position", {"id": document_id, "name": name})
+        return [(chunk_id, json.loads(_read_lob(metadata)), _read_lob(content)) for chunk_id, metadata, content in rows]
+
+    # Buffered writes
+
+    def write_content(self, document_id: str, name: str, collection: str, title: str, content: str) -> None:
+        with self._lock:
+            self._contents[document_id] = {"id": document_id, "name": name, "collection": collection, "title": title, "content": content}
+            # The keywords and chunks of the previous content (or of another file with this id) are deleted
+            self._keywords[document_id] = []
+            self._chunks[document_id] = []
+            self._added(1)
+
+    def write_keywords(self, document_id: str, keywords: List[str]) -> None:
+        with self._lock:
+            self._keywords[document_id] = list(keywords)
+            self._added(len(keywords) + 1)
+
+    def write_chunks(self, document_id: str, chunks: List[Tuple[str, Dict[str, Any], str]]) -> None:
+        with self._lock:
+            self._chunks[document_id] = [(chunk_id, json.dumps(metadata, ensure_ascii=False), content)
+                                         for chunk_id, metadata, content in chunks]
+            self._added(len(chunks) + 1)
+
+    def _added(self, rows: int) -> None:
+        self._pending_rows += rows
+        if self._pending_rows >= self.flush_rows:
+            self.flush()
+
+    def flush(self) -> None:
+        """Write the pending changes in one transaction."""
+        with self._lock:
+            if not (self._contents or self._keywords or self._chunks):
+                return
+            contents, keywords, chunks = self._contents, self._keywords, self._chunks
+            with self.acquire() as connection:
+                try:
+                    cursor = connection.cursor()
+                    if contents:
+                        cursor.executemany(UPSERT_DOCUMENT_SQL[self.dialect], list(contents.values()))
+                    if keywords:
+                        cursor.executemany("DELETE FROM document_keywords WHERE document_id = :id", [{"id": id} for id in keywords])
+                        rows = [{"document_id": id, "keyword": keyword} for id, values in keywords.items() for keyword in values]
+                        if rows:
+                            cursor.executemany("INSERT INTO document_keywords (document_id, keyword) VALUES (:document_id, :keyword)", rows)
+                    if chunks:
+                        cursor.executemany("DELETE FROM document_chunks WHERE document_id = :id", [{"id": id} for id in chunks])
+                        rows = [{"document_id": id, "position": position, "chunk_id": chunk_id, "metadata": metadata, "content": content}
+                                for id, values in chunks.items() for position, (chunk_id, metadata, content) in enumerate(values)]
+                        if rows:
+                            cursor.executemany("INSERT INTO document_chunks (document_id, position, chunk_id, metadata, content) "
+                                               "VALUES (:document_id, :position, :chunk_id, :metadata, :content)", rows)
+                    connection.commit()
+                except Exception:
+                    connection.rollback()
+                    raise
+            logger.debug(f"Flushed {len(contents)} contents, {len(keywords)} keyword lists and {len(chunks)} chunk lists")
+            self._contents, self._keywords, self._chunks = {}, {}, {}
+            self._pending_rows = 0
+
+def _read_lob(value):
+    return value.read() if hasattr(value, "read") else value
+
+# One DocumentDatabase (and session pool) per connection string
+_databases: Dict[str, DocumentDatabase] = {}
+_databases_lock = threading.Lock()
+
+def connect_database(connection_string: str, pool_max: int = 4, flush_rows: int = 1000) -> DocumentDatabase:
+    """
+    DocumentDatabase for DB_CONNECTION_STRING: "sqlite:///<path>" for a SQLite file,
+    otherwise an Oracle connect string (user/password@host:port/service) served by a session pool.
+    """
+    with _databases_lock:
+        database = _databases.get(connection_string)
+        if database is None:
+            database = _connect(connection_string, pool_max, flush_rows)
+            _databases[connection_string] = database
+    return database
+
+def _connect(connection_string: str, pool_max: int, flush_rows: int) -> DocumentDatabase:
+    if connection_string.startswith("sqlite:///"):
+        database = DocumentDatabase(SQLiteConnections(connection_string[len("sqlite:///"):]).acquire, "sqlite", flush_rows)
+    else:
+        import oracledb
+        pool = oracledb.create_pool(dsn=connection_string, min=1, max=pool_max, increment=1)
+        database = DocumentDatabase(pool.acquire, "oracle", flush_rows)
+    database.create_tables()
+    # Pending writes are not lost on a normal exit
+    atexit.register(database.flush)
+    return database
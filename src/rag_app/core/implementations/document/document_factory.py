@@ -1,7 +1,6 @@
 from typing import Optional, Literal
 from ...interfaces.document_interface import DocumentFactoryInterface, DocumentInterface
 from .py_document import PythonDocument
-from .db_document import DBDocument
 
 # Define a type for the implementation parameter
 ImplementationType = Literal["OCI_DB", "Python"]
@@ -11,10 +10,17 @@ class DocumentFactory(DocumentFactoryInterface):
         self.implementation = implementation
         self.db_connection = db_connection
 
+    def flush(self) -> None:
+        """Write the buffered changes of the OCI_DB documents."""
+        if self.db_connection is not None:
+            self.db_connection.flush()
+
     def create_document(self, id: str, name: str, collection: str, title: str, content: Optional[str] = None) -> DocumentInterface:
         if self.implementation == "OCI_DB":
             if not self.db_connection:
                 raise ValueError("Database connection is required for OCI_DB implementation")
+            # Imported on use: only the OCI_DB implementation needs a database driver
+            from .db_document import DBDocument
             return DBDocument(id, name, collection, title, content, self.db_connection)
         elif self.implementation == "Python":
             return PythonDocument(id, name, collection, title, content)
@@ -0,0 +1,76 @@
+import hashlib
+import json
+import logging
+import os
+import time
+from typing import Any, Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+CATALOG_VERSION = 1
+
+# Sections of the configuration that change what is ingested, or where it is stored
+INGESTION_CONFIG_KEYS = ("DATA_FOLDER", "chunking", "embedding_model", "vector_store", "document")
+
+def config_hash(config_data: dict) -> str:
+    relevant = {key: config_data.get(key) for key in INGESTION_CONFIG_KEYS}
+    return hashlib.sha256(json.dumps(relevant, sort_keys=True, default=str).encode("utf-8")).hexdigest()
+
+class DomainCatalog:
+    """
+    Snapshot of the ingested domains, written at the end of ingestion and read on startup to
+    rebuild the domains without scanning the data folder again.
+
+    Format (JSON), one entry per domain with the documents as parallel lists:
+        {"version": 1, "config_hash": ..., "created_at": ..., "domains": {
+            name: {"description": ..., "store": {"type": ..., "collection": ..., "persist_directory": ...},
+                   "documents": {"ids": [...], "names": [...], "sizes": [...], "mtimes": [...], "chunks": [...]}}}}
+
+    The snapshot is only used when it was written with the same ingestion configuration
+    (config_hash of DATA_FOLDER, chunking, embedding model, vector store and document settings).
+    """
+
+    def __init__(self, path: str, config_hash: str):
+        self.path = path
+        self.config_hash = config_hash
+
+    def load(self) -> Optional[Dict[str, Dict[str, Any]]]:
+        """Return the domains of the snapshot, None if it is missing, unreadable or from another configuration."""
+        if not os.path.isfile(self.path):
+            logger.info(f"No domain catalog at {self.path}")
+            return None
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                snapshot = json.load(f)
+        except (OSError, ValueError) as e:
+            logger.warning(f"Ignoring unreadable domain catalog {self.path}: {e}")
+            return None
+        if snapshot.get("version") != CATALOG_VERSION or snapshot.get("config_hash") != self.config_hash:
+            logger.info(f"Domain catalog {self.path} was written with another configuration, ignoring it")
+            return None
+        return snapshot["domains"]
+
+    def save(self, domains: Dict[str, Dict[str, Any]]) -> None:
+        snapshot = {
+            "version": CATALOG_VERSION,
+            "config_hash": self.config_hash,
+            "created_at": time.time(),
+            "domains": domains
+        }
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        # Written next to the catalog and renamed: a crash never leaves a truncated catalog
+        temporary_path = f"{self.path}.tmp"
+        try:
+            with open(temporary_path, "w", encoding="utf-8") as f:
+                json.dump(snapshot, f, ensure_ascii=False, separators=(",", ":"))
+            os.replace(temporary_path, self.path)
+            logger.info(f"Saved the domain catalog of {len(domains)} domains to {self.path}")
+        except OSError as e:
+            logger.error(f"Error saving the domain catalog to {self.path}: {e}")
+
+    def clear(self) -> None:
+        """Remove the snapshot, e.g. when an ingestion starts and the stores no longer match it."""
+        try:
+            os.remove(self.path)
+        except FileNotFoundError:
+            pass
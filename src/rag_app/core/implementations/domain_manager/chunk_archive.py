@@ -0,0 +1,151 @@
+import json
+import logging
+import mmap
+import os
+import threading
+import zlib
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Dict, List, Optional, Tuple
+from ...interfaces.document_interface import Chunk
+
+logger = logging.getLogger(__name__)
+
+DATA_SUFFIX = ".chunks"
+INDEX_SUFFIX = ".idx"
+
+# A single writer thread for all the archives: the appends of an archive are written in order
+_writer: Optional[ThreadPoolExecutor] = None
+_writer_lock = threading.Lock()
+
+def _get_writer() -> ThreadPoolExecutor:
+    global _writer
+    with _writer_lock:
+        if _writer is None:
+            _writer = ThreadPoolExecutor(max_workers=1, thread_name_prefix="chunk-archive")
+        return _writer
+
+class ChunkArchive:
+    """
+    Append-only archive of the chunks of a domain, for looking up a chunk by id after ingestion.
+
+    <path>.chunks holds one zlib-compressed JSON record per chunk ({"chunk_id", "document_id",
+    "content", "metadata"}); <path>.idx holds one "chunk_id<TAB>offset<TAB>length" line per
+    record and is loaded in memory, so a lookup is a dict access and a slice of the memory-mapped
+    data file. A chunk written again is found at its last offset.
+
+    With asynchronous=True, append() compresses and writes on a background thread; flush() waits
+    for the pending appends.
+    """
+
+    def __init__(self, path: str, asynchronous: bool = True):
+        self.path = path
+        self.data_path = path + DATA_SUFFIX
+        self.index_path = path + INDEX_SUFFIX
+        self.asynchronous = asynchronous
+        self._lock = threading.Lock()
+        self._index: Dict[str, Tuple[int, int]] = {}
+        self._pending: List[Future] = []
+        self._map: Optional[mmap.mmap] = None
+        self._map_file = None
+        self._load_index()
+
+    def _load_index(self) -> None:
+        if not os.path.exists(self.index_path):
+            return
+        data_size = os.path.getsize(self.data_path) if os.path.exists(self.data_path) else 0
+        with open(self.index_path, "r", encoding="utf-8") as f:
+            for line in f:
+                fields = line.rstrip("\n").split("\t")
+                try:
+                    offset, length = int(fields[1]), int(fields[2])
+                except (IndexError, ValueError):
+                    continue  # Line cut by a crash
+                # Records that did not reach the data file are ignored
+                if offset + length <= data_size:
+                    self._index[fields[0]] = (offset, length)
+        logger.debug(f"Loaded {len(self._index)} chunk offsets from {self.index_path}")
+
+    def __len__(self) -> int:
+        return len(self._index)
+
+    def __contains__(self, chunk_id: str) -> bool:
+        return chunk_id in self._index
+
+    def append(self, chunks: List[Chunk]) -> None:
+        records = [{"chunk_id": chunk.chunk_id, "document_id": chunk.document_id,
+                    "content": chunk.content, "metadata": chunk.metadata} for chunk in chunks]
+        if not records:
+            return
+        if self.asynchronous:
+            self._pending = [future for future in self._pending if not future.done()]
+            self._pending.append(_get_writer().submit(self._write, records))
+        else:
+            self._write(records)
+
+    def _write(self, records: List[Dict[str, Any]]) -> None:
+        blobs = [zlib.compress(json.dumps(record, ensure_ascii=False, separators=(",", ":")).encode("utf-8"))
+                 for record in records]
+        with self._lock:
+            os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+            with open(self.data_path, "ab") as data:
+                offset = data.tell()
+                entries = []
+                for record, blob in zip(records, blobs):
+                    data.write(blob)
+                    entries.append((record["chunk_id"], offset, len(blob)))
+                    offset += len(blob)
+            # The index is written after the data: an index line always points to complete records
+            with open(self.index_path, "a", encoding="utf-8") as index:
+                index.writelines(f"{chunk_id}\t{offset}\t{length}\n" for chunk_id, offset, length in entries)
+            for chunk_id, offset, length in entries:
+                self._index[chunk_id] = (offset, length)
+
+    def flush(self) -> None:
+        pending, self._pending = self._pending, []
+        for future in pending:
+            future.result()
+
+    def get(self, chunk_id: str) -> Optional[Dict[str, Any]]:
+        """Record of the chunk ({"chunk_id", "document_id", "content", "metadata"}), None if it is not archived or unreadable."""
+        with self._lock:
+            location = self._index.get(chunk_id)
+            if location is None:
+                return None
+            offset, length = location
+            if self._map is None or offset + length > len(self._map):
+                self._remap()
+            blob = self._map[offset:offset + length]
+        try:
+            return json.loads(zlib.decompress(blob).decode("utf-8"))
+        except (zlib.error, UnicodeDecodeError, ValueError) as e:
+            logger.warning(f"Unreadable record of chunk {chunk_id} in {self.data_path}: {e}")
+            return None
+
+    def _remap(self) -> None:
+        # The data file grew since it was mapped
+        self._unmap()
+        self._map_file = open(self.data_path, "rb")
+        self._map = mmap.mmap(self._map_file.fileno(), 0, access=mmap.ACCESS_READ)
+
+    def _unmap(self) -> None:
+        if self._map is not None:
+            self._map.close()
+            self._map_file.close()
+            self._map, self._map_file = None, None
+
+    def clear(self) -> None:
+        """Remove the archived chunks, before the domain is ingested again."""
+        self.flush()
+        with self._lock:
+            self._unmap()
+            self._index.clear()
+            for path in (self.data_path, self.index_path):
+                try:
+                    os.remove(path)
+                except FileNotFoundError:
+                    pass
+
+    def close(self) -> None:
+        self.flush()
+        with self._lock:
+            self._unmap()
@@ -1,7 +1,8 @@
 import logging
-import json
 import os
-from typing import Dict, List
+import re
+import threading
+from typing import Any, Dict, List, Optional, Tuple
 from concurrent.futures import ThreadPoolExecutor, as_completed
 from ...interfaces.domain_manager_interface import DomainManagerInterface
 from ...interfaces.domain_interface import DomainInterface, DomainFactoryInterface
@@ -12,7 +13,10 @@ from ...interfaces.chat_model_interface import ChatModelInterface
 from ...interfaces.vector_store_interface import VectorStoreInterface, VectorStoreFactoryInterface
 from ...interfaces.embedding_model_interface import EmbeddingModelInterface
 from ..domain.domain import Domain
-from ....private_config import private_settings  # Import settings from config
+from .catalog import DomainCatalog
+from .chunk_archive import ChunkArchive
+from ....metrics import INGESTION_STAGE_SECONDS, INGESTED_CHUNKS
+from .... import tracing, profiling
 
 logger = logging.getLogger(__name__)
 
@@ -24,7 +28,9 @@ class DomainManager(DomainManagerInterface):
                  document_factory: DocumentFactoryInterface,
                  vector_stores_config: Dict[str, str], # As per config.vector_store
                  embedding_model: EmbeddingModelInterface,
-                 vector_store_factory: VectorStoreFactoryInterface):
+                 vector_store_factory: VectorStoreFactoryInterface,
+                 catalog: Optional[DomainCatalog] = None,
+                 chunk_archive_dir: Optional[str] = None):
         self.storage = storage
         self.chunk_strategy = chunk_strategy
         self.chat_model = chat_model
@@ -35,14 +41,29 @@ class DomainManager(DomainManagerInterface):
         self.domains: Dict[str, DomainInterface] = {}
         self.vector_stores: Dict[str, VectorStoreInterface] = {}
         self.vector_store_factory = vector_store_factory
-        self._create_domains()
+        self.catalog = catalog
+        # Chunks of the last ingestion, by domain (None: not archived)
+        self.chunk_archive_dir = chunk_archive_dir
+        self._chunk_archives: Dict[str, ChunkArchive] = {}
+        self._chunk_archives_lock = threading.Lock()
+        # Document id -> number of chunks stored by the last ingestion
+        self.chunk_counts: Dict[str, int] = {}
+        # Domain name -> file name -> (size, mtime in ns) when the documents were listed
+        self._document_stats: Dict[str, Dict[str, Tuple[int, int]]] = {}
+        # Domain name -> type, collection and directory of its vector store
+        self._store_locations: Dict[str, Dict[str, Any]] = {}
+        self._create_domains(catalog.load() if catalog else None)
         self.initialize_vector_stores(self.vector_stores_config)
 
-    def _create_domains(self) -> None:
+    def _create_domains(self, catalog_domains: Optional[Dict[str, Dict[str, Any]]] = None) -> None:
         domain_names = self.storage.get_all_collections()
+        catalog_domains = catalog_domains or {}
         
-        with ThreadPoolExecutor() as executor:
-            future_to_domain = {executor.submit(self._create_domain, domain_name): domain_name for domain_name in domain_names}
+        with ThreadPoolExecutor() as executor, tracing.start_span("domain_manager.create_domains", domains=len(domain_names)):
+            # Carry the trace context and the request profiler (if any) into the worker threads
+            create_domain = tracing.wrap(profiling.wrap(self._create_domain))
+            future_to_domain = {executor.submit(create_domain, domain_name, catalog_domains.get(domain_name)): domain_name
+                                for domain_name in domain_names}
             for future in as_completed(future_to_domain):
                 domain_name = future_to_domain[future]
                 try:
@@ -51,14 +72,44 @@ class DomainManager(DomainManagerInterface):
                 except Exception as exc:
                     logger.error(f"Error creating domain {domain_name}: {exc}")
 
-    def _create_domain(self, domain_name: str) -> DomainInterface:
-        documents = self._create_documents(domain_name)
-        description = self._get_domain_description(domain_name)
-        return self.domain_factory.create_domain(domain_name, description, documents)
+    def _create_domain(self, domain_name: str, catalog_entry: Optional[Dict[str, Any]] = None) -> DomainInterface:
+        with tracing.start_span("domain_manager.create_domain", domain=domain_name) as span:
+            stats = self.storage.get_collection_stats(domain_name)
+            self._document_stats[domain_name] = stats
+            from_catalog = catalog_entry is not None and self._matches_catalog(stats, catalog_entry)
+            if from_catalog:
+                documents = self._restore_documents(domain_name, catalog_entry)
+                description = catalog_entry["description"]
+            else:
+                if catalog_entry is not None:
+                    logger.info(f"Documents of domain {domain_name} changed since the catalog was saved, listing them again")
+                documents = self._create_documents(domain_name, stats)
+                description = self._get_domain_description(domain_name)
+            span.set_attributes(documents=len(documents), from_catalog=from_catalog)
+            return self.domain_factory.create_domain(domain_name, description, documents)
 
-    def _create_documents(self, domain_name: str) -> List[DocumentInterface]:
+    @staticmethod
+    def _matches_catalog(stats: Dict[str, Tuple[int, int]], catalog_entry: Dict[str, Any]) -> bool:
+        documents = catalog_entry["documents"]
+        if len(documents["names"]) != len(stats):
+            return False
+        return all(stats.get(name) == (size, mtime)
+                   for name, size, mtime in zip(documents["names"], documents["sizes"], documents["mtimes"]))
+
+    def _restore_documents(self, domain_name: str, catalog_entry: Dict[str, Any]) -> List[DocumentInterface]:
+        documents = catalog_entry["documents"]
+        self.chunk_counts.update(zip(documents["ids"], documents["chunks"]))
+        return [
+            self.document_factory.create_document(id=document_id, name=doc_name, collection=domain_name, title=doc_name, content=None)
+            for document_id, doc_name in zip(documents["ids"], documents["names"])
+        ]
+
+    def _create_documents(self, domain_name: str, stats: Optional[Dict[str, Tuple[int, int]]] = None) -> List[DocumentInterface]:
         documents = []
-        for idx, doc_name in enumerate(self.storage.get_collection_items(domain_name), start=1):
+        # Only the file names are needed here, the contents are read at ingestion
+        if stats is None:
+            stats = self.storage.get_collection_stats(domain_name)
+        for idx, doc_name in enumerate(stats, start=1):
             # Create a string ID using domain name and sequential number
             document_id = f"{domain_name}_{idx}"
             # Create document without content, implement lazy loading
@@ -96,69 +147,127 @@ class DomainManager(DomainManagerInterface):
         logger.info(f"Applying chunking strategy: {strategy_name}")
         logger.info(f"Strategy parameters: {strategy_params}")
 
+        if self.catalog:
+            # The stores no longer match the catalog until this ingestion completes
+            self.catalog.clear()
+
         for domain in self.domains.values():
             logger.info(f"Applying chunking strategy to domain: {domain.name}")
+            self._delete_stored_chunks(domain)
+            archive = self.get_chunk_archive(domain.name)
+            if archive is not None:
+                archive.clear()
             for document in domain.documents:
-                if document.content is None:
-                    content = self.storage.get_item(domain.name, document.name)
-                    document.content = content
-                content = document.content
-                if content is None:
-                    logger.warning(f"Document {document.name} in domain {domain.name} has no content after attempted load")
-                    continue
-                # Chunking text
-                chunks = self.chunk_strategy.chunk_text(content=content, document_id=document.id)
-
-                for chunk in chunks:
-                    chunk.metadata['document_name'] = document.name
-                    chunk.metadata['document_id'] = document.id
-                document.chunks = chunks
-                
-                # Store embeddings and clear chunks from memory
-                self.embed_and_store_documents(domain.name, document)
-                
-                # Store chunks in JSON file - Debug
-                self.store_chunks(domain.name, document)
-                
-                document.chunks = [] 
-                document.content = None
+                with tracing.start_span("domain_manager.ingest_document", domain=domain.name, document=document.name) as span:
+                    self._ingest_document(domain, document, span)
 
-    def store_chunks(self, domain_name: str, document: DocumentInterface) -> None:
-        strategy_name = self.chunk_strategy.strategy_name
-        data_path = private_settings.DATA_FOLDER  # Use DATA_FOLDER from settings
-        chunks_dir = os.path.join(data_path, '../chunks', f"{domain_name}_{strategy_name}")
-        
-        # Create directory if it doesn't exist
-        os.makedirs(chunks_dir, exist_ok=True)
+        # Documents backed by a database buffer their writes
+        self.document_factory.flush()
+        for archive in self._chunk_archives.values():
+            archive.flush()
+
+        if self.catalog:
+            self.catalog.save(self.catalog_snapshot())
+
+    def _delete_stored_chunks(self, domain: DomainInterface) -> None:
+        # A new chunking of a document can give fewer chunks, and the document ids are positions in the
+        # domain, so a removed file leaves chunks under an id no document has: empty the collection
+        vector_store = self.vector_stores.get(domain.name)
+        if not vector_store:
+            return
+        try:
+            with INGESTION_STAGE_SECONDS.time(stage="delete_previous"):
+                vector_store.clear()
+        except Exception as e:
+            logger.error(f"Error deleting the previous chunks of domain {domain.name}: {str(e)}")
+
+    def catalog_snapshot(self) -> Dict[str, Dict[str, Any]]:
+        """Domains, documents and stores in the format of DomainCatalog."""
+        snapshot = {}
+        for domain in self.domains.values():
+            stats = self._document_stats.get(domain.name, {})
+            documents = domain.documents
+            sizes, mtimes = zip(*(stats.get(document.name, (-1, -1)) for document in documents)) if documents else ((), ())
+            snapshot[domain.name] = {
+                "description": domain.description,
+                "store": self._store_locations.get(domain.name),
+                "documents": {
+                    "ids": [document.id for document in documents],
+                    "names": [document.name for document in documents],
+                    "sizes": list(sizes),
+                    "mtimes": list(mtimes),
+                    "chunks": [self.chunk_counts.get(document.id, 0) for document in documents]
+                }
+            }
+        return snapshot
+
+    def _ingest_document(self, domain: DomainInterface, document: DocumentInterface, span=tracing.NOOP_SPAN) -> None:
+        # Always read from storage: the file may have changed since the document was last stored
+        with INGESTION_STAGE_SECONDS.time(stage="load"):
+            content = self.storage.get_item(domain.name, document.name)
+        document.content = content
+        if content is None:
+            logger.warning(f"Document {document.name} in domain {domain.name} has no content after attempted load")
+            self.chunk_counts[document.id] = 0
+            return
+        # Chunking text
+        with INGESTION_STAGE_SECONDS.time(stage="chunk"):
+            chunks = self.chunk_strategy.chunk_text(content=content, document_id=document.id)
+        span.set_attributes(chars=len(content), chunks=len(chunks))
+        self.chunk_counts[document.id] = len(chunks)
+
+        for chunk in chunks:
+            chunk.metadata['document_name'] = document.name
+            chunk.metadata['document_id'] = document.id
+        document.chunks = chunks
         
-        # Create JSON file for the document
-        file_name = f"{document.name}.json"
-        file_path = os.path.join(chunks_dir, file_name)
+        # Store embeddings and clear chunks from memory
+        self.embed_and_store_documents(domain.name, document)
         
-        # Prepare chunks data for JSON serialization
-        chunks_data = [
-            {
-                'chunk_id': chunk.chunk_id,
-                'content': chunk.content,
-                'metadata': chunk.metadata
-            }
-            for chunk in document.chunks
-        ]
+        # Store chunks in JSON file - Debug
+        with INGESTION_STAGE_SECONDS.time(stage="store_chunks"):
+            self.store_chunks(domain.name, document)
         
-        # Write chunks to JSON file
-        try:
-            with open(file_path, 'w', encoding='utf-8') as f:
-                json.dump(chunks_data, f, ensure_ascii=False, indent=2)
-            logger.info(f"Successfully stored chunks for document {document.name} in {file_path}")
-        except Exception as e:
-            logger.error(f"Error storing chunks for document {document.name} in {file_path}: {str(e)}")
+        document.chunks = [] 
+        document.content = None
+
+    def store_chunks(self, domain_name: str, document: DocumentInterface) -> None:
+        archive = self.get_chunk_archive(domain_name)
+        if archive is not None:
+            # Compressed and written on the archive thread
+            archive.append(document.chunks)
+
+    def get_chunk_archive(self, domain_name: str) -> Optional[ChunkArchive]:
+        """Archive of the chunks of a domain with the current chunking strategy, None if archiving is disabled."""
+        if not self.chunk_archive_dir:
+            return None
+        with self._chunk_archives_lock:
+            archive = self._chunk_archives.get(domain_name)
+            if archive is None:
+                name = re.sub(r"[^\w.-]", "_", f"{domain_name}_{self.chunk_strategy.strategy_name}")
+                archive = ChunkArchive(os.path.join(self.chunk_archive_dir, name))
+                self._chunk_archives[domain_name] = archive
+            return archive
+
+    def get_chunks(self, chunk_ids: List[str]) -> Dict[str, Dict[str, Any]]:
+        """Archived records of the chunks, by chunk id; the ids that are not archived are left out."""
+        archives = [archive for archive in map(self.get_chunk_archive, self.domains) if archive is not None]
+        chunks = {}
+        for chunk_id in chunk_ids:
+            for archive in archives:
+                record = archive.get(chunk_id) if chunk_id in archive else None
+                if record is not None:
+                    chunks[chunk_id] = record
+                    break
+        return chunks
 
     def embed_and_store_documents(self, domain_name: str, document: DocumentInterface) -> None:
         vector_store = self.vector_stores.get(domain_name)
         if not vector_store:
             raise ValueError(f"No vector store found for domain: {domain_name}")
 
-        embeddings = self.embedding_model.generate_embedding([chunk.content for chunk in document.chunks])
+        with INGESTION_STAGE_SECONDS.time(stage="embed"):
+            embeddings = self.embedding_model.generate_embedding([chunk.content for chunk in document.chunks])
         metadata = [chunk.metadata for chunk in document.chunks]
         ids = [chunk.chunk_id for chunk in document.chunks]
 
@@ -169,12 +278,15 @@ class DomainManager(DomainManagerInterface):
             return
 
         try:
-            vector_store.store_embeddings(
-                embeddings=embeddings, 
-                metadata=metadata, 
-                ids=ids, 
-                documents=[chunk.content for chunk in document.chunks]
-            )
+            with INGESTION_STAGE_SECONDS.time(stage="store_embeddings"), \
+                    tracing.start_span("vector_store.store_embeddings", domain=domain_name, store=type(vector_store).__name__, embeddings=len(ids)):
+                vector_store.store_embeddings(
+                    embeddings=embeddings, 
+                    metadata=metadata, 
+                    ids=ids, 
+                    documents=[chunk.content for chunk in document.chunks]
+                )
+            INGESTED_CHUNKS.inc(len(ids), domain=domain_name)
             logger.info(f"Successfully stored embeddings for document {document.name} in domain {domain_name}")
         except Exception as e:
             logger.error(f"Error storing embeddings for document {document.name} in domain {domain_name}: {str(e)}")
@@ -210,11 +322,17 @@ class DomainManager(DomainManagerInterface):
                 vector_store = self.vector_store_factory.create_vector_store(
                     store_type=vector_store_type,
                     collection_name=collection_name,
-                    persist_directory=vector_store_configs.get("CHROMA_PERSIST_DIRECTORY") if vector_store_type == "Chroma" else None
+                    persist_directory=vector_store_configs.get("CHROMA_PERSIST_DIRECTORY") if vector_store_type == "Chroma" else None,
+                    settings=vector_store_configs
                 )
                 
                 # Update the vector_stores of the domain manager
                 self.vector_stores[domain.name] = vector_store
+                self._store_locations[domain.name] = {
+                    "type": vector_store_type,
+                    "collection": collection_name,
+                    "persist_directory": vector_store_configs.get("CHROMA_PERSIST_DIRECTORY") if vector_store_type == "Chroma" else None
+                }
                 logger.info(f"Created {vector_store_type} for collection: {collection_name}")
             except ValueError as e:
                 logger.error(f"Failed to create vector store for collection '{collection_name}': {str(e)}")
@@ -225,9 +343,15 @@ class DomainManager(DomainManagerInterface):
                     vector_store = self.vector_store_factory.create_vector_store(
                         store_type=default_type,
                         collection_name=collection_name,
-                        persist_directory=vector_store_configs.get("CHROMA_PERSIST_DIRECTORY")
+                        persist_directory=vector_store_configs.get("CHROMA_PERSIST_DIRECTORY"),
+                        settings=vector_store_configs
                     )
                     self.vector_stores[domain.name] = vector_store
+                    self._store_locations[domain.name] = {
+                        "type": default_type,
+                        "collection": collection_name,
+                        "persist_directory": vector_store_configs.get("CHROMA_PERSIST_DIRECTORY")
+                    }
                     logger.info(f"Created default {default_type} vector store for collection: {collection_name}")
                 except Exception as e:
                     logger.error(f"Failed to create default vector store for collection '{collection_name}': {str(e)}")
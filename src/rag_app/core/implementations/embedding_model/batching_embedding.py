@@ -0,0 +1,97 @@
+import logging
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from typing import List, Optional, Tuple, Union
+from ...interfaces.embedding_model_interface import EmbeddingModelInterface
+from ....metrics import EMBEDDING_BATCH_SIZE
+from .... import tracing
+
+logger = logging.getLogger(__name__)
+
+class BatchingEmbeddingModel(EmbeddingModelInterface):
+    """
+    Embedding model that groups the single texts embedded concurrently (the query embeddings of
+    concurrent requests) into one call of the wrapped model.
+
+    A caller embedding a single text queues it and waits; a worker thread takes the first queued
+    text, waits up to window_ms for more (at most max_batch_size texts, identical texts are sent
+    once), embeds them in one generate_embedding call and gives every caller its vector. The texts
+    queued while a batch is being embedded go in the next one, so with window_ms = 0 the batches
+    only form under load and a lone query is not delayed.
+
+    Lists of texts (ingestion, context compression) are already batched and go straight to the
+    wrapped model.
+
+    :param embedding_model: The embedding model called with the batches.
+    :param window_ms: How long the worker waits for more texts after the first one.
+    :param max_batch_size: Texts per call (Cohere accepts up to 96 per request).
+    """
+
+    def __init__(self, embedding_model: EmbeddingModelInterface, window_ms: float = 5, max_batch_size: int = 32):
+        self.embedding_model = embedding_model
+        self.window = window_ms / 1000
+        self.max_batch_size = max(1, max_batch_size)
+        self._queue: "queue.Queue[Tuple[str, Future]]" = queue.Queue()
+        self._worker: Optional[threading.Thread] = None
+        self._worker_lock = threading.Lock()
+
+    def __getattr__(self, name: str):
+        # Attributes of the wrapped model
+        if name == "embedding_model":
+            raise AttributeError(name)
+        return getattr(self.embedding_model, name)
+
+    @property
+    def model_name(self) -> str:
+        return self.embedding_model.model_name
+
+    def generate_embedding(self, chunks: Union[str, List[str]]) -> Union[List[float], List[List[float]]]:
+        if not isinstance(chunks, str):
+            return self.embedding_model.generate_embedding(chunks)
+
+        self._start_worker()
+        future: Future = Future()
+        self._queue.put((chunks, future))
+        embedding, batch_size = future.result()
+        tracing.current_span().set_attribute("batch_size", batch_size)
+        return embedding
+
+    def _start_worker(self) -> None:
+        if self._worker is not None:
+            return
+        with self._worker_lock:
+            if self._worker is None:
+                self._worker = threading.Thread(target=self._run, name="embedding-batcher", daemon=True)
+                self._worker.start()
+
+    def _run(self) -> None:
+        while True:
+            batch = [self._queue.get()]
+            deadline = time.monotonic() + self.window
+            while len(batch) < self.max_batch_size:
+                remaining = deadline - time.monotonic()
+                try:
+                    batch.append(self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            self._embed(batch)
+
+    def _embed(self, batch: List[Tuple[str, Future]]) -> None:
+        texts = list(dict.fromkeys(text for text, _ in batch))
+        EMBEDDING_BATCH_SIZE.observe(len(batch), model=self.model_name)
+        logger.debug(f"Embedding a batch of {len(batch)} queries ({len(texts)} distinct)")
+        try:
+            embeddings = self.embedding_model.generate_embedding(texts)
+            # generate_embedding returns a flat vector when given a single text
+            if len(texts) == 1:
+                embeddings = [embeddings]
+            by_text = dict(zip(texts, embeddings))
+        except Exception as e:
+            logger.error(f"Error embedding a batch of {len(texts)} queries: {e}")
+            for _, future in batch:
+                future.set_exception(e)
+            return
+        for text, future in batch:
+            future.set_result((by_text[text], len(batch)))
@@ -4,6 +4,8 @@ import os
 import cohere
 import numpy as np
 from ...interfaces.embedding_model_interface import EmbeddingModelInterface
+from ....metrics import EMBEDDING_SECONDS, EMBEDDING_CALLS, EMBEDDING_TEXTS
+from .... import tracing
 
 logger = logging.getLogger(__name__)
 
@@ -32,17 +34,22 @@ class CohereEmbedding(EmbeddingModelInterface):
         batch_size = 96
         all_embeddings = []
         
-        for i in range(0, len(chunks), batch_size):
-            batch = chunks[i:i+batch_size]
-            logger.debug(f"Processing batch {i//batch_size + 1} with {len(batch)} chunks")
-            
-            res = self.client.embed(
-                texts=batch,
-                model=self.model_name,
-                input_type="search_query",
-                embedding_types=['float']
-            )
-            
-            all_embeddings.extend(res.embeddings.float)
+        with EMBEDDING_SECONDS.time(model=self.model_name), \
+                tracing.start_span("embedding_model.generate_embedding", model=self.model_name, texts=len(chunks)) as span:
+            for i in range(0, len(chunks), batch_size):
+                batch = chunks[i:i+batch_size]
+                logger.debug(f"Processing batch {i//batch_size + 1} with {len(batch)} chunks")
+                
+                res = self.client.embed(
+                    texts=batch,
+                    model=self.model_name,
+                    input_type="search_query",
+                    embedding_types=['float']
+                )
+                EMBEDDING_CALLS.inc(model=self.model_name)
+                
+                all_embeddings.extend(res.embeddings.float)
+            span.set_attribute("requests", (len(chunks) + batch_size - 1) // batch_size)
+        EMBEDDING_TEXTS.inc(len(chunks), model=self.model_name)
         
         return all_embeddings[0] if len(all_embeddings) == 1 else all_embeddings
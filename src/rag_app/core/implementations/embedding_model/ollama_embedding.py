@@ -1,17 +1,24 @@
-from typing import List, Union
+from typing import List, Optional, Union
 import logging
 import requests
 import numpy as np
 from ...interfaces.embedding_model_interface import EmbeddingModelInterface
+from ....metrics import EMBEDDING_SECONDS, EMBEDDING_CALLS, EMBEDDING_TEXTS
+from .... import tracing
 
 logger = logging.getLogger(__name__)
 
 # https://github.com/ollama/ollama/blob/main/docs/faq.md
 # Add Environment=OLLAMA_HOST=0.0.0.0:11434 to /etc/systemd/system/ollama.service 
 class OllamaEmbedding(EmbeddingModelInterface):
-    def __init__(self, model_name: str, ollama_host: str = "localhost", ollama_port: int = 11434):
+    def __init__(self, model_name: str, ollama_host: str = "localhost", ollama_port: int = 11434, batch_size: int = 64):
         self._model_name = model_name
         self.base_url = f"http://{ollama_host}:{ollama_port}"
+        # Texts per /api/embed request; servers older than 0.3.4 only have the one text /api/embeddings
+        self.batch_size = max(1, batch_size)
+        self._batch_api = True
+        # Keep-alive connections to the server
+        self.session = requests.Session()
         
         logger.info(f"Initializing Ollama embedding model: {model_name}")
         logger.info(f"Ollama API URL: {self.base_url}")
@@ -28,24 +35,58 @@ class OllamaEmbedding(EmbeddingModelInterface):
         
         all_embeddings = []
         
-        for chunk in chunks:
-            try:
-                response = requests.post(
-                    f"{self.base_url}/api/embeddings",
-                    json={
-                        "model": self.model_name,
-                        "prompt": chunk
-                    }
-                )
-                response.raise_for_status()
-                embedding = response.json()["embedding"]
-                all_embeddings.append(embedding)
-            except requests.RequestException as e:
-                logger.error(f"Error generating embedding: {str(e)}")
-                raise
-            except KeyError as e:
-                logger.error(f"Unexpected response structure: {str(e)}")
-                raise
+        with EMBEDDING_SECONDS.time(model=self.model_name), \
+                tracing.start_span("embedding_model.generate_embedding", model=self.model_name, texts=len(chunks)) as span:
+            requests_sent = 0
+            i = 0
+            while i < len(chunks):
+                try:
+                    if self._batch_api:
+                        batch = chunks[i:i + self.batch_size]
+                        embeddings = self._embed_batch(batch)
+                        if embeddings is None:
+                            continue  # Retried with /api/embeddings
+                    else:
+                        batch = chunks[i:i + 1]
+                        embeddings = [self._embed_one(batch[0])]
+                    all_embeddings.extend(embeddings)
+                    i += len(batch)
+                    requests_sent += 1
+                    span.set_attribute("requests", requests_sent)
+                except requests.RequestException as e:
+                    logger.error(f"Error generating embedding: {str(e)}")
+                    raise
+                except KeyError as e:
+                    logger.error(f"Unexpected response structure: {str(e)}")
+                    raise
+        EMBEDDING_TEXTS.inc(len(chunks), model=self.model_name)
         
         return all_embeddings[0] if len(all_embeddings) == 1 else all_embeddings
 
+    def _embed_batch(self, batch: List[str]) -> Optional[List[List[float]]]:
+        EMBEDDING_CALLS.inc(model=self.model_name)
+        response = self.session.post(
+            f"{self.base_url}/api/embed",
+            json={
+                "model": self.model_name,
+                "input": batch
+            }
+        )
+        if response.status_code == 404 and "model" not in response.text.lower():
+            logger.warning("Ollama server without /api/embed: embedding one text per request")
+            self._batch_api = False
+            return None
+        response.raise_for_status()
+        return response.json()["embeddings"]
+
+    def _embed_one(self, chunk: str) -> List[float]:
+        EMBEDDING_CALLS.inc(model=self.model_name)
+        response = self.session.post(
+            f"{self.base_url}/api/embeddings",
+            json={
+                "model": self.model_name,
+                "prompt": chunk
+            }
+        )
+        response.raise_for_status()
+        return response.json()["embedding"]
@@ -9,12 +9,21 @@ from ...interfaces.embedding_model_interface import EmbeddingModelInterface
 from ...interfaces.chat_model_interface import ChatModelInterface
 from ...interfaces.chunk_strategy_interface import ChunkStrategyInterface
 from ...interfaces.conversation_interface import ConversationInterface
+from ...interfaces.context_builder_interface import ContextBuilderInterface
+from ...interfaces.context_compressor_interface import ContextCompressorInterface
+from ....metrics import QUERY_STAGE_SECONDS, RETRIEVAL_SECONDS, QUERY_COALESCED
+from .... import tracing, profiling
+from .single_flight import SingleFlight, SharedStream
+import asyncio
 
 import time
 import json
 
 logger = logging.getLogger(__name__)
 
+# Adaptive retrieval fetches this many candidates per result the embedding re-ranker (MMR) picks
+MMR_CANDIDATE_FACTOR = 2
+
 class QueryEngine(QueryEngineInterface):
     def __init__(self, 
                  domain_manager: DomainManagerInterface, 
@@ -24,7 +33,13 @@ class QueryEngine(QueryEngineInterface):
                  chunk_strategy: ChunkStrategyInterface,
                  query_optimizer: QueryOptimizerInterface,
                  result_re_ranker: ReRankerInterface,
-                 n_results: int = 5):
+                 n_results: int = 5,
+                 context_builder: Optional[ContextBuilderInterface] = None,
+                 context_compressor: Optional[ContextCompressorInterface] = None,
+                 retrieval_mode: str = "fixed",
+                 initial_fetch: int = 2,
+                 fetch_growth: int = 2,
+                 single_flight: bool = True):
         self.domain_manager = domain_manager
         self.vector_stores = vector_stores
         self.embedding_model = embedding_model
@@ -32,6 +47,17 @@ class QueryEngine(QueryEngineInterface):
         self.query_optimizer = query_optimizer
         self.result_re_ranker = result_re_ranker
         self.n_results = n_results
+        self.context_builder = context_builder
+        self.context_compressor = context_compressor
+        if retrieval_mode not in ("fixed", "adaptive"):
+            raise ValueError(f"Invalid retrieval mode: {retrieval_mode}. Must be either 'fixed' or 'adaptive'")
+        if initial_fetch <= 0 or fetch_growth < 2:
+            raise ValueError("initial_fetch must be positive and fetch_growth at least 2")
+        self.retrieval_mode = retrieval_mode
+        self.initial_fetch = initial_fetch
+        self.fetch_growth = fetch_growth
+        # Identical concurrent questions without conversation history share one retrieval and generation
+        self.single_flight = SingleFlight() if single_flight else None
         logger.info("QueryEngine initialized")
 
     @property
@@ -89,36 +115,95 @@ class QueryEngine(QueryEngineInterface):
                 raise ValueError(error_msg)
             logger.debug(f"Using specified domains: {domain_names}")
 
-        combined_results = []
+        if stream and self.single_flight is not None and (conversation is None or not conversation.get_history()):
+            # The answer only depends on the question, the domains and the model: share it
+            key = (question, tuple(sorted(domain_names)), model_name)
+            results, joined = self.single_flight.join(key, lambda shared: self._produce_shared(shared, question, domain_names))
+            if joined:
+                QUERY_COALESCED.inc()
+                logger.info(f"Joined an identical request in flight for question: '{question}'")
+            return results
 
-        for domain_name in domain_names:
-            logger.info(f"Querying domain: {domain_name}")
-            vector_store = self.domain_manager.vector_stores[domain_name]
+        # Optimize the query and generate embeddings
+        # optimized_query = self.query_optimizer.optimize(question)
+
+        with tracing.start_span("query_engine.prepare_prompt", domains=len(domain_names), n_results=self.n_results):
+            # Off the event loop: the concurrent requests embed and retrieve in parallel (and their query embeddings can be batched)
+            prompt, ranked_results, query_embedding = await asyncio.to_thread(profiling.wrap(self._prepare_prompt), question, domain_names)
 
-            # Optimize the query and generate embeddings
-            # optimized_query = self.query_optimizer.optimize(question)
-            
+        logger.info("Generating response from chat model.")
+        # The chat model span is a sibling of the preparation: it lasts until the stream is consumed
+        response = await self.chat_model.chat(system_prompt=prompt, query=question, conversation=conversation ,stream=stream)
+
+        if stream:
+            return self._stream_response(response, ranked_results)
+        else:
+            full_response = await response
+            return full_response, ranked_results
+
+    async def _produce_shared(self, shared: SharedStream, question: str, domain_names: List[str]) -> None:
+        with tracing.start_span("query_engine.prepare_prompt", domains=len(domain_names), n_results=self.n_results):
+            prompt, ranked_results, _ = await asyncio.to_thread(profiling.wrap(self._prepare_prompt), question, domain_names)
+        response = await self.chat_model.chat(system_prompt=prompt, query=question, conversation=None, stream=True)
+        try:
+            async for chunk in response:
+                shared.append(chunk)
+        finally:
+            # Ends the chat model stream (and its span) when the shared request is cancelled
+            if hasattr(response, "aclose"):
+                await response.aclose()
+        shared.finish(ranked_results)
+
+    def _prepare_prompt(self, question: str, domain_names: List[str]) -> Tuple[str, List[Dict[str, Any]], List[float]]:
+        """
+        Retrieve, re-rank and build the context: return the prompt, the ranked results and the query embedding.
+        """
+        # The embedding does not depend on the domain: compute it once for all vector stores
+        with QUERY_STAGE_SECONDS.time(stage="embed_query"), tracing.start_span("embed_query"):
             query_embedding = self.embedding_model.generate_embedding(question)
 
-            # Query the vector store
-            results = vector_store.query(query_embedding=query_embedding, n_results=self.n_results)
-            logger.debug(f"Retrieved {len(results)} results from domain '{domain_name}'")
+        include_embeddings = self.result_re_ranker is not None and self.result_re_ranker.requires_embeddings
 
-            # Append results with domain context
-            for result in results:
-                result['domain'] = domain_name
-            combined_results.extend(results)
+        with QUERY_STAGE_SECONDS.time(stage="retrieve"), tracing.start_span("retrieve", mode=self.retrieval_mode) as span:
+            if self.retrieval_mode == "adaptive":
+                combined_results = self._retrieve_adaptive(query_embedding, domain_names, include_embeddings)
+            else:
+                combined_results = self._retrieve_fixed(query_embedding, domain_names, include_embeddings)
+            span.set_attribute("results", len(combined_results))
 
         # Re-rank all combined results if result_re_ranker is available
         if self.result_re_ranker is not None:
-            ranked_results = self.result_re_ranker.re_rank(combined_results, question)
+            with QUERY_STAGE_SECONDS.time(stage="rerank"), tracing.start_span("rerank", candidates=len(combined_results)) as span:
+                ranked_results = self.result_re_ranker.re_rank(combined_results, question)
+                span.set_attribute("results", len(ranked_results))
         else:
             ranked_results = combined_results
 
         logger.debug(f"Total combined results: {len(combined_results)}. Ranked results: {len(ranked_results)}")
 
+        # Embeddings are only needed for re-ranking, don't send them back with the sources
+        if include_embeddings:
+            for result in ranked_results:
+                result.pop("embedding", None)
+
         # Build context from top-ranked results
-        context = "\n".join([result["document"] for result in ranked_results[:3]])
+        with QUERY_STAGE_SECONDS.time(stage="build_context"), tracing.start_span("build_context") as span:
+            if self.context_builder is not None:
+                context_passages = self.context_builder.build(ranked_results)
+            else:
+                context_passages = ranked_results[:3]
+            span.set_attribute("passages", len(context_passages))
+        if self.context_compressor is not None:
+            with QUERY_STAGE_SECONDS.time(stage="compress_context"), tracing.start_span("compress_context") as span:
+                context_passages = self.context_compressor.compress(context_passages, question, query_embedding)
+                span.set_attribute("passages", len(context_passages))
+        # Lets the compact responses send only the sources that were given to the model
+        # (a passage merged by the context builder lists all its chunks in "ids")
+        context_ids = {id for passage in context_passages for id in passage.get("ids") or [passage.get("id")]}
+        for result in ranked_results:
+            result["in_context"] = result.get("id") in context_ids
+        context = "\n".join([passage["document"] for passage in context_passages])
+        tracing.current_span().set_attribute("context_chars", len(context))
         prompt = f"""You are an Oracle Assistant and your goal is to provide assistance and help about the concept and terminology of the 
         Oracle Documentation. You respond in markdown fetching information form the context.
         If you need it to respond the user question on specific domains, you can use the following context (it may not be required).
@@ -130,14 +215,76 @@ class QueryEngine(QueryEngineInterface):
         \n\n
         Answer:
         """
-        logger.info("Generating response from chat model.")
-        response = await self.chat_model.chat(system_prompt=prompt, query=question, conversation=conversation ,stream=stream)
+        return prompt, ranked_results, query_embedding
 
-        if stream:
-            return self._stream_response(response, ranked_results)
-        else:
-            full_response = await response
-            return full_response, ranked_results
+    def _query_domain(self, domain_name: str, query_embedding: List[float], n_results: int, include_embeddings: bool) -> List[Dict[str, Any]]:
+        vector_store = self.domain_manager.vector_stores[domain_name]
+        store_type = type(vector_store).__name__
+        with RETRIEVAL_SECONDS.time(domain=domain_name, store=store_type), \
+                tracing.start_span("vector_store.query", domain=domain_name, store=store_type, n_results=n_results) as span:
+            results = vector_store.query(query_embedding=query_embedding, n_results=n_results, include_embeddings=include_embeddings)
+            span.set_attribute("results", len(results))
+        logger.debug(f"Retrieved {len(results)} results from domain '{domain_name}'")
+
+        # Append results with domain context
+        for result in results:
+            result['domain'] = domain_name
+        return results
+
+    def _retrieve_fixed(self, query_embedding: List[float], domain_names: List[str], include_embeddings: bool) -> List[Dict[str, Any]]:
+        """
+        Fetch n_results from every domain.
+        """
+        combined_results = []
+        for domain_name in domain_names:
+            logger.info(f"Querying domain: {domain_name}")
+            combined_results.extend(self._query_domain(domain_name, query_embedding, self.n_results, include_embeddings))
+        return combined_results
+
+    def _retrieve_adaptive(self, query_embedding: List[float], domain_names: List[str], include_embeddings: bool) -> List[Dict[str, Any]]:
+        """
+        Fetch the global top n_results across all domains with as little work as possible.
+        With a re-ranker that needs the embeddings (MMR), the top MMR_CANDIDATE_FACTOR x its
+        top_k are fetched instead (if more), so that it has candidates to diversify from.
+
+        Every domain is first queried for a few results. The k-th best distance seen so far
+        bounds the final top-k: a domain whose worst returned hit is not better than that
+        bound cannot contribute anything else, so only the remaining domains are queried
+        again, with a geometrically growing fetch size (capped at k).
+        """
+        k = self.n_results
+        if include_embeddings:
+            k = max(k, getattr(self.result_re_ranker, "top_k", k) * MMR_CANDIDATE_FACTOR)
+        fetch_sizes = {domain_name: min(self.initial_fetch, k) for domain_name in domain_names}
+        domain_results: Dict[str, List[Dict[str, Any]]] = {}
+        exhausted = set()
+        pending = list(domain_names)
+        queries = 0
+        fetched = 0
+
+        while pending:
+            for domain_name in pending:
+                results = self._query_domain(domain_name, query_embedding, fetch_sizes[domain_name], include_embeddings)
+                domain_results[domain_name] = results
+                queries += 1
+                fetched += len(results)
+                if len(results) < fetch_sizes[domain_name]:
+                    exhausted.add(domain_name)
+
+            distances = sorted(result['distance'] for results in domain_results.values() for result in results)
+            bound = distances[k - 1] if len(distances) >= k else float('inf')
+
+            pending = []
+            for domain_name, results in domain_results.items():
+                if domain_name in exhausted or fetch_sizes[domain_name] >= k or not results:
+                    continue
+                if results[-1]['distance'] < bound:
+                    fetch_sizes[domain_name] = min(fetch_sizes[domain_name] * self.fetch_growth, k)
+                    pending.append(domain_name)
+
+        combined_results = sorted((result for results in domain_results.values() for result in results), key=lambda x: x['distance'])
+        logger.info(f"Adaptive retrieval over {len(domain_names)} domains: {queries} queries, {fetched} results fetched for top {k}")
+        return combined_results[:k]
 
     def initialize_chat_model(self, gen_model: str, init_prompt: str) -> Dict[str, Any]:
         """
@@ -0,0 +1,106 @@
+import asyncio
+import logging
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, Hashable, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+class SharedStream:
+    """
+    A response produced once and streamed to every subscriber. Each subscriber receives all the
+    chunks from the first one, then ("", sources) like QueryEngine._stream_response.
+    """
+
+    def __init__(self):
+        self.chunks: List[str] = []
+        self.sources: Optional[List[Dict[str, Any]]] = None
+        self.error: Optional[BaseException] = None
+        self.done = False
+        self.abandoned = False
+        self.subscribers = 0
+        self.task: Optional[asyncio.Task] = None
+        self._changed = asyncio.Event()
+
+    def _notify(self) -> None:
+        # Wakes the waiting subscribers; the next ones wait on a new event
+        changed, self._changed = self._changed, asyncio.Event()
+        changed.set()
+
+    def append(self, chunk: str) -> None:
+        self.chunks.append(chunk)
+        self._notify()
+
+    def finish(self, sources: List[Dict[str, Any]]) -> None:
+        self.sources = sources
+        self.done = True
+        self._notify()
+
+    def fail(self, error: BaseException) -> None:
+        self.error = error
+        self.done = True
+        self._notify()
+
+    def subscribe(self) -> AsyncIterator[Tuple[str, Optional[List]]]:
+        # Counted now, not when the iteration starts: the work is only cancelled once every subscriber is gone
+        self.subscribers += 1
+        return self._iterate()
+
+    async def _iterate(self) -> AsyncIterator[Tuple[str, Optional[List]]]:
+        position = 0
+        try:
+            while True:
+                changed = self._changed
+                while position < len(self.chunks):
+                    yield self.chunks[position], None
+                    position += 1
+                if self.done:
+                    break
+                await changed.wait()
+            if self.error is not None:
+                raise self.error
+            yield "", list(self.sources)
+        finally:
+            self.subscribers -= 1
+            if self.subscribers == 0 and not self.done and self.task is not None:
+                # The last subscriber left (e.g. client disconnect): nobody needs the response any more
+                self.abandoned = True
+                self.task.cancel()
+
+class SingleFlight:
+    """
+    Coalesces identical concurrent requests: the first one starts produce(stream) as a task, the
+    requests with the same key made before it completes subscribe to the same stream.
+    The task is independent of the subscribers: one of them going away does not stop it.
+    """
+
+    def __init__(self):
+        self._in_flight: Dict[Hashable, SharedStream] = {}
+
+    def __len__(self) -> int:
+        return len(self._in_flight)
+
+    def join(self, key: Hashable, produce: Callable[[SharedStream], Awaitable[None]]) -> Tuple[AsyncIterator[Tuple[str, Optional[List]]], bool]:
+        """Subscription to the stream of key, and whether it joined a request already in flight."""
+        stream = self._in_flight.get(key)
+        if stream is not None and not stream.abandoned:
+            return stream.subscribe(), True
+        stream = SharedStream()
+        self._in_flight[key] = stream
+        subscription = stream.subscribe()
+        stream.task = asyncio.ensure_future(self._run(key, stream, produce))
+        return subscription, False
+
+    async def _run(self, key: Hashable, stream: SharedStream, produce: Callable[[SharedStream], Awaitable[None]]) -> None:
+        try:
+            await produce(stream)
+        except asyncio.CancelledError as e:
+            stream.fail(e)
+            raise
+        except Exception as e:
+            logger.error(f"Shared request failed: {e}")
+            stream.fail(e)
+        finally:
+            if not stream.done:
+                stream.fail(RuntimeError("Shared request ended without a response"))
+            # New requests start a new flight: this is not a cache
+            if self._in_flight.get(key) is stream:
+                del self._in_flight[key]
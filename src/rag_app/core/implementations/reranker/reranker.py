@@ -1,14 +1,124 @@
 from typing import List, Dict, Any
 import logging
+import numpy as np
 from src.rag_app.core.interfaces.reranker_interface import ReRankerInterface
 
 logger = logging.getLogger(__name__)
 
 class ResultReRanker(ReRankerInterface):
+    """
+    Re-ranks the combined results of all the domains.
+
+    Modes:
+        - "distance": sort by raw vector store distance (default).
+        - "mmr": normalize distances per domain into a [0, 1] relevance score and
+          pick a diverse top-k with Maximal Marginal Relevance over the result
+          embeddings. The remaining results follow in relevance order.
+    """
+
+    MODES = ("distance", "mmr")
+
+    def __init__(self, mode: str = "distance", lambda_mult: float = 0.5, top_k: int = 10):
+        if mode not in self.MODES:
+            raise ValueError(f"Invalid re-ranker mode: {mode}. Must be one of {self.MODES}")
+        if not 0 <= lambda_mult <= 1:
+            raise ValueError("lambda_mult must be in [0, 1]")
+        self.mode = mode
+        self.lambda_mult = lambda_mult
+        self.top_k = top_k
+
+    @property
+    def requires_embeddings(self) -> bool:
+        return self.mode == "mmr"
+
     def re_rank(self, results: List[Dict[str, Any]], original_query: str) -> List[Dict[str, Any]]:
         logger.info(f"Re-ranking {len(results)} results for query: {original_query}")
-        
+
+        if self.mode == "mmr":
+            return self._mmr_re_rank(results)
+
         # Sort results by score in descending order
         re_ranked_results = sorted(results, key=lambda x: x['distance'], reverse=False)
-        
+
+        return re_ranked_results
+
+    def _mmr_re_rank(self, results: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        if not results:
+            return []
+
+        relevance = self.normalize_scores(results)
+        for result, score in zip(results, relevance):
+            result['score'] = float(score)
+
+        by_relevance = np.argsort(-relevance, kind="stable").tolist()
+        embeddings = [result.get('embedding') for result in results]
+        dimension = next((len(embedding) for embedding in embeddings if embedding is not None), 0)
+        missing = sum(embedding is None for embedding in embeddings)
+        if missing:
+            logger.warning(f"{missing} results have no embedding, they are ranked by relevance without redundancy penalty")
+
+        if dimension and not missing:
+            matrix = np.asarray(embeddings, dtype=np.float32).reshape(len(results), -1)
+        elif dimension:
+            # A zero vector has no similarity to any result: no redundancy penalty, by relevance only
+            matrix = np.zeros((len(results), dimension), dtype=np.float32)
+            for idx, embedding in enumerate(embeddings):
+                if embedding is not None:
+                    matrix[idx] = embedding
+        if dimension:
+            selected = self.mmr_select(matrix, relevance, min(self.top_k, len(results)), self.lambda_mult)
+        else:
+            selected = []
+        selected_set = set(selected)
+        order = selected + [idx for idx in by_relevance if idx not in selected_set]
+
+        re_ranked_results = [results[idx] for idx in order]
+        for rank, result in enumerate(re_ranked_results):
+            result['rank'] = rank
         return re_ranked_results
+
+    @staticmethod
+    def normalize_scores(results: List[Dict[str, Any]]) -> np.ndarray:
+        """
+        Min-max normalize the distances within each domain into a relevance score in [0, 1]
+        (1 is the best hit of the domain), so results of different collections are comparable.
+        """
+        distances = np.fromiter((result['distance'] for result in results), dtype=np.float64, count=len(results))
+        relevance = np.ones(len(results), dtype=np.float64)
+
+        domains: Dict[Any, List[int]] = {}
+        for idx, result in enumerate(results):
+            domains.setdefault(result.get('domain'), []).append(idx)
+
+        for indices in domains.values():
+            domain_distances = distances[indices]
+            best, worst = domain_distances.min(), domain_distances.max()
+            if worst > best:
+                relevance[indices] = 1.0 - (domain_distances - best) / (worst - best)
+        return relevance
+
+    @staticmethod
+    def mmr_select(embeddings: np.ndarray, relevance: np.ndarray, k: int, lambda_mult: float) -> List[int]:
+        """Return the indices of the k candidates picked by Maximal Marginal Relevance."""
+        if k <= 0 or len(embeddings) == 0:
+            return []
+
+        # Cosine similarities are computed one row at a time: k matrix-vector products
+        # instead of normalizing the whole matrix or building the full n x n Gram matrix
+        norms = np.maximum(np.sqrt(np.einsum('ij,ij->i', embeddings, embeddings)), 1e-12)
+
+        relevance = np.asarray(relevance, dtype=np.float32)
+        max_similarity = np.zeros(len(embeddings), dtype=np.float32)
+        available = np.ones(len(embeddings), dtype=bool)
+        selected: List[int] = []
+
+        for _ in range(k):
+            mmr = lambda_mult * relevance - (1 - lambda_mult) * max_similarity
+            mmr[~available] = -np.inf
+            best = int(np.argmax(mmr))
+            selected.append(best)
+            available[best] = False
+            similarity = (embeddings @ embeddings[best]) / (norms * norms[best])
+            np.maximum(max_similarity, similarity, out=max_similarity)
+
+        return selected
@@ -0,0 +1,151 @@
+import hashlib
+import logging
+import os
+import threading
+import zlib
+from collections import OrderedDict
+from typing import Callable, Dict, Optional, Tuple
+from ....metrics import CACHE_LOOKUPS
+
+logger = logging.getLogger(__name__)
+
+# Part of the entry names: bump it when an extractor changes its output, the old entries are then never read again
+EXTRACTOR_VERSION = 1
+ENTRY_SUFFIX = ".txt.z"
+HASH_BLOCK_SIZE = 1 << 20
+
+class ExtractedTextCache:
+    """
+    Text extracted from binary documents (PDF, DOCX), stored zlib-compressed in a local directory
+    so that a new ingestion does not parse the files again.
+
+    Entries are named after the extractor and the SHA-256 of the file content: an edited file
+    misses, a renamed or copied one hits. The hash of a file is computed again only when its
+    path, size or modification time change.
+
+    The compressed entries take at most max_bytes; the least recently used ones are evicted.
+    """
+
+    def __init__(self, directory: str, max_bytes: int = 2 * 1024 ** 3):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        os.makedirs(directory, exist_ok=True)
+        self._lock = threading.Lock()
+        # Entry name -> compressed size, least recently used first
+        self._entries: "OrderedDict[str, int]" = OrderedDict()
+        # File path -> (size, modification time, content hash)
+        self._hashes: Dict[str, Tuple[int, int, str]] = {}
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+        entries = []
+        with os.scandir(directory) as scan:
+            for entry in scan:
+                if entry.name.endswith(ENTRY_SUFFIX) and entry.is_file():
+                    stat = entry.stat()
+                    entries.append((stat.st_mtime_ns, entry.name, stat.st_size))
+        for _, name, size in sorted(entries):
+            self._entries[name] = size
+        self._total_bytes = sum(self._entries.values())
+        # max_bytes may have been lowered since the last run
+        self._evict()
+        logger.info(f"Extracted text cache at {directory}: {len(self._entries)} entries, {self._total_bytes / 1024 ** 2:.1f} MB")
+
+    def get_or_extract(self, file_path: str, extractor: str, extract: Callable[[str], Optional[str]]) -> Optional[str]:
+        """Text of the file, from the cache or from extract(file_path) (then cached)."""
+        name = f"{extractor}-v{EXTRACTOR_VERSION}-{self._content_hash(file_path)}{ENTRY_SUFFIX}"
+        text = self._read(name)
+        if text is not None:
+            self.hits += 1
+            CACHE_LOOKUPS.inc(cache="extracted_text", result="hit")
+            return text
+
+        self.misses += 1
+        CACHE_LOOKUPS.inc(cache="extracted_text", result="miss")
+        text = extract(file_path)
+        if text is not None:
+            self._write(name, text)
+        return text
+
+    def stats(self) -> Dict[str, float]:
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "bytes": self._total_bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "evictions": self.evictions
+        }
+
+    def _content_hash(self, file_path: str) -> str:
+        stat = os.stat(file_path)
+        key = os.path.abspath(file_path)
+        known = self._hashes.get(key)
+        if known and known[0] == stat.st_size and known[1] == stat.st_mtime_ns:
+            return known[2]
+        digest = hashlib.sha256()
+        with open(file_path, 'rb') as f:
+            for block in iter(lambda: f.read(HASH_BLOCK_SIZE), b''):
+                digest.update(block)
+        content_hash = digest.hexdigest()
+        self._hashes[key] = (stat.st_size, stat.st_mtime_ns, content_hash)
+        return content_hash
+
+    def _read(self, name: str) -> Optional[str]:
+        with self._lock:
+            if name not in self._entries:
+                return None
+            self._entries.move_to_end(name)
+        path = os.path.join(self.directory, name)
+        try:
+            with open(path, 'rb') as f:
+                text = zlib.decompress(f.read()).decode('utf-8')
+            # The modification time keeps the recency order across restarts
+            os.utime(path)
+            return text
+        except (OSError, zlib.error, UnicodeDecodeError) as e:
+            logger.warning(f"Dropping unreadable extracted text cache entry {name}: {e}")
+            self._remove(name)
+            return None
+
+    def _write(self, name: str, text: str) -> None:
+        data = zlib.compress(text.encode('utf-8'))
+        if len(data) > self.max_bytes:
+            return
+        path = os.path.join(self.directory, name)
+        temporary_path = f"{path}.{threading.get_ident()}.tmp"
+        try:
+            with open(temporary_path, 'wb') as f:
+                f.write(data)
+            os.replace(temporary_path, path)
+        except OSError as e:
+            logger.warning(f"Could not write extracted text cache entry {name}: {e}")
+            return
+        with self._lock:
+            self._total_bytes += len(data) - self._entries.pop(name, 0)
+            self._entries[name] = len(data)
+        self._evict()
+
+    def _evict(self) -> None:
+        evicted = []
+        with self._lock:
+            while self._total_bytes > self.max_bytes:
+                oldest, size = self._entries.popitem(last=False)
+                self._total_bytes -= size
+                evicted.append(oldest)
+        for oldest in evicted:
+            self.evictions += 1
+            try:
+                os.remove(os.path.join(self.directory, oldest))
+            except OSError:
+                pass
+
+    def _remove(self, name: str) -> None:
+        with self._lock:
+            self._total_bytes -= self._entries.pop(name, 0)
+        try:
+            os.remove(os.path.join(self.directory, name))
+        except OSError:
+            pass
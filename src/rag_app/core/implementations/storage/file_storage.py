@@ -1,19 +1,31 @@
+import codecs
 import json
 import os
-from typing import Dict, List, Optional
+from typing import Dict, List, Optional, Tuple
 import logging
 from src.rag_app.core.interfaces.storage_interface import StorageInterface
-from docx import Document
-from PyPDF2 import PdfReader
-import chardet
 
 # Set up logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
 
 class FileStorage(StorageInterface):
-    def __init__(self, base_path: str):
+    SUPPORTED_EXTENSIONS = ('.txt', '.md', '.docx', '.pdf')
+    # UTF-32 first: its little-endian BOM starts with the UTF-16 one
+    BOMS = ((codecs.BOM_UTF32_LE, 'utf-32'), (codecs.BOM_UTF32_BE, 'utf-32'), (codecs.BOM_UTF8, 'utf-8-sig'),
+            (codecs.BOM_UTF16_LE, 'utf-16'), (codecs.BOM_UTF16_BE, 'utf-16'))
+    READ_BLOCK_SIZE = 1 << 20
+    DETECTION_SAMPLE_SIZE = 64 * 1024
+
+    def __init__(self, base_path: str, text_cache=None):
+        """
+        :param base_path: Folder of the collections (one subfolder each).
+        :param text_cache: ExtractedTextCache of the text of the .docx and .pdf files (None: parse them on every read).
+        """
         self.base_path = base_path
+        self.text_cache = text_cache
+        # File path -> (size, modification time, encoding) of the text files already decoded
+        self._encodings: Dict[str, Tuple[int, int, str]] = {}
         
         # Check if the base folder exists
         if not os.path.exists(self.base_path):
@@ -40,6 +52,21 @@ class FileStorage(StorageInterface):
         logger.warning(f"Collection not found: {collection_name}")
         return []
 
+    def get_collection_stats(self, collection_name: str) -> Dict[str, Tuple[int, int]]:
+        # A single directory scan, the files are not opened
+        collection_path = os.path.join(self.base_path, collection_name)
+        stats = {}
+        if not os.path.isdir(collection_path):
+            logger.warning(f"Collection not found: {collection_name}")
+            return stats
+        with os.scandir(collection_path) as entries:
+            for entry in entries:
+                if entry.name.lower().endswith(self.SUPPORTED_EXTENSIONS) and entry.is_file():
+                    stat = entry.stat()
+                    stats[entry.name] = (stat.st_size, stat.st_mtime_ns)
+        logger.debug(f"Retrieved {len(stats)} file stats from collection '{collection_name}'")
+        return stats
+
     def get_collection_items(self, collection_name: str) -> Dict[str, str]:
         collection_path = os.path.join(self.base_path, collection_name)
         items = {}
@@ -70,9 +97,9 @@ class FileStorage(StorageInterface):
             if file_extension in ['.txt', '.md']:
                 return self._read_text_file(file_path)
             elif file_extension == '.docx':
-                return self._read_docx(file_path)
+                return self._extract(file_path, 'docx', self._read_docx)
             elif file_extension == '.pdf':
-                return self._read_pdf(file_path)
+                return self._extract(file_path, 'pdf', self._read_pdf)
             else:
                 logger.warning(f"Unsupported file type: {file_extension}")
                 return None
@@ -81,22 +108,74 @@ class FileStorage(StorageInterface):
             return None
 
     def _read_text_file(self, file_path: str) -> str:
-        with open(file_path, 'rb') as f:
-            raw_data = f.read()
-        detected = chardet.detect(raw_data)
-        encoding = detected['encoding'] or 'utf-8'  # Default to utf-8 if detection fails
+        # Tiered decoding: known encoding of the file, then BOM, then strict UTF-8 (most of the corpus),
+        # and only then chardet, on a sample around the first byte that is not UTF-8
+        stat = os.stat(file_path)
+        known = self._encodings.get(file_path)
+        if known and known[0] == stat.st_size and known[1] == stat.st_mtime_ns:
+            encoding = known[2]
+        else:
+            with open(file_path, 'rb') as f:
+                head = f.read(4)
+            encoding = next((bom_encoding for bom, bom_encoding in self.BOMS if head.startswith(bom)), 'utf-8')
+
         try:
-            return raw_data.decode(encoding)
-        except UnicodeDecodeError:
-            # If decoding fails, try with 'latin-1' as a fallback
-            logger.warning(f"Failed to decode {file_path} with {encoding}, falling back to latin-1")
-            return raw_data.decode('latin-1')
+            text = self._decode_file(file_path, encoding)
+        except UnicodeDecodeError as e:
+            if encoding == 'utf-8' and not known:
+                encoding = self._detect_encoding(file_path, getattr(e, 'file_position', 0))
+            else:
+                encoding = 'latin-1'
+            try:
+                text = self._decode_file(file_path, encoding)
+            except (UnicodeDecodeError, LookupError):
+                logger.warning(f"Failed to decode {file_path} with {encoding}, falling back to latin-1")
+                encoding = 'latin-1'
+                text = self._decode_file(file_path, encoding)
+        self._encodings[file_path] = (stat.st_size, stat.st_mtime_ns, encoding)
+        return text
+
+    def _decode_file(self, file_path: str, encoding: str) -> str:
+        """Decode the file block by block: the raw bytes are never held in memory all at once."""
+        decoder = codecs.getincrementaldecoder(encoding)(errors='strict')
+        parts = []
+        offset = 0
+        with open(file_path, 'rb') as f:
+            for block in iter(lambda: f.read(self.READ_BLOCK_SIZE), b''):
+                try:
+                    parts.append(decoder.decode(block))
+                except UnicodeDecodeError as e:
+                    # Position in the file (within a few bytes: the decoder may hold the start of a character)
+                    e.file_position = offset + e.start
+                    raise
+                offset += len(block)
+            parts.append(decoder.decode(b'', final=True))
+        return ''.join(parts)
+
+    def _detect_encoding(self, file_path: str, position: int) -> str:
+        # chardet is slow (pure Python): it only sees a sample that includes the first byte that is not UTF-8
+        start = max(position - self.DETECTION_SAMPLE_SIZE // 2, 0)
+        with open(file_path, 'rb') as f:
+            f.seek(start)
+            sample = f.read(self.DETECTION_SAMPLE_SIZE)
+        import chardet
+        encoding = chardet.detect(sample)['encoding'] or 'latin-1'
+        logger.debug(f"Detected encoding {encoding} for {file_path}")
+        return encoding
+
+    def _extract(self, file_path: str, extractor: str, read) -> str:
+        if self.text_cache is None:
+            return read(file_path)
+        return self.text_cache.get_or_extract(file_path, extractor, read)
 
+    # The readers import their library on first use, collections without .docx or .pdf files never load it
     def _read_docx(self, file_path: str) -> str:
+        from docx import Document
         doc = Document(file_path)
         return '\n'.join([paragraph.text for paragraph in doc.paragraphs])
 
     def _read_pdf(self, file_path: str) -> str:
+        from PyPDF2 import PdfReader
         with open(file_path, 'rb') as f:
             pdf = PdfReader(f)
             return '\n'.join([page.extract_text() for page in pdf.pages])
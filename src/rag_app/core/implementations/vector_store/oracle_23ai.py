@@ -1,20 +1,212 @@
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Iterator, Optional, Sequence, Tuple
+import array
 import logging
+import re
+import threading
+import oracledb
 from src.rag_app.core.interfaces.vector_store_interface import VectorStoreInterface
 
-class Oracle23aiVectorStore:
-    def __init__(self, collection_name: str):
+logger = logging.getLogger(__name__)
+
+DISTANCE_METRICS = ("COSINE", "EUCLIDEAN", "DOT")
+INDEX_ORGANIZATIONS = {
+    "HNSW": "INMEMORY NEIGHBOR GRAPH",  # Needs VECTOR_MEMORY_SIZE on the database
+    "IVF": "NEIGHBOR PARTITIONS"
+}
+
+# ORA-00942: table or view does not exist
+TABLE_NOT_FOUND = 942
+
+# SQL generation, kept free of database access so it can be checked without a connection
+
+def table_name(collection_name: str) -> str:
+    """Table of a collection: an unquoted identifier made only of letters, digits and underscores."""
+    name = re.sub(r"[^A-Za-z0-9_]", "_", collection_name).upper()
+    # Leaves room for the index name suffixes within the 128 characters of an identifier
+    return f"RAG_{name}"[:120]
+
+def create_table_sql(table: str, dimension: int) -> List[str]:
+    return [
+        f"CREATE TABLE IF NOT EXISTS {table} ("
+        f"id VARCHAR2(512) PRIMARY KEY, "
+        f"document_id VARCHAR2(512), "
+        f"content CLOB, "
+        f"metadata JSON, "
+        f"embedding VECTOR({int(dimension)}, FLOAT32))",
+        f"CREATE INDEX IF NOT EXISTS {table}_DOC_IDX ON {table} (document_id)"
+    ]
+
+def create_vector_index_sql(table: str, index_type: str, distance: str, target_accuracy: int) -> str:
+    return (f"CREATE VECTOR INDEX IF NOT EXISTS {table}_VEC_IDX ON {table} (embedding) "
+            f"ORGANIZATION {INDEX_ORGANIZATIONS[index_type]} DISTANCE {distance} "
+            f"WITH TARGET ACCURACY {int(target_accuracy)}")
+
+def merge_sql(table: str) -> str:
+    # Upsert: storing a document again replaces its chunks.
+    # The values are bound in the DML clauses, where a long content can be bound to the CLOB column
+    return (f"MERGE INTO {table} t "
+            f"USING (SELECT :id AS id FROM dual) s "
+            f"ON (t.id = s.id) "
+            f"WHEN MATCHED THEN UPDATE SET t.document_id = :document_id, t.content = :content, "
+            f"t.metadata = :metadata, t.embedding = :embedding "
+            f"WHEN NOT MATCHED THEN INSERT (id, document_id, content, metadata, embedding) "
+            f"VALUES (:id, :document_id, :content, :metadata, :embedding)")
+
+def query_sql(table: str, distance: str, target_accuracy: int, include_embeddings: bool = False) -> str:
+    # FETCH APPROX uses the vector index when there is one, an exact search otherwise
+    embedding = ", embedding" if include_embeddings else ""
+    return (f"SELECT id, content, metadata, VECTOR_DISTANCE(embedding, :query_vector, {distance}) AS distance{embedding} "
+            f"FROM {table} "
+            f"ORDER BY distance "
+            f"FETCH APPROX FIRST :n_results ROWS ONLY WITH TARGET ACCURACY {int(target_accuracy)}")
+
+def delete_sql(table: str) -> str:
+    return f"DELETE FROM {table} WHERE document_id = :document_id"
+
+def clear_sql(table: str) -> str:
+    return f"DELETE FROM {table}"
+
+def batches(rows: Sequence, size: int) -> Iterator[Sequence]:
+    for start in range(0, len(rows), size):
+        yield rows[start:start + size]
+
+def to_rows(embeddings: List[List[float]], metadata: List[Dict[str, Any]], ids: List[str], documents: List[str]) -> List[Dict[str, Any]]:
+    """Bind values of merge_sql: the vectors are bound as FLOAT32 arrays."""
+    return [
+        {"id": chunk_id, "document_id": chunk_metadata.get("document_id"), "content": document,
+         "metadata": chunk_metadata, "embedding": array.array("f", embedding)}
+        for chunk_id, chunk_metadata, document, embedding in zip(ids, metadata, documents, embeddings)
+    ]
+
+# One session pool per database account, shared by the collections of all the domains
+_pools: Dict[Tuple[str, str], Any] = {}
+_pools_lock = threading.Lock()
+
+def get_pool(user: str, password: str, dsn: str, min_sessions: int = 1, max_sessions: int = 4):
+    with _pools_lock:
+        pool = _pools.get((user, dsn))
+        if pool is None:
+            pool = oracledb.create_pool(user=user, password=password, dsn=dsn, min=min_sessions, max=max_sessions, increment=1)
+            _pools[(user, dsn)] = pool
+            logger.info(f"Created Oracle session pool for {user}@{dsn} ({min_sessions}-{max_sessions} sessions)")
+    return pool
+
+def _lobs_as_strings(cursor, metadata):
+    # CLOB contents are fetched with the rows instead of one round trip per LOB
+    if metadata.type_code is oracledb.DB_TYPE_CLOB:
+        return cursor.var(oracledb.DB_TYPE_LONG, arraysize=cursor.arraysize)
+
+class Oracle23aiVectorStore(VectorStoreInterface):
+    """
+    Collection stored in an Oracle Database 23ai table with a VECTOR column.
+    The table is created on the first write, with the dimension of the first embeddings.
+
+    :param collection_name: Name of the collection, the table is RAG_<COLLECTION_NAME>.
+    :param settings: The vector_store configuration (ORACLE_* keys).
+    :param pool: Session pool (anything with acquire() giving a connection); by default the
+        shared pool of ORACLE_USER@ORACLE_DSN.
+    """
+
+    def __init__(self, collection_name: str, settings: Optional[Dict[str, Any]] = None, pool=None):
+        settings = settings or {}
         self.collection_name = collection_name
-        self.persist_directory = persist_directory
-        # Initialize the Oracle23ai vector store here
+        self.table = table_name(collection_name)
+        self.write_batch_size = int(settings.get("ORACLE_WRITE_BATCH_SIZE", 1000))
+        self.distance = settings.get("ORACLE_DISTANCE", "COSINE").upper()
+        self.index_type = (settings.get("ORACLE_VECTOR_INDEX") or "NONE").upper()
+        self.target_accuracy = int(settings.get("ORACLE_TARGET_ACCURACY", 95))
+        if self.distance not in DISTANCE_METRICS:
+            raise ValueError(f"Unsupported distance: {self.distance}. Must be one of {DISTANCE_METRICS}")
+        if self.index_type not in INDEX_ORGANIZATIONS and self.index_type != "NONE":
+            raise ValueError(f"Unsupported vector index: {self.index_type}. Must be one of {tuple(INDEX_ORGANIZATIONS)} or NONE")
+
+        if pool is None:
+            for key in ("ORACLE_USER", "ORACLE_PASSWORD", "ORACLE_DSN"):
+                if not settings.get(key):
+                    raise ValueError(f"vector_store.{key} is required for the Oracle23ai vector store")
+            pool = get_pool(settings["ORACLE_USER"], settings["ORACLE_PASSWORD"], settings["ORACLE_DSN"],
+                            int(settings.get("ORACLE_POOL_MIN", 1)), int(settings.get("ORACLE_POOL_MAX", 4)))
+        self.pool = pool
+        self._table_ready = self._table_exists()
+        logger.info(f"Initialized Oracle 23ai vector store with collection: {collection_name} (table {self.table})")
+
+    def _table_exists(self) -> bool:
+        with self.pool.acquire() as connection:
+            cursor = connection.cursor()
+            cursor.execute("SELECT COUNT(*) FROM user_tables WHERE table_name = :table_name", table_name=self.table)
+            return cursor.fetchone()[0] > 0
+
+    def _create_table(self, connection, dimension: int) -> None:
+        cursor = connection.cursor()
+        for statement in create_table_sql(self.table, dimension):
+            cursor.execute(statement)
+        if self.index_type != "NONE":
+            try:
+                cursor.execute(create_vector_index_sql(self.table, self.index_type, self.distance, self.target_accuracy))
+            except oracledb.DatabaseError as e:
+                # e.g. no vector memory pool for HNSW: the queries still work, with an exact search
+                logger.warning(f"Could not create the {self.index_type} vector index on {self.table}: {e}")
+        self._table_ready = True
+        logger.info(f"Created table {self.table} with VECTOR({dimension}, FLOAT32)")
+
+    def store_embeddings(self, embeddings: List[List[float]], metadata: List[Dict[str, Any]], ids: List[str], documents: List[str]) -> None:
+        if not ids:
+            return
+        logger.info(f"Storing {len(embeddings)} embeddings")
+        rows = to_rows(embeddings, metadata, ids, documents)
+        with self.pool.acquire() as connection:
+            if not self._table_ready:
+                self._create_table(connection, len(embeddings[0]))
+            cursor = connection.cursor()
+            cursor.setinputsizes(content=oracledb.DB_TYPE_LONG, metadata=oracledb.DB_TYPE_JSON, embedding=oracledb.DB_TYPE_VECTOR)
+            statement = merge_sql(self.table)
+            # One round trip per batch of rows (array binding), a single commit
+            for batch in batches(rows, self.write_batch_size):
+                cursor.executemany(statement, batch)
+            connection.commit()
 
-    def add_vector(self, vector):
-        # Method to add a vector to the store
-        pass
+    def delete_documents(self, document_ids: List[str]) -> None:
+        if not document_ids or not self._table_ready:
+            return
+        logger.info(f"Deleting the chunks of {len(document_ids)} documents")
+        with self.pool.acquire() as connection:
+            cursor = connection.cursor()
+            statement = delete_sql(self.table)
+            for batch in batches([{"document_id": document_id} for document_id in document_ids], self.write_batch_size):
+                cursor.executemany(statement, batch)
+            connection.commit()
 
-    def get_vector(self, vector_id):
-        # Method to retrieve a vector from the store
-        pass
+    def clear(self) -> None:
+        if not self._table_ready:
+            return
+        logger.info(f"Deleting the chunks of table {self.table}")
+        with self.pool.acquire() as connection:
+            connection.cursor().execute(clear_sql(self.table))
+            connection.commit()
 
-    # Add other necessary methods for the vector store
+    def query(self, query_embedding: List[float], n_results: int = 10, include_embeddings: bool = False) -> List[Dict[str, Any]]:
+        logger.info(f"Querying vector store for top {n_results} results")
+        if not self._table_ready:
+            return []
+        with self.pool.acquire() as connection:
+            cursor = connection.cursor()
+            cursor.outputtypehandler = _lobs_as_strings
+            cursor.arraysize = max(n_results, 1)
+            try:
+                cursor.execute(query_sql(self.table, self.distance, self.target_accuracy, include_embeddings),
+                               query_vector=array.array("f", query_embedding), n_results=n_results)
+            except oracledb.DatabaseError as e:
+                error, = e.args
+                if getattr(error, "code", None) == TABLE_NOT_FOUND:
+                    self._table_ready = False
+                    return []
+                raise
+            rows = cursor.fetchall()
 
+        results = []
+        for row in rows:
+            result = {"id": row[0], "distance": float(row[3]), "metadata": row[2] or {}, "document": row[1]}
+            if include_embeddings:
+                result["embedding"] = list(row[4])
+            results.append(result)
+        return results
@@ -1,33 +1,70 @@
 from typing import List, Dict, Any
 import logging
+import os
+import threading
 import chromadb
 from src.rag_app.core.interfaces.vector_store_interface import VectorStoreInterface
 
 logger = logging.getLogger(__name__)
 
+# One client per persist directory, shared by the collections of all the domains
+_clients: Dict[str, Any] = {}
+_clients_lock = threading.Lock()
+
+def get_client(persist_directory: str):
+    path = os.path.abspath(persist_directory)
+    with _clients_lock:
+        client = _clients.get(path)
+        if client is None:
+            client = chromadb.PersistentClient(path=path)
+            _clients[path] = client
+            logger.info(f"Opened Chroma client for {path}")
+    return client
+
 class ChromaVectorStore(VectorStoreInterface):
     def __init__(self, collection_name: str, persist_directory: str = "./chroma_db"):
-        self.client = chromadb.PersistentClient(path=persist_directory)
+        self.client = get_client(persist_directory or "./chroma_db")
         self.collection = self.client.get_or_create_collection(name=collection_name)
+        # Largest number of records of a single write
+        self.max_batch_size = self.client.get_max_batch_size()
         logger.info(f"Initialized Chroma vector store with collection: {collection_name}")
 
     def store_embeddings(self, embeddings: List[List[float]], metadata: List[Dict[str, Any]], ids: List[str], documents: List[str]) -> None:
         logger.info(f"Storing {len(embeddings)} embeddings")
-        self.collection.add(
-            embeddings=embeddings,
-            metadatas=metadata,
-            ids=ids,
-            documents=documents
-        )
+        # upsert: storing a document again replaces its chunks instead of failing on duplicate ids
+        for start in range(0, len(ids), self.max_batch_size):
+            end = start + self.max_batch_size
+            self.collection.upsert(
+                embeddings=embeddings[start:end],
+                metadatas=metadata[start:end],
+                ids=ids[start:end],
+                documents=documents[start:end]
+            )
+
+    def delete_documents(self, document_ids: List[str]) -> None:
+        if not document_ids:
+            return
+        logger.info(f"Deleting the chunks of {len(document_ids)} documents")
+        for start in range(0, len(document_ids), self.max_batch_size):
+            self.collection.delete(where={"document_id": {"$in": document_ids[start:start + self.max_batch_size]}})
+
+    def clear(self) -> None:
+        ids = self.collection.get(include=[])["ids"]
+        logger.info(f"Deleting the {len(ids)} chunks of the collection")
+        for start in range(0, len(ids), self.max_batch_size):
+            self.collection.delete(ids=ids[start:start + self.max_batch_size])
 
-    def query(self, query_embedding: List[float], n_results: int = 10) -> List[Dict[str, Any]]:
+    def query(self, query_embedding: List[float], n_results: int = 10, include_embeddings: bool = False) -> List[Dict[str, Any]]:
         logger.info(f"Querying vector store for top {n_results} results")
+        include = ["metadatas", "distances", "documents"]
+        if include_embeddings:
+            include.append("embeddings")
         results = self.collection.query(
             query_embeddings=[query_embedding],
             n_results=n_results,
-            include=["metadatas", "distances", "documents"]
+            include=include
         )
-        return [
+        formatted_results = [
             {
                 "id": id,
                 "distance": distance,
@@ -41,3 +78,7 @@ class ChromaVectorStore(VectorStoreInterface):
                 results['documents'][0]
             )
         ]
+        if include_embeddings:
+            for result, embedding in zip(formatted_results, results['embeddings'][0]):
+                result["embedding"] = embedding
+        return formatted_results
@@ -1,13 +1,17 @@
+from typing import Any, Dict, Optional
 from ...interfaces.vector_store_interface import VectorStoreInterface, VectorStoreFactoryInterface
-from src.rag_app.core.implementations.vector_store.vector_store import ChromaVectorStore
-from src.rag_app.core.implementations.vector_store.oracle_23ai import Oracle23aiVectorStore
 
 class VectorStoreFactory(VectorStoreFactoryInterface):  # Implementing the interface
     @staticmethod
-    def create_vector_store(store_type: str, collection_name: str, persist_directory: str = None) -> VectorStoreInterface:
+    def create_vector_store(store_type: str, collection_name: str, persist_directory: str = None,
+                            settings: Optional[Dict[str, Any]] = None) -> VectorStoreInterface:
+        """settings: the vector_store configuration, used by Oracle23ai (ORACLE_* keys)."""
+        # Only the configured backend is imported (chromadb and oracledb are slow to import)
         if store_type == "Chroma":
+            from src.rag_app.core.implementations.vector_store.vector_store import ChromaVectorStore
             return ChromaVectorStore(collection_name, persist_directory)
         elif store_type == "Oracle23ai":
-            return Oracle23aiVectorStore(collection_name)  # No persist_directory needed
+            from src.rag_app.core.implementations.vector_store.oracle_23ai import Oracle23aiVectorStore
+            return Oracle23aiVectorStore(collection_name, settings)  # No persist_directory needed
         else:
             raise ValueError(f"Unsupported vector store type: {store_type}")
@@ -0,0 +1,16 @@
+from abc import ABC, abstractmethod
+from typing import List, Dict, Any
+
+class ContextBuilderInterface(ABC):
+    @abstractmethod
+    def build(self, results: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """
+        Select the passages that will be used as prompt context.
+
+        Args:
+            results (List[Dict[str, Any]]): The re-ranked retrieval results.
+
+        Returns:
+            List[Dict[str, Any]]: The passages to include in the prompt, in prompt order.
+        """
+        pass
@@ -0,0 +1,18 @@
+from abc import ABC, abstractmethod
+from typing import List, Dict, Any
+
+class ContextCompressorInterface(ABC):
+    @abstractmethod
+    def compress(self, passages: List[Dict[str, Any]], question: str, query_embedding: List[float]) -> List[Dict[str, Any]]:
+        """
+        Remove the parts of the context passages that are not relevant to the question.
+
+        Args:
+            passages (List[Dict[str, Any]]): The passages selected for the prompt.
+            question (str): The user's question.
+            query_embedding (List[float]): The embedding already computed for the question.
+
+        Returns:
+            List[Dict[str, Any]]: The compressed passages, in the same order.
+        """
+        pass
@@ -1,4 +1,4 @@
-from typing import List, Protocol
+from typing import List, Protocol, Dict, Any
 from pydantic import BaseModel
 
 class Message(BaseModel):
@@ -21,3 +21,8 @@ class ConversationInterface(Protocol):
     def get_last_n_messages_by_role(self, role: str, n: int) -> str:
         ...
 
+    def to_dict(self) -> Dict[str, Any]:
+        ...
+
+    def load_dict(self, data: Dict[str, Any]) -> None:
+        ...
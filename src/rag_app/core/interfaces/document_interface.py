@@ -88,3 +88,6 @@ class DocumentInterface(ABC):
 class DocumentFactoryInterface(Protocol):
     def create_document(self, name: str, collection: str, title: str, content: Optional[str] = None) -> DocumentInterface:
         ...
+
+    def flush(self) -> None:
+        ...
@@ -1,5 +1,5 @@
 from abc import ABC, abstractmethod
-from typing import Dict, List
+from typing import Any, Dict, List, Optional, Tuple
 from .domain_interface import DomainInterface, DomainFactoryInterface
 from .document_interface import DocumentInterface, DocumentFactoryInterface
 from .storage_interface import StorageInterface
@@ -32,12 +32,16 @@ class DomainManagerInterface(ABC):
     def apply_chunking_strategy(self) -> None:
         pass
 
+    @abstractmethod
+    def get_chunks(self, chunk_ids: List[str]) -> Dict[str, Dict[str, Any]]:
+        pass
+
     @abstractmethod
     def _create_domains(self) -> Dict[str, DomainInterface]:
         pass
 
     @abstractmethod
-    def _create_documents(self, collection_name: str) -> List[DocumentInterface]:
+    def _create_documents(self, collection_name: str, stats: Optional[Dict[str, Tuple[int, int]]] = None) -> List[DocumentInterface]:
         pass
 
     @abstractmethod
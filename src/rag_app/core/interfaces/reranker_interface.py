@@ -2,6 +2,13 @@ from abc import ABC, abstractmethod
 from typing import List, Dict, Any
 
 class ReRankerInterface(ABC):
+    @property
+    def requires_embeddings(self) -> bool:
+        """
+        Whether re_rank needs the candidate embeddings (the 'embedding' key of each result).
+        """
+        return False
+
     @abstractmethod
     def re_rank(self, results: List[Dict[str, Any]], original_query: str) -> List[Dict[str, Any]]:
         """
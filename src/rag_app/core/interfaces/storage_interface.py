@@ -1,5 +1,5 @@
 from abc import ABC, abstractmethod
-from typing import Dict, List, Optional
+from typing import Dict, List, Optional, Tuple
 
 class StorageInterface(ABC):
     @abstractmethod
@@ -12,6 +12,11 @@ class StorageInterface(ABC):
         """Return a list of file names in the specified collection."""
         pass
 
+    @abstractmethod
+    def get_collection_stats(self, collection_name: str) -> Dict[str, Tuple[int, int]]:
+        """Return the supported files of the specified collection with their size in bytes and modification time in ns."""
+        pass
+
     @abstractmethod
     def get_collection_items(self, collection_name: str) -> Dict[str, str]:
         """Return a dictionary of file names and their contents for the specified collection."""
@@ -1,5 +1,5 @@
 from abc import ABC, abstractmethod
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Optional
 
 class VectorStoreInterface(ABC):
     @abstractmethod
@@ -7,10 +7,21 @@ class VectorStoreInterface(ABC):
         pass
 
     @abstractmethod
-    def query(self, query_embedding: List[float], n_results: int = 10) -> List[Dict[str, Any]]:
+    def delete_documents(self, document_ids: List[str]) -> None:
+        """Delete the chunks of the given documents (document_id in the chunk metadata)."""
+        pass
+
+    @abstractmethod
+    def clear(self) -> None:
+        """Delete every chunk of the collection."""
+        pass
+
+    @abstractmethod
+    def query(self, query_embedding: List[float], n_results: int = 10, include_embeddings: bool = False) -> List[Dict[str, Any]]:
         pass
 
 class VectorStoreFactoryInterface(ABC):
     @abstractmethod
-    def create_vector_store(self, store_type: str, collection_name: str, persist_directory: str = None) -> VectorStoreInterface:
+    def create_vector_store(self, store_type: str, collection_name: str, persist_directory: str = None,
+                            settings: Optional[Dict[str, Any]] = None) -> VectorStoreInterface:
         pass
\ No newline at end of file
@@ -4,35 +4,62 @@ import time
 import traceback  # Add this import
 from dotenv import load_dotenv
 import os
+from typing import Optional
 
 # Interfaces and Implementations
+# The provider implementations (chat, embedding, vector store, document backends) are imported
+# by the factories when the configuration selects them: their SDKs are slow to import
 from rag_app.core.interfaces.chat_model_interface import ChatModelInterface
-from rag_app.core.implementations.chat_model.oci_chat_model import OCI_CommandRplus
+from rag_app.core.interfaces.embedding_model_interface import EmbeddingModelInterface
 from rag_app.core.implementations.chunk_strategy.fixed_size_strategy import FixedSizeChunkStrategy
 from rag_app.core.implementations.chunk_strategy.semantic_strategy import SemanticChunkStrategy
 from rag_app.core.implementations.document.document_factory import DocumentFactory
 from rag_app.core.implementations.domain.domain_factory import DomainFactory
 from rag_app.core.implementations.domain_manager.domain_manager import DomainManager
-from rag_app.core.implementations.embedding_model.cohere_embedding import CohereEmbedding
-from rag_app.core.implementations.embedding_model.ollama_embedding import OllamaEmbedding
+from rag_app.core.implementations.domain_manager.catalog import DomainCatalog, config_hash
 from rag_app.core.implementations.vector_store.vector_store_factory import VectorStoreFactory
 from rag_app.core.implementations.storage.file_storage import FileStorage
+from rag_app.core.implementations.storage.extracted_text_cache import ExtractedTextCache
+from rag_app.core.implementations.chat_model.response_cache import cached_chat_model
+from rag_app.core.implementations.embedding_model.batching_embedding import BatchingEmbeddingModel
+from rag_app.core.implementations.query_engine.query_engine import QueryEngine
+from rag_app.core.implementations.query_optimizer.query_optimizer import QueryOptimizer
+from rag_app.core.implementations.reranker.reranker import ResultReRanker
+from rag_app.core.implementations.context_builder.context_builder import ContextBuilder
+from rag_app.core.implementations.context_compressor.context_compressor import SentenceContextCompressor, SentenceEmbeddingCache
 
 logger = logging.getLogger(__name__)
 
-def initialize_rag_components(config_data: dict):
+def initialize_rag_components(config_data: dict, chat_model: Optional[ChatModelInterface] = None,
+                              embedding_model: Optional[EmbeddingModelInterface] = None):
+    """
+    Create the RAG components from the configuration.
+    chat_model and embedding_model replace the configured providers when given
+    (e.g. offline models for benchmarks).
+    """
     # Load environment variables from .env file
     load_dotenv()
 
-    try:
-        chat_model: ChatModelInterface = OCI_CommandRplus(config_data["chat_model"])
-        logger.info(f"{chat_model.__class__.__name__} chat model initialized successfully")
-    except Exception as e:
-        logger.error(f"Failed to initialize or test chat model: {str(e)}")
-        sys.exit(1)
+    if chat_model is None:
+        try:
+            from rag_app.core.implementations.chat_model.oci_chat_model import OCI_CommandRplus
+            chat_model = OCI_CommandRplus(config_data["chat_model"])
+            logger.info(f"{chat_model.__class__.__name__} chat model initialized successfully")
+        except Exception as e:
+            logger.error(f"Failed to initialize or test chat model: {str(e)}")
+            sys.exit(1)
+    chat_model = cached_chat_model(chat_model, config_data["chat_model"], config_data.get("response_cache", {}))
+
+    text_cache = None
+    if config_data.get("EXTRACTED_TEXT_CACHE_DIR"):
+        try:
+            text_cache = ExtractedTextCache(config_data["EXTRACTED_TEXT_CACHE_DIR"],
+                                            config_data.get("EXTRACTED_TEXT_CACHE_MAX_MB", 2048) * 1024 ** 2)
+        except OSError as e:
+            logger.warning(f"Extracted text cache disabled: {e}")
 
     try:
-        storage = FileStorage(config_data["DATA_FOLDER"])
+        storage = FileStorage(config_data["DATA_FOLDER"], text_cache=text_cache)
     except (FileNotFoundError, NotADirectoryError) as e:
         logger.error(f"Failed to initialize storage: {e}")
         sys.exit(1)
@@ -44,21 +71,26 @@ def initialize_rag_components(config_data: dict):
 
     logger.info("Initializing embedding model...")
     try:
-        if config_data['embedding_model']['PROVIDER'].lower() == "cohere":
+        if embedding_model is not None:
+            logger.info(f"Using the provided embedding model '{embedding_model.model_name}'")
+        elif config_data['embedding_model']['PROVIDER'].lower() == "cohere":
                 # Verify that the COHERE_API_KEY is loaded
             cohere_api_key = os.getenv('COHERE_API_KEY')
             if not cohere_api_key:
                 raise ValueError("COHERE_API_KEY environment variable is not set or empty")
-                
+
+            from rag_app.core.implementations.embedding_model.cohere_embedding import CohereEmbedding
             embedding_model = CohereEmbedding(model_name=config_data['embedding_model']['MODEL_NAME'])
             logger.info(f"CohereEmbedding model '{config_data['embedding_model']['MODEL_NAME']}' initialized successfully")
         elif config_data['embedding_model']['PROVIDER'].lower() == "ollama":
             ollama_url = f"http://{config_data['embedding_model']['OLLAMA_HOST']}:{config_data['embedding_model']['OLLAMA_PORT']}"
-            
+
+            from rag_app.core.implementations.embedding_model.ollama_embedding import OllamaEmbedding
             embedding_model = OllamaEmbedding(
                 model_name=config_data['embedding_model']['MODEL_NAME'],
                 ollama_host=config_data['embedding_model']['OLLAMA_HOST'],
-                ollama_port=config_data['embedding_model']['OLLAMA_PORT']
+                ollama_port=config_data['embedding_model']['OLLAMA_PORT'],
+                batch_size=config_data['embedding_model'].get('OLLAMA_BATCH_SIZE', 64)
             )
             logger.info(f"OllamaEmbedding model '{config_data['embedding_model']['MODEL_NAME']}' initialized successfully with URL: {ollama_url}")
         else:
@@ -87,12 +119,25 @@ def initialize_rag_components(config_data: dict):
     # Initialize domain and document factories
     domain_factory = DomainFactory()
     logger.info("Initializing document factory...")
-    document_factory = DocumentFactory(config_data['document']['IMPLEMENTATION'])
+    db_connection = None
+    if config_data['document']['IMPLEMENTATION'] == "OCI_DB":
+        from rag_app.core.implementations.document.document_database import connect_database
+        db_connection = connect_database(
+            config_data['document']['DB_CONNECTION_STRING'],
+            pool_max=config_data['document'].get('DB_POOL_MAX', 4),
+            flush_rows=config_data['document'].get('DB_FLUSH_ROWS', 1000)
+        )
+    document_factory = DocumentFactory(config_data['document']['IMPLEMENTATION'], db_connection=db_connection)
     logger.info(f"Document factory initialized with {config_data['document']['IMPLEMENTATION']} implementation")
     logger.info("Initializing vector store factory...")
     vector_store_factory = VectorStoreFactory()
     logger.info("Vector store factory initialized")
 
+    # Snapshot of the last ingestion with this configuration: restores the domains without listing the data folder again
+    catalog = None
+    if config_data.get('DOMAIN_CATALOG_FILE'):
+        catalog = DomainCatalog(config_data['DOMAIN_CATALOG_FILE'], config_hash(config_data))
+
     logger.info("Initializing DomainManager...")
     start_time = time.time()
     try:
@@ -104,7 +149,9 @@ def initialize_rag_components(config_data: dict):
             document_factory=document_factory,
             vector_store_factory=vector_store_factory,
             vector_stores_config=config_data['vector_store'],
-            embedding_model=embedding_model
+            embedding_model=embedding_model,
+            catalog=catalog,
+            chunk_archive_dir=config_data.get('CHUNK_ARCHIVE_DIR')
         )
     except Exception as e:
         logger.error(f"Failed to initialize DomainManager: {str(e)}")
@@ -116,3 +163,51 @@ def initialize_rag_components(config_data: dict):
     logger.info(f"DomainManager initialized in {end_time - start_time:.2f} seconds")
 
     return domain_manager, chat_model, embedding_model, chunk_strategy
+
+def build_query_engine(config_data: dict, domain_manager, chat_model, embedding_model, chunk_strategy) -> QueryEngine:
+    query_engine_config = config_data['query_engine']
+
+    # Only the query path batches: the ingestion embeds one text at a time and would wait out every batch window
+    if config_data['embedding_model'].get('QUERY_BATCHING', True):
+        embedding_model = BatchingEmbeddingModel(
+            embedding_model,
+            window_ms=config_data['embedding_model'].get('BATCH_WINDOW_MS', 5),
+            max_batch_size=config_data['embedding_model'].get('MAX_BATCH_SIZE', 32)
+        )
+        logger.info(f"Query embeddings batched (window {embedding_model.window * 1000:g} ms, at most {embedding_model.max_batch_size} per call)")
+
+    context_builder = None
+    if query_engine_config.get('USE_CONTEXT_BUILDER', False):
+        context_builder = ContextBuilder(max_tokens=query_engine_config.get('CONTEXT_MAX_TOKENS', 1500))
+        logger.info(f"Using ContextBuilder with a budget of {context_builder.max_tokens} tokens")
+
+    context_compressor = None
+    if query_engine_config.get('USE_CONTEXT_COMPRESSOR', False):
+        context_compressor = SentenceContextCompressor(
+            embedding_model=embedding_model,
+            max_tokens=query_engine_config.get('COMPRESSION_MAX_TOKENS', 750),
+            ratio=query_engine_config.get('COMPRESSION_RATIO', 0.5),
+            cache=SentenceEmbeddingCache(max_entries=query_engine_config.get('SENTENCE_CACHE_SIZE', 10000))
+        )
+        logger.info(f"Using SentenceContextCompressor with a budget of {context_compressor.max_tokens} tokens")
+
+    return QueryEngine(
+        domain_manager=domain_manager,
+        vector_stores=domain_manager.vector_stores,
+        embedding_model=embedding_model,
+        chat_model=chat_model,
+        chunk_strategy=chunk_strategy,
+        query_optimizer=QueryOptimizer() if query_engine_config.get('USE_QUERY_OPTIMIZER', True) else None,
+        result_re_ranker=ResultReRanker(
+            mode=query_engine_config.get('RE_RANKER_MODE', 'distance'),
+            lambda_mult=query_engine_config.get('MMR_LAMBDA', 0.5),
+            top_k=query_engine_config.get('MMR_TOP_K', 10)
+        ) if query_engine_config.get('USE_RESULT_RE_RANKER', True) else None,
+        n_results=query_engine_config.get('N_RESULTS', 5),
+        context_builder=context_builder,
+        context_compressor=context_compressor,
+        retrieval_mode=query_engine_config.get('RETRIEVAL_MODE', 'fixed'),
+        initial_fetch=query_engine_config.get('ADAPTIVE_INITIAL_FETCH', 2),
+        fetch_growth=query_engine_config.get('ADAPTIVE_FETCH_GROWTH', 2),
+        single_flight=query_engine_config.get('SINGLE_FLIGHT', True)
+    )
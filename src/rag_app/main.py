@@ -1,6 +1,7 @@
 import sys
 import os
 import logging
+import asyncio
 import uvicorn
 import json
 import glob
@@ -8,10 +9,8 @@ from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 from ..api import routes
 from rag_app.private_config import private_settings
-from rag_app.core.implementations.query_engine.query_engine import QueryEngine
-from rag_app.core.implementations.reranker.reranker import ResultReRanker
-from rag_app.initialization import initialize_rag_components
-from rag_app.core.implementations.query_optimizer.query_optimizer import QueryOptimizer
+from rag_app.initialization import initialize_rag_components, build_query_engine
+from rag_app import tracing, profiling
 
 # Add the parent directory to the Python path
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -20,6 +19,23 @@ sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
 
+# Configure tracing
+tracing.configure(
+    enabled=private_settings.tracing.ENABLED,
+    path=private_settings.tracing.FILE,
+    max_bytes=private_settings.tracing.MAX_BYTES,
+    backup_count=private_settings.tracing.BACKUP_COUNT,
+    sample_rate=private_settings.tracing.SAMPLE_RATE,
+    slow_threshold_ms=private_settings.tracing.SLOW_THRESHOLD_MS
+)
+
+# Configure per-request profiling
+profiling.configure(
+    enabled=private_settings.profiling.ENABLED,
+    directory=private_settings.profiling.DIRECTORY,
+    max_profiles=private_settings.profiling.MAX_PROFILES
+)
+
 # Create FastAPI app
 app = FastAPI(title=private_settings.APP_NAME, version=private_settings.APP_VERSION)
 
@@ -30,7 +46,8 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["GET", "POST", "PUT", "DELETE", "OPTIONS"],  # Specify methods
     allow_headers=["*"],
-    expose_headers=["*"],  # Add this line
+    # "*" does not cover credentialed requests: the session id header is listed explicitly
+    expose_headers=["*", routes.SESSION_HEADER],
 )
 
 # Include the API router
@@ -69,32 +86,46 @@ async def init_query_engine():
         merged_config = merge_configs(private_settings.dict(), config_data)
 
         # 4. Call initialize_rag_components with the merged config
-        domain_manager, chat_model, embedding_model, chunk_strategy = initialize_rag_components(merged_config)
+        # In a worker thread: ingestion is blocking and the event loop keeps serving requests
+        domain_manager, chat_model, embedding_model, chunk_strategy = await asyncio.to_thread(initialize_rag_components, merged_config)
 
         # 5. Initialize the Query Engine
-        query_engine = QueryEngine(
-            domain_manager=domain_manager,
-            vector_stores=domain_manager.vector_stores,
-            embedding_model=embedding_model,
-            chat_model=chat_model,
-            chunk_strategy=chunk_strategy,
-            query_optimizer=QueryOptimizer() if merged_config['query_engine'].get('USE_QUERY_OPTIMIZER', True) else None,
-            result_re_ranker=ResultReRanker() if merged_config['query_engine'].get('USE_RESULT_RE_RANKER', True) else None
-        )
+        query_engine = build_query_engine(merged_config, domain_manager, chat_model, embedding_model, chunk_strategy)
+
+        if routes.query_engine is not None:
+            # /setup_rag completed while this configuration was loading in the background: keep its engine
+            logger.info("Query engine already configured by /setup_rag, discarding the startup configuration")
+            return
 
         # Update the global query_engine in the routes module
         routes.query_engine = query_engine
         routes.domain_manager = domain_manager
+        routes.conversation_config = merged_config.get('conversation', {})
+        await routes.conversation_store.clear()
 
         logger.info("Query engine initialized successfully on startup")
     except Exception as e:
         logger.error(f"Error initializing query engine on startup: {str(e)}")
         raise
 
+async def init_query_engine_in_background():
+    try:
+        await init_query_engine()
+    except (Exception, SystemExit):
+        # initialize_rag_components exits on configuration errors: keep the server up, /setup_rag can fix them
+        logger.error("Startup initialization failed, the query engine is not available until /setup_rag is called")
+    finally:
+        routes.initializing = False
+
 # Add startup event to initialize query engine
 @app.on_event("startup")
 async def startup_event():
-    await init_query_engine()
+    if private_settings.BACKGROUND_INIT:
+        # The server accepts requests (health checks, /metrics) while the engine loads; /ask and /init answer 503
+        routes.initializing = True
+        app.state.init_task = asyncio.create_task(init_query_engine_in_background())
+    else:
+        await init_query_engine()
 
 def run():
     """Run the FastAPI application."""
@@ -10,28 +10,80 @@ class ChatModelSettings(BaseModel):
     OCI_CONFIG_PROFILE: str = "IDIKA"
     OCI_CONFIG_PATH: str = "~/.oci/config"
     OCI_DEFAULT_MODEL: str = "cohere.command-r-plus"
+    OCI_HTTP_LOG: bool = False  # Log every request of the oci SDK
 
 class EmbeddingModelSettings(BaseModel):
     OLLAMA_HOST: str = "10.0.0.135"
     OLLAMA_PORT: int = 11434
+    OLLAMA_BATCH_SIZE: int = 64  # Texts per /api/embed request
+    # Concurrent query embeddings grouped into one call: wait up to BATCH_WINDOW_MS for up to MAX_BATCH_SIZE queries
+    QUERY_BATCHING: bool = True
+    BATCH_WINDOW_MS: float = 5
+    MAX_BATCH_SIZE: int = 32
 
 class VectorStoreSettings(BaseModel):
     CHROMA_PERSIST_DIRECTORY: str = "./chroma_db" # Required if DEFAULT_PROVIDER = "Chroma"
+    # Required if a domain uses Oracle23ai
+    ORACLE_USER: Optional[str] = None
+    ORACLE_PASSWORD: Optional[str] = None
+    ORACLE_DSN: Optional[str] = None  # e.g. host:1521/service_name
+    ORACLE_POOL_MIN: int = 1
+    ORACLE_POOL_MAX: int = 4
 
 class DocumentSettings(BaseModel):
-    DB_CONNECTION_STRING: Optional[str] = None  # Required if IMPLEMENTATION is "OCI_DB"
+    DB_CONNECTION_STRING: Optional[str] = None  # Required if IMPLEMENTATION is "OCI_DB" (user/password@dsn, or sqlite:///<path>)
+    DB_POOL_MAX: int = 4
+    DB_FLUSH_ROWS: int = 1000  # Buffered rows written in one transaction
+
+class SessionSettings(BaseModel):
+    MAX_SESSIONS: int = 1000
+    IDLE_TTL_SECONDS: Optional[float] = 3600
+    SPILL_DIRECTORY: Optional[str] = None  # Evicted conversations are written here and restored on the next request
+
+class TracingSettings(BaseModel):
+    ENABLED: bool = False
+    FILE: str = os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(__file__))), "traces", "traces.jsonl")
+    MAX_BYTES: int = 10_000_000
+    BACKUP_COUNT: int = 5
+    SAMPLE_RATE: float = 0.01  # Fraction of the fast, successful requests that are kept
+    SLOW_THRESHOLD_MS: float = 2000  # Slower requests are always kept
+
+class ProfilingSettings(BaseModel):
+    ENABLED: bool = False  # Requests are only profiled when they also send the X-Profile header
+    DIRECTORY: str = os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(__file__))), "profiles")
+    MAX_PROFILES: int = 50
+
+class ResponseCacheSettings(BaseModel):
+    ENABLED: bool = False
+    MAX_TEMPERATURE: float = 0.1  # Responses are only cached when the generation is close to deterministic
+    MAX_ENTRIES: int = 1000  # In memory
+    TTL_SECONDS: Optional[float] = 86400
+    DIRECTORY: Optional[str] = os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(__file__))), "cache", "responses")  # None: memory only
+    MAX_DISK_MB: int = 256
 
 class PrivateSettings(BaseSettings):
     APP_NAME: str = "OrAsk"
     APP_VERSION: str = "0.1"
     DEBUG: bool = False
     LOG_LEVEL: str = "DEBUG"
+    STREAM_FLUSH_INTERVAL_MS: float = 0
+    # Default of the "compact" field of /ask and /init: the done event only has the new messages and the sources used in the prompt
+    COMPACT_RESPONSES: bool = False
+    SOURCE_SNIPPET_CHARS: int = 200
+    BACKGROUND_INIT: bool = True  # Load the last configuration after the server starts accepting requests
     DATABASE_URL: str
     OCI_API_KEY: str
     COHERE_API_KEY: str
     DATA_FOLDER: str = os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(__file__))), "data")
     DOCS_FOLDER: str = os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(__file__))), "docs")
     CONFIGS_FOLDER: str = os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(__file__))), "configs")
+    # Snapshot of the ingested domains for fast restarts (None: disabled)
+    DOMAIN_CATALOG_FILE: Optional[str] = os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(__file__))), "catalog", "domains.json")
+    # Compressed archive of the chunks of the last ingestion, one per domain, for the /chunks endpoints (None: disabled)
+    CHUNK_ARCHIVE_DIR: Optional[str] = os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(__file__))), "chunks")
+    # Compressed text of the parsed PDF and DOCX files, reused by the next ingestions (None: disabled)
+    EXTRACTED_TEXT_CACHE_DIR: Optional[str] = os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(__file__))), "cache", "extracted_text")
+    EXTRACTED_TEXT_CACHE_MAX_MB: int = 2048
 
     # New INIT_PROMPT
     INIT_PROMPT: str = """You are a helpful Oracle chat assistant called AskOra developed to help the customers with the Oracle Documentation.
@@ -43,6 +95,10 @@ class PrivateSettings(BaseSettings):
     embedding_model: EmbeddingModelSettings = EmbeddingModelSettings()
     vector_store: VectorStoreSettings = VectorStoreSettings()
     document: DocumentSettings = DocumentSettings()
+    session: SessionSettings = SessionSettings()
+    tracing: TracingSettings = TracingSettings()
+    profiling: ProfilingSettings = ProfilingSettings()
+    response_cache: ResponseCacheSettings = ResponseCacheSettings()
 
     class Config:
         env_file = ".env"
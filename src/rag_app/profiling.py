@@ -0,0 +1,185 @@
+import contextvars
+import cProfile
+import functools
+import io
+import logging
+import os
+import pstats
+import re
+import threading
+import time
+from typing import Callable, Dict, List, Optional
+
+# Opt-in cProfile capture of single requests.
+#
+# When profiling is enabled in the configuration, a request carrying the profile header
+# is run with cProfile active on the event loop thread until its response is complete.
+# Functions handed to worker threads through wrap() are profiled in those threads as
+# well and merged into the same profile. The result is saved as <request id>.prof
+# (pstats format, e.g. for snakeviz) with a .txt summary of the top functions.
+# The event loop is shared: work of concurrent requests shows up in the profile too,
+# so profile on a quiet instance. One request is profiled at a time.
+# When disabled, or for requests without the header, nothing is done.
+
+logger = logging.getLogger(__name__)
+
+PROFILE_HEADER = "X-Profile"
+_PROFILE_NAME = re.compile(r"^[\w.-]+\.(prof|txt)$")
+
+_active_profile: contextvars.ContextVar[Optional["RequestProfile"]] = contextvars.ContextVar("rag_active_profile", default=None)
+
+class RequestProfile:
+    def __init__(self, profiler: "Profiler", request_id: str, label: str):
+        self.profiler = profiler
+        self.request_id = request_id
+        self.label = label
+        self._profile = cProfile.Profile()
+        self._thread_profiles: List[cProfile.Profile] = []
+        self._lock = threading.Lock()
+        self._token = None
+        self._start = 0.0
+        self.path: Optional[str] = None
+
+    def start(self) -> "RequestProfile":
+        self._token = _active_profile.set(self)
+        self._start = time.perf_counter()
+        self._profile.enable()
+        return self
+
+    def stop(self) -> Optional[str]:
+        """Stop profiling and save the profile. Return the path of the .prof file."""
+        if self.path is not None:
+            return self.path
+        self._profile.disable()
+        duration = time.perf_counter() - self._start
+        try:
+            _active_profile.reset(self._token)
+        except ValueError:
+            pass
+        try:
+            self.path = self.profiler.save(self, duration)
+        finally:
+            self.profiler.release()
+        return self.path
+
+    def run_in_thread(self, fn: Callable, *args, **kwargs):
+        profile = cProfile.Profile()
+        try:
+            profile.enable()
+        except ValueError:
+            # Python 3.12+ allows a single active profiler per interpreter
+            return fn(*args, **kwargs)
+        try:
+            return fn(*args, **kwargs)
+        finally:
+            profile.disable()
+            with self._lock:
+                self._thread_profiles.append(profile)
+
+    def stats(self) -> pstats.Stats:
+        stats = pstats.Stats(self._profile)
+        with self._lock:
+            for profile in self._thread_profiles:
+                stats.add(profile)
+        return stats
+
+    @property
+    def threads(self) -> int:
+        return len(self._thread_profiles)
+
+class Profiler:
+    def __init__(self, directory: str, max_profiles: int = 50):
+        self.directory = directory
+        self.max_profiles = max_profiles
+        self._busy = threading.Lock()
+        os.makedirs(directory, exist_ok=True)
+
+    def start(self, label: str, request_id: str) -> Optional[RequestProfile]:
+        if not self._busy.acquire(blocking=False):
+            logger.warning(f"A request is already being profiled, not profiling {label} ({request_id})")
+            return None
+        logger.info(f"Profiling {label} ({request_id})")
+        return RequestProfile(self, request_id, label).start()
+
+    def release(self) -> None:
+        self._busy.release()
+
+    def save(self, profile: RequestProfile, duration: float) -> str:
+        base_name = f"{time.strftime('%Y%m%d%H%M%S')}_{re.sub(r'[^A-Za-z0-9_-]', '_', profile.request_id)}"
+        prof_path = os.path.join(self.directory, f"{base_name}.prof")
+        stats = profile.stats()
+        stats.dump_stats(prof_path)
+
+        summary = io.StringIO()
+        summary.write(f"{profile.label} - request {profile.request_id} - {duration * 1000:.1f} ms - "
+                      f"{profile.threads} worker thread profile(s) merged\n\n")
+        pstats.Stats(prof_path, stream=summary).sort_stats("cumulative").print_stats(50)
+        with open(os.path.join(self.directory, f"{base_name}.txt"), "w", encoding="utf-8") as f:
+            f.write(summary.getvalue())
+
+        logger.info(f"Saved profile of {profile.label} ({profile.request_id}) to {prof_path}")
+        self._prune()
+        return prof_path
+
+    def _prune(self) -> None:
+        if self.max_profiles <= 0:
+            return
+        profiles = [profile["name"] for profile in self.list_profiles() if profile["name"].endswith(".prof")]
+        for name in profiles[self.max_profiles:]:
+            for path in (name, name[:-len(".prof")] + ".txt"):
+                try:
+                    os.remove(os.path.join(self.directory, path))
+                except FileNotFoundError:
+                    pass
+
+    def list_profiles(self) -> List[Dict[str, object]]:
+        """Saved profiles and summaries, most recent first."""
+        profiles = []
+        for name in os.listdir(self.directory):
+            if not _PROFILE_NAME.match(name):
+                continue
+            try:
+                stat = os.stat(os.path.join(self.directory, name))
+            except FileNotFoundError:
+                continue
+            profiles.append({"name": name, "size": stat.st_size, "created": stat.st_mtime})
+        profiles.sort(key=lambda profile: (profile["created"], profile["name"]), reverse=True)
+        return profiles
+
+    def profile_path(self, name: str) -> Optional[str]:
+        if not _PROFILE_NAME.match(name):
+            return None
+        path = os.path.join(self.directory, name)
+        return path if os.path.isfile(path) else None
+
+_profiler: Optional[Profiler] = None
+
+def configure(enabled: bool, directory: str, max_profiles: int = 50) -> None:
+    global _profiler
+    _profiler = Profiler(directory, max_profiles) if enabled else None
+    if enabled:
+        logger.info(f"Per-request profiling enabled with the {PROFILE_HEADER} header, profiles written to {directory}")
+
+def get_profiler() -> Optional[Profiler]:
+    return _profiler
+
+def is_requested(header_value: Optional[str]) -> bool:
+    """Whether a request with this profile header value is to be profiled."""
+    return _profiler is not None and bool(header_value) and header_value.lower() not in ("0", "false", "no")
+
+def start_profile(header_value: Optional[str], label: str, request_id: str) -> Optional[RequestProfile]:
+    """Start profiling the request if profiling is enabled and the header asks for it."""
+    if not is_requested(header_value):
+        return None
+    return _profiler.start(label, request_id)
+
+def wrap(fn: Callable) -> Callable:
+    """Profile fn in the thread that runs it when the caller is being profiled."""
+    profile = _active_profile.get()
+    if profile is None:
+        return fn
+
+    @functools.wraps(fn)
+    def wrapper(*args, **kwargs):
+        return profile.run_in_thread(fn, *args, **kwargs)
+    return wrapper
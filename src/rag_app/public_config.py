@@ -10,7 +10,21 @@ class ChunkingSettings(BaseModel):
 
 class QueryEngineSettings(BaseModel):
     USE_QUERY_OPTIMIZER: bool = True
+    N_RESULTS: int = 5  # Per domain in "fixed" mode, across all domains in "adaptive" mode
+    RETRIEVAL_MODE: str = "fixed"  # Options: "fixed", "adaptive"
+    ADAPTIVE_INITIAL_FETCH: int = 2
+    ADAPTIVE_FETCH_GROWTH: int = 2
+    SINGLE_FLIGHT: bool = True  # Identical concurrent questions without history share one retrieval and generation
     USE_RESULT_RE_RANKER: bool = True
+    RE_RANKER_MODE: str = "distance"  # Options: "distance", "mmr"
+    MMR_LAMBDA: float = 0.5
+    MMR_TOP_K: int = 10
+    USE_CONTEXT_BUILDER: bool = False
+    CONTEXT_MAX_TOKENS: int = 1500
+    USE_CONTEXT_COMPRESSOR: bool = False
+    COMPRESSION_MAX_TOKENS: int = 750
+    COMPRESSION_RATIO: float = 0.5
+    SENTENCE_CACHE_SIZE: int = 10000
 
 class ChatModelSettings(BaseModel):
     PROVIDER: str = "oci"
@@ -30,6 +44,17 @@ class VectorStoreSettings(BaseModel):
         "domain_name1": "Chroma", 
         "domain_name2": "Oracle23ai"
     }
+    # Oracle23ai
+    ORACLE_WRITE_BATCH_SIZE: int = 1000  # Rows per executemany round trip
+    ORACLE_VECTOR_INDEX: str = "HNSW"  # Options: "HNSW", "IVF", "NONE"
+    ORACLE_DISTANCE: str = "COSINE"  # Options: "COSINE", "EUCLIDEAN", "DOT"
+    ORACLE_TARGET_ACCURACY: int = 95  # Percent, for the index and the approximate top-k queries
+
+class ConversationSettings(BaseModel):
+    MODE: str = "unbounded"  # Options: "unbounded", "windowed"
+    MAX_TOKENS: int = 2000
+    MAX_TURNS: int = 10
+    SUMMARY_MAX_TOKENS: int = 300
 
 class DocumentSettings(BaseModel):
     IMPLEMENTATION: str = "Python"
@@ -43,6 +68,7 @@ class PublicSettings(BaseModel):
     embedding_model: EmbeddingModelSettings = EmbeddingModelSettings()  # Added
     vector_store: VectorStoreSettings = VectorStoreSettings()  # Added
     document: DocumentSettings = DocumentSettings()  # Added
+    conversation: ConversationSettings = ConversationSettings()
 
     class Config:
         env_file = ".env"
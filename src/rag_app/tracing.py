@@ -0,0 +1,275 @@
+import contextvars
+import functools
+import json
+import logging
+import os
+import queue
+import random
+import threading
+import time
+from logging.handlers import QueueListener, RotatingFileHandler
+from typing import Any, Callable, Dict, List, Optional
+
+# Lightweight per-request tracing.
+#
+# A request starts a root span with start_trace(); code below it opens child spans with
+# start_span(), which picks up the parent from a context variable. The context follows
+# asyncio tasks automatically; use wrap() when handing work to a thread pool yourself
+# (asyncio.to_thread already copies the context). Spans that outlive the block that
+# created them, like an LLM stream consumed by the route, are ended explicitly.
+# When the root span ends the trace is offered to the sink, which keeps every slow or
+# failed trace and a random sample of the others (tail-based sampling) and writes them
+# as JSON lines to a rotating file from a background thread.
+
+logger = logging.getLogger(__name__)
+
+# Spans recorded per trace beyond this are counted but dropped (e.g. a large ingestion)
+MAX_SPANS_PER_TRACE = 2000
+
+_current_span: contextvars.ContextVar[Optional["Span"]] = contextvars.ContextVar("rag_current_span", default=None)
+
+def _new_id() -> str:
+    return f"{random.getrandbits(64):016x}"
+
+class _Trace:
+    __slots__ = ("trace_id", "spans", "dropped", "lock")
+
+    def __init__(self):
+        self.trace_id = f"{random.getrandbits(128):032x}"
+        self.spans: List[Dict[str, Any]] = []
+        self.dropped = 0
+        self.lock = threading.Lock()
+
+    def add(self, span: Dict[str, Any]) -> None:
+        with self.lock:
+            if len(self.spans) < MAX_SPANS_PER_TRACE:
+                self.spans.append(span)
+            else:
+                self.dropped += 1
+
+class Span:
+    """
+    A timed operation of a trace. Used as a context manager, the span becomes the
+    current span of the block and is ended on exit, recording the exception if any.
+    """
+    __slots__ = ("name", "trace", "span_id", "parent_id", "attributes", "start_time", "_start", "duration", "error", "_token")
+
+    def __init__(self, name: str, trace: _Trace, parent_id: Optional[str], attributes: Dict[str, Any]):
+        self.name = name
+        self.trace = trace
+        self.span_id = _new_id()
+        self.parent_id = parent_id
+        self.attributes = attributes
+        self.start_time = time.time()
+        self._start = time.perf_counter()
+        self.duration: Optional[float] = None
+        self.error: Optional[str] = None
+        self._token = None
+
+    @property
+    def trace_id(self) -> str:
+        return self.trace.trace_id
+
+    @property
+    def is_recording(self) -> bool:
+        return True
+
+    def set_attribute(self, key: str, value: Any) -> None:
+        self.attributes[key] = value
+
+    def set_attributes(self, **attributes: Any) -> None:
+        self.attributes.update(attributes)
+
+    def record_error(self, error: BaseException) -> None:
+        self.error = f"{type(error).__name__}: {error}"
+
+    def end(self) -> None:
+        if self.duration is not None:
+            return
+        self.duration = time.perf_counter() - self._start
+        self.trace.add(self._to_dict())
+        if self.parent_id is None and _sink is not None:
+            _sink.offer(self)
+
+    def _to_dict(self) -> Dict[str, Any]:
+        span = {
+            "span_id": self.span_id,
+            "parent_id": self.parent_id,
+            "name": self.name,
+            "start": self.start_time,
+            "duration_ms": round(self.duration * 1000, 3),
+            "attributes": self.attributes
+        }
+        if self.error:
+            span["error"] = self.error
+        return span
+
+    def __enter__(self) -> "Span":
+        self._token = _current_span.set(self)
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        if exc is not None:
+            self.record_error(exc)
+        self.end()
+        try:
+            _current_span.reset(self._token)
+        except ValueError:
+            # Exited from another context (e.g. a generator closed elsewhere)
+            pass
+
+class _NoopSpan:
+    """Returned when tracing is disabled or there is no active trace. Costs nothing."""
+    __slots__ = ()
+    trace_id = None
+    span_id = None
+    is_recording = False
+
+    def set_attribute(self, key: str, value: Any) -> None:
+        pass
+
+    def set_attributes(self, **attributes: Any) -> None:
+        pass
+
+    def record_error(self, error: BaseException) -> None:
+        pass
+
+    def end(self) -> None:
+        pass
+
+    def __enter__(self) -> "_NoopSpan":
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        pass
+
+NOOP_SPAN = _NoopSpan()
+
+class TraceSink:
+    """
+    Tail-sampled JSONL writer. A finished trace is kept if its root span took at least
+    slow_threshold_ms, failed, or is picked with probability sample_rate.
+    """
+
+    def __init__(self, path: str, max_bytes: int = 10_000_000, backup_count: int = 5,
+                 sample_rate: float = 0.01, slow_threshold_ms: float = 2000):
+        self.path = path
+        self.sample_rate = sample_rate
+        self.slow_threshold_ms = slow_threshold_ms
+        self.kept = 0
+        self.discarded = 0
+
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        handler = RotatingFileHandler(path, maxBytes=max_bytes, backupCount=backup_count, encoding="utf-8")
+        handler.setFormatter(logging.Formatter("%(message)s"))
+        # Serialization and file I/O run in the listener thread, not in the request
+        self._queue: "queue.Queue[logging.LogRecord]" = queue.Queue(maxsize=10000)
+        self._listener = QueueListener(self._queue, handler)
+        self._handler = handler
+        self._listener.start()
+
+    def offer(self, root: Span) -> None:
+        duration_ms = root.duration * 1000
+        failed = root.error is not None or any("error" in span for span in root.trace.spans)
+        if not (failed or duration_ms >= self.slow_threshold_ms or random.random() < self.sample_rate):
+            self.discarded += 1
+            return
+        self.kept += 1
+        # Enqueued directly (not through a QueueHandler) so the trace is serialized by the listener
+        record = logging.LogRecord("rag_app.traces", logging.INFO, __file__, 0, "%s", None, None)
+        record.args = (_TraceRecord(root, duration_ms, failed),)
+        try:
+            self._queue.put_nowait(record)
+        except queue.Full:
+            logger.warning("Trace sink queue is full, dropping trace")
+
+    def close(self) -> None:
+        self._listener.stop()
+        self._handler.close()
+
+class _TraceRecord:
+    # Formatted lazily by the listener thread
+    __slots__ = ("root", "duration_ms", "failed")
+
+    def __init__(self, root: Span, duration_ms: float, failed: bool):
+        self.root = root
+        self.duration_ms = duration_ms
+        self.failed = failed
+
+    def __str__(self) -> str:
+        trace = self.root.trace
+        with trace.lock:
+            spans = list(trace.spans)
+            dropped = trace.dropped
+        return json.dumps({
+            "trace_id": trace.trace_id,
+            "name": self.root.name,
+            "start": self.root.start_time,
+            "duration_ms": round(self.duration_ms, 3),
+            "error": self.failed,
+            "dropped_spans": dropped,
+            "spans": spans
+        }, default=str, ensure_ascii=False)
+
+_sink: Optional[TraceSink] = None
+
+def configure(enabled: bool, path: str, max_bytes: int = 10_000_000, backup_count: int = 5,
+              sample_rate: float = 0.01, slow_threshold_ms: float = 2000) -> None:
+    """Enable or disable tracing for the process."""
+    global _sink
+    if _sink is not None:
+        _sink.close()
+        _sink = None
+    if enabled:
+        _sink = TraceSink(path, max_bytes, backup_count, sample_rate, slow_threshold_ms)
+        logger.info(f"Tracing enabled: traces written to {path} (sample rate {sample_rate}, slow threshold {slow_threshold_ms} ms)")
+
+def is_enabled() -> bool:
+    return _sink is not None
+
+def start_trace(name: str, **attributes: Any):
+    """Create the root span of a new trace. It is not made current: see use_span()."""
+    if _sink is None:
+        return NOOP_SPAN
+    return Span(name, _Trace(), None, attributes)
+
+def start_span(name: str, parent=None, **attributes: Any):
+    """Create a child of parent, or of the current span. Without an active trace it does nothing."""
+    if parent is None:
+        parent = _current_span.get()
+    if parent is None or not parent.is_recording:
+        return NOOP_SPAN
+    return Span(name, parent.trace, parent.span_id, attributes)
+
+def current_span():
+    return _current_span.get() or NOOP_SPAN
+
+class use_span:
+    """Make an existing span current for the block without ending it."""
+    __slots__ = ("span", "_token")
+
+    def __init__(self, span):
+        self.span = span
+        self._token = None
+
+    def __enter__(self):
+        if self.span.is_recording:
+            self._token = _current_span.set(self.span)
+        return self.span
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        if self._token is not None:
+            _current_span.reset(self._token)
+
+def wrap(fn: Callable) -> Callable:
+    """Run fn, typically in another thread, within the trace context of the caller."""
+    if _current_span.get() is None:
+        return fn
+    context = contextvars.copy_context()
+
+    @functools.wraps(fn)
+    def wrapper(*args, **kwargs):
+        return context.copy().run(fn, *args, **kwargs)
+    return wrapper
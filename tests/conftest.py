@@ -0,0 +1,13 @@
+import os
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# The modules are imported both as rag_app.* and as src.rag_app.*
+for path in (ROOT, os.path.join(ROOT, "src")):
+    if path not in sys.path:
+        sys.path.insert(0, path)
+
+# Required by PrivateSettings, unused by the tests
+for name in ("DATABASE_URL", "OCI_API_KEY", "COHERE_API_KEY"):
+    os.environ.setdefault(name, "test")
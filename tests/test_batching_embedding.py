@@ -0,0 +1,83 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from benchmarks.fakes import FakeEmbeddingModel
+from src.rag_app.core.implementations.embedding_model.batching_embedding import BatchingEmbeddingModel
+
+class FailingEmbeddingModel(FakeEmbeddingModel):
+    def generate_embedding(self, chunks):
+        self.calls += 1
+        raise RuntimeError("provider unavailable")
+
+class GatedEmbeddingModel(FakeEmbeddingModel):
+    """Blocks the first call until released, so the next texts queue up behind it."""
+
+    def __init__(self):
+        super().__init__(dimension=8)
+        self.started = threading.Event()
+        self.release = threading.Event()
+        self.batches = []
+
+    def generate_embedding(self, chunks):
+        self.batches.append(chunks)
+        if len(self.batches) == 1:
+            self.started.set()
+            self.release.wait(5)
+        return super().generate_embedding(chunks)
+
+def embed_concurrently(model, texts):
+    with ThreadPoolExecutor(max_workers=len(texts)) as executor:
+        return list(executor.map(model.generate_embedding, texts))
+
+def test_concurrent_queries_share_one_call():
+    inner = FakeEmbeddingModel(dimension=8)
+    model = BatchingEmbeddingModel(inner, window_ms=200, max_batch_size=32)
+    texts = [f"question {i}" for i in range(8)]
+
+    embeddings = embed_concurrently(model, texts)
+
+    assert inner.calls == 1
+    assert embeddings == [inner._vector(text) for text in texts]
+
+def test_batches_respect_max_batch_size():
+    inner = GatedEmbeddingModel()
+    model = BatchingEmbeddingModel(inner, window_ms=0, max_batch_size=3)
+
+    with ThreadPoolExecutor(max_workers=8) as executor:
+        first = executor.submit(model.generate_embedding, "first")
+        assert inner.started.wait(5)
+        # Queued while the worker is busy with the first text
+        futures = [executor.submit(model.generate_embedding, f"question {i}") for i in range(7)]
+        while model._queue.qsize() < 7:
+            time.sleep(0.001)
+        inner.release.set()
+        embeddings = [future.result(5) for future in futures]
+
+    assert first.result() == inner._vector("first")
+    assert embeddings == [inner._vector(f"question {i}") for i in range(7)]
+    assert [len(batch) for batch in inner.batches] == [1, 3, 3, 1]
+
+def test_provider_error_reaches_every_caller():
+    inner = FailingEmbeddingModel(dimension=8)
+    model = BatchingEmbeddingModel(inner, window_ms=200)
+
+    with ThreadPoolExecutor(max_workers=4) as executor:
+        futures = [executor.submit(model.generate_embedding, f"question {i}") for i in range(4)]
+        for future in futures:
+            with pytest.raises(RuntimeError, match="provider unavailable"):
+                future.result(5)
+
+    assert inner.calls == 1
+
+def test_lists_skip_the_queue():
+    inner = FakeEmbeddingModel(dimension=8)
+    model = BatchingEmbeddingModel(inner, window_ms=10000)
+
+    embeddings = model.generate_embedding(["a", "b"])
+
+    assert embeddings == [inner._vector("a"), inner._vector("b")]
+    assert inner.calls == 1
+    assert model._worker is None
@@ -0,0 +1,41 @@
+from rag_app.core.interfaces.document_interface import Chunk
+from rag_app.core.implementations.domain_manager.chunk_archive import ChunkArchive
+
+def make_archive(tmp_path):
+    archive = ChunkArchive(str(tmp_path / "domain"), asynchronous=False)
+    archive.append([Chunk("d_1", "c1", "first", {"chunk_index": 0}), Chunk("d_1", "c2", "second", {"chunk_index": 1})])
+    return archive
+
+def test_get_returns_the_archived_records(tmp_path):
+    archive = make_archive(tmp_path)
+
+    assert len(archive) == 2
+    assert archive.get("c2") == {"chunk_id": "c2", "document_id": "d_1", "content": "second", "metadata": {"chunk_index": 1}}
+    assert archive.get("missing") is None
+
+    reopened = ChunkArchive(str(tmp_path / "domain"))
+    assert reopened.get("c1")["content"] == "first"
+
+def test_index_lines_cut_by_a_crash_are_ignored(tmp_path):
+    make_archive(tmp_path).close()
+    index_path = tmp_path / "domain.idx"
+    first_line = index_path.read_text().splitlines()[0]
+    for cut in ("c2\t0\t", "c2\t", "c2"):
+        index_path.write_text(first_line + "\n" + cut)
+
+        archive = ChunkArchive(str(tmp_path / "domain"))
+
+        assert len(archive) == 1
+        assert archive.get("c1")["content"] == "first"
+
+def test_corrupt_records_are_missing(tmp_path):
+    make_archive(tmp_path).close()
+    data_path = tmp_path / "domain.chunks"
+    data = bytearray(data_path.read_bytes())
+    data[:4] = b"\x00\x00\x00\x00"
+    data_path.write_bytes(bytes(data))
+
+    archive = ChunkArchive(str(tmp_path / "domain"))
+
+    assert archive.get("c1") is None
+    assert archive.get("c2")["content"] == "second"
@@ -0,0 +1,27 @@
+from benchmarks.fakes import FakeEmbeddingModel
+from src.rag_app.core.implementations.context_compressor.context_compressor import SentenceContextCompressor
+
+def passage(id, document):
+    return {"id": id, "document": document, "metadata": {}}
+
+def test_keeps_the_best_sentences_in_order():
+    model = FakeEmbeddingModel(dimension=16)
+    compressor = SentenceContextCompressor(model, max_tokens=10, ratio=1)
+    passages = [passage("a", "Paris is in France. Bananas are yellow."), passage("b", "Rust is a language.")]
+
+    compressed = compressor.compress(passages, "q", model._vector("Paris is in France."))
+
+    assert compressed[0]["id"] == "a"
+    assert compressed[0]["document"].startswith("Paris is in France.")
+    assert sum(compressor.token_counter(p["document"]) for p in compressed) <= 10
+
+def test_sentence_longer_than_the_budget_is_truncated():
+    model = FakeEmbeddingModel(dimension=16)
+    compressor = SentenceContextCompressor(model, max_tokens=50)
+    passages = [passage("a", "word " * 1000)]
+
+    compressed = compressor.compress(passages, "q", model._vector("word"))
+
+    assert [p["id"] for p in compressed] == ["a"]
+    assert compressed[0]["document"].startswith("word word")
+    assert 0 < compressor.token_counter(compressed[0]["document"]) <= 50
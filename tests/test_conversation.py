@@ -0,0 +1,35 @@
+from rag_app.core.implementations.conversation.conversation import WindowedConversation
+from rag_app.core.implementations.context_builder.token_counter import estimate_tokens
+
+def count_characters(text):
+    # A token per character, unlike the default estimate
+    return len(text)
+
+def fill(conversation, turns):
+    for turn in range(turns):
+        conversation.add_message("User", f"question {turn} " + "word " * 20)
+        conversation.add_message("Assistant", f"answer {turn} " + "word " * 20)
+
+def test_summary_is_capped_with_the_default_token_counter():
+    conversation = WindowedConversation(max_tokens=None, max_turns=1, summary_max_tokens=30)
+    fill(conversation, 10)
+
+    assert 0 < estimate_tokens(conversation.summary) <= 30
+    assert conversation.summary.startswith("...")
+    # The most recent evicted messages are kept
+    assert "answer 8" in conversation.summary
+
+def test_summary_is_capped_with_the_injected_token_counter():
+    conversation = WindowedConversation(max_tokens=None, max_turns=1, summary_max_tokens=30, token_counter=count_characters)
+    fill(conversation, 10)
+
+    assert 0 < count_characters(conversation.summary) <= 30
+    assert conversation.summary.endswith("word word")
+
+def test_window_keeps_the_last_turns():
+    conversation = WindowedConversation(max_tokens=None, max_turns=2)
+    fill(conversation, 5)
+
+    assert [message.content.split()[:2] for message in conversation.get_history()] == [
+        ["question", "3"], ["answer", "3"], ["question", "4"], ["answer", "4"]]
+    assert conversation.get_formatted_history().startswith("Summary of the earlier conversation: ")
@@ -0,0 +1,109 @@
+import asyncio
+import os
+import threading
+import time
+from rag_app.core.implementations.conversation.conversation import Conversation
+from rag_app.core.implementations.conversation.conversation_store import ConversationStore
+
+def history(conversation):
+    return [(message.role, message.content) for message in conversation.get_history()]
+
+def test_least_recently_used_sessions_are_spilled_and_restored(tmp_path):
+    async def scenario():
+        store = ConversationStore(Conversation, max_sessions=1, spill_directory=str(tmp_path))
+        (await store.get("a")).add_message("User", "hello")
+        await store.get("b")
+        assert len(store) == 1
+        return await store.get("a")
+
+    assert history(asyncio.run(scenario())) == [("User", "hello")]
+
+def test_held_sessions_are_not_evicted(tmp_path):
+    async def scenario():
+        store = ConversationStore(Conversation, max_sessions=1, spill_directory=str(tmp_path))
+        async with store.session("a") as conversation:
+            await store.get("b")
+            await store.get("c")
+            assert await store.get("a") is conversation
+            # Added after the other sessions were used, e.g. at the end of a streamed response
+            conversation.add_message("User", "hello")
+        # Released: now the least recently used
+        await store.get("b")
+        assert len(store) == 1
+        return await store.get("a")
+
+    assert history(asyncio.run(scenario())) == [("User", "hello")]
+
+def test_idle_time_starts_when_the_session_is_released():
+    now = [0.0]
+
+    async def scenario():
+        store = ConversationStore(Conversation, idle_ttl=10, clock=lambda: now[0])
+        async with store.session("a") as conversation:
+            now[0] = 100
+            await store.get("b")
+            conversation.add_message("User", "hello")
+        now[0] = 105
+        await store.get("b")
+        return await store.get("a")
+
+    assert history(asyncio.run(scenario())) == [("User", "hello")]
+
+def spilled_files(directory):
+    return sorted(path.name for path in directory.iterdir() if path.suffix == ".json")
+
+def test_clear_removes_the_spilled_sessions(tmp_path):
+    async def scenario():
+        store = ConversationStore(Conversation, max_sessions=1, spill_directory=str(tmp_path))
+        (await store.get("a")).add_message("User", "hello")
+        await store.get("b")
+        assert len(spilled_files(tmp_path)) == 1
+        await store.clear()
+        return await store.get("a")
+
+    assert history(asyncio.run(scenario())) == []
+    assert spilled_files(tmp_path) == []
+
+def test_spilled_sessions_expire(tmp_path):
+    now = [0.0]
+
+    async def scenario():
+        store = ConversationStore(Conversation, max_sessions=1, idle_ttl=10, spill_directory=str(tmp_path),
+                                  clock=lambda: now[0])
+        (await store.get("a")).add_message("User", "hello")
+        await store.get("b")
+        (path,) = tmp_path.glob("*.json")
+        os.utime(path, (time.time() - 60, time.time() - 60))
+        now[0] = 5
+        await store.get("b")
+        assert len(spilled_files(tmp_path)) == 1
+        # The next sweep deletes the file idle for longer than idle_ttl
+        now[0] = 11
+        await store.get("b")
+        await store._prune
+        return await store.get("a")
+
+    assert history(asyncio.run(scenario())) == []
+
+def test_disk_writes_do_not_block_the_other_sessions(tmp_path):
+    release = threading.Event()
+
+    class SlowStore(ConversationStore):
+        def _write_spilled(self, states):
+            release.wait(5)
+            super()._write_spilled(states)
+
+    async def scenario():
+        store = SlowStore(Conversation, max_sessions=1, spill_directory=str(tmp_path))
+        (await store.get("a")).add_message("User", "hello")
+        # Evicts "a", whose write waits for the release
+        spilling = asyncio.create_task(store.get("b"))
+        await asyncio.sleep(0.05)
+        assert not spilling.done()
+        # The lock is free: a session in memory is served meanwhile
+        await asyncio.wait_for(store.get("b"), 1)
+        release.set()
+        await spilling
+        return await store.get("a")
+
+    assert history(asyncio.run(scenario())) == [("User", "hello")]
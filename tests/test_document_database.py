@@ -0,0 +1,146 @@
+import os
+import sqlite3
+from benchmarks.fakes import FakeEmbeddingModel, FakeChatModel, InMemoryVectorStore
+from rag_app.core.interfaces.document_interface import Chunk
+from rag_app.core.implementations.document.document_database import DocumentDatabase, SQLiteConnections
+from rag_app.core.implementations.document.db_document import DBDocument
+from rag_app.core.implementations.document.document_factory import DocumentFactory
+from rag_app.core.implementations.domain.domain_factory import DomainFactory
+from rag_app.core.implementations.domain_manager.domain_manager import DomainManager
+from rag_app.core.implementations.chunk_strategy.fixed_size_strategy import FixedSizeChunkStrategy
+from rag_app.core.implementations.storage.file_storage import FileStorage
+
+def make_database(tmp_path, flush_rows=1000):
+    database = DocumentDatabase(SQLiteConnections(str(tmp_path / "documents.db")).acquire, "sqlite", flush_rows)
+    database.create_tables()
+    return database
+
+def stored_rows(tmp_path, sql):
+    with sqlite3.connect(str(tmp_path / "documents.db")) as connection:
+        return connection.execute(sql).fetchall()
+
+def test_writes_are_buffered_until_flush(tmp_path):
+    database = make_database(tmp_path)
+    document = DBDocument("d_1", "a.txt", "d", "a.txt", db_connection=database)
+    document.content = "first"
+    document.chunks = [Chunk("d_1", "d_1_chunk_0", "fi", {}), Chunk("d_1", "d_1_chunk_1", "rst", {})]
+
+    assert stored_rows(tmp_path, "SELECT id FROM documents") == []
+    # Reads see the pending writes
+    assert DBDocument("d_1", "a.txt", "d", "a.txt", db_connection=database).content == "first"
+
+    database.flush()
+
+    assert stored_rows(tmp_path, "SELECT id, name, content FROM documents") == [("d_1", "a.txt", "first")]
+    reloaded = DBDocument("d_1", "a.txt", "d", "a.txt", db_connection=database)
+    assert [chunk.chunk_id for chunk in reloaded.chunks] == ["d_1_chunk_0", "d_1_chunk_1"]
+    assert reloaded.chunks[0].metadata == {"document_name": "a.txt"}
+
+def test_flush_runs_after_flush_rows(tmp_path):
+    database = make_database(tmp_path, flush_rows=2)
+    DBDocument("d_1", "a.txt", "d", "a.txt", content="a", db_connection=database)
+    DBDocument("d_2", "b.txt", "d", "b.txt", content="b", db_connection=database)
+
+    assert len(stored_rows(tmp_path, "SELECT id FROM documents")) == 2
+
+def test_fields_are_cached(tmp_path):
+    database = make_database(tmp_path)
+    DBDocument("d_1", "a.txt", "d", "a.txt", content="first", db_connection=database)
+    database.flush()
+    document = DBDocument("d_1", "a.txt", "d", "a.txt", db_connection=database)
+    assert document.content == "first"
+
+    with sqlite3.connect(str(tmp_path / "documents.db")) as connection:
+        connection.execute("UPDATE documents SET content = 'changed'")
+
+    assert document.content == "first"
+    # Releasing the cached copy keeps the stored row
+    document.content = None
+    assert document.content == "changed"
+
+def test_rows_of_another_file_with_the_same_id_are_not_returned(tmp_path):
+    database = make_database(tmp_path)
+    document = DBDocument("d_1", "a.txt", "d", "a.txt", content="content of a", db_connection=database)
+    document.keywords = ["a"]
+    document.chunks = [Chunk("d_1", "d_1_chunk_0", "content of a", {})]
+    database.flush()
+
+    other = DBDocument("d_1", "b.txt", "d", "b.txt", db_connection=database)
+
+    assert other.content is None
+    assert other.keywords == []
+    assert other.chunks == []
+
+    other.content = "content of b"
+    database.flush()
+
+    assert stored_rows(tmp_path, "SELECT name, content FROM documents") == [("b.txt", "content of b")]
+    assert stored_rows(tmp_path, "SELECT * FROM document_keywords") == []
+    assert stored_rows(tmp_path, "SELECT * FROM document_chunks") == []
+
+class VectorStore(InMemoryVectorStore):
+    # DomainManager tests the store for truth, an empty InMemoryVectorStore has a length of 0
+    def __bool__(self):
+        return True
+
+class InMemoryVectorStoreFactory:
+    @staticmethod
+    def create_vector_store(store_type, collection_name, persist_directory=None, settings=None):
+        return VectorStore()
+
+class SharedVectorStoreFactory:
+    # One store kept across ingestions, like a persisted collection
+    def __init__(self):
+        self.store = VectorStore()
+
+    def create_vector_store(self, store_type, collection_name, persist_directory=None, settings=None):
+        return self.store
+
+def ingest(data, database, vector_store_factory=None):
+    domain_manager = DomainManager(
+        storage=FileStorage(str(data)),
+        chunk_strategy=FixedSizeChunkStrategy(chunk_size=100),
+        chat_model=FakeChatModel(),
+        domain_factory=DomainFactory(),
+        document_factory=DocumentFactory("OCI_DB", db_connection=database),
+        vector_stores_config={"DEFAULT_PROVIDER": "Python"},
+        embedding_model=FakeEmbeddingModel(),
+        vector_store_factory=vector_store_factory or InMemoryVectorStoreFactory()
+    )
+    domain_manager.apply_chunking_strategy()
+    return domain_manager
+
+def test_reingestion_reads_the_edited_files(tmp_path):
+    data = tmp_path / "data"
+    (data / "d").mkdir(parents=True)
+    path = data / "d" / "a.txt"
+    path.write_text("old " * 100)
+    database = make_database(tmp_path)
+    ingest(data, database)
+
+    path.write_text("new " * 10)
+    os.utime(path, ns=(0, 0))
+    domain_manager = ingest(data, database)
+
+    document = domain_manager.get_domain_document("d", "a.txt")
+    document.content = None
+    document.chunks = []
+    assert document.content == "new " * 10
+    assert len(document.chunks) == 1
+    assert stored_rows(tmp_path, "SELECT COUNT(*) FROM document_chunks") == [(1,)]
+
+def test_reingestion_drops_the_chunks_of_removed_files(tmp_path):
+    data = tmp_path / "data"
+    (data / "d").mkdir(parents=True)
+    (data / "d" / "a.txt").write_text("alpha " * 20)
+    (data / "d" / "b.txt").write_text("beta " * 20)
+    factory = SharedVectorStoreFactory()
+    database = make_database(tmp_path)
+    ingest(data, database, factory)
+
+    # b.txt now takes the id a.txt had, nothing stores the second id again
+    (data / "d" / "a.txt").unlink()
+    ingest(data, database, factory)
+
+    assert {metadata["document_name"] for metadata in factory.store._metadata} == {"b.txt"}
+    assert len({metadata["document_id"] for metadata in factory.store._metadata}) == 1
@@ -0,0 +1,28 @@
+import asyncio
+from rag_app.metrics import MetricsRegistry, QUERY_STAGE_SECONDS
+
+def test_histogram_exposition():
+    registry = MetricsRegistry()
+    histogram = registry.histogram("test_seconds", "Test durations", ["stage"], buckets=(0.1, 1.0))
+
+    histogram.observe(0.5, stage="retrieve")
+
+    assert registry.render().splitlines() == [
+        "# HELP test_seconds Test durations",
+        "# TYPE test_seconds histogram",
+        'test_seconds_bucket{stage="retrieve",le="0.1"} 0',
+        'test_seconds_bucket{stage="retrieve",le="1.0"} 1',
+        'test_seconds_bucket{stage="retrieve",le="+Inf"} 1',
+        'test_seconds_sum{stage="retrieve"} 0.5',
+        'test_seconds_count{stage="retrieve"} 1'
+    ]
+
+def test_observations_are_served_on_the_metrics_endpoint():
+    from api import routes
+
+    with QUERY_STAGE_SECONDS.time(stage="test_stage"):
+        pass
+    response = asyncio.run(routes.metrics())
+
+    assert response.media_type.startswith("text/plain; version=0.0.4")
+    assert 'rag_query_stage_seconds_count{stage="test_stage"} 1' in response.body.decode().splitlines()
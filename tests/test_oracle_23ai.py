@@ -0,0 +1,132 @@
+import array
+from src.rag_app.core.implementations.vector_store.oracle_23ai import (
+    Oracle23aiVectorStore, batches, create_table_sql, merge_sql, query_sql, table_name
+)
+
+class FakeCursor:
+    def __init__(self, connection):
+        self.connection = connection
+
+    def execute(self, statement, parameters=None, **kwargs):
+        self.connection.executed.append((statement, parameters or kwargs))
+
+    def executemany(self, statement, rows):
+        self.connection.executed_many.append((statement, list(rows)))
+
+    def setinputsizes(self, **kwargs):
+        pass
+
+    def fetchone(self):
+        return (1 if self.connection.table_exists else 0,)
+
+    def fetchall(self):
+        return self.connection.rows
+
+class FakeConnection:
+    def __init__(self, table_exists=True, rows=()):
+        self.table_exists = table_exists
+        self.rows = list(rows)
+        self.executed = []
+        self.executed_many = []
+        self.commits = 0
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        pass
+
+    def cursor(self):
+        return FakeCursor(self)
+
+    def commit(self):
+        self.commits += 1
+
+class FakePool:
+    def __init__(self, connection):
+        self.connection = connection
+
+    def acquire(self):
+        return self.connection
+
+def make_store(connection, **settings):
+    return Oracle23aiVectorStore("my-domain", settings={"ORACLE_WRITE_BATCH_SIZE": 2, **settings}, pool=FakePool(connection))
+
+def test_table_name_is_a_plain_identifier():
+    assert table_name("my-domain.v2") == "RAG_MY_DOMAIN_V2"
+
+def test_create_table_sql():
+    table, index = create_table_sql("RAG_D", 1024)
+
+    assert table.startswith("CREATE TABLE IF NOT EXISTS RAG_D (")
+    assert "embedding VECTOR(1024, FLOAT32)" in table
+    assert "id VARCHAR2(512) PRIMARY KEY" in table
+    assert index == "CREATE INDEX IF NOT EXISTS RAG_D_DOC_IDX ON RAG_D (document_id)"
+
+def test_merge_sql_updates_or_inserts_by_id():
+    statement = merge_sql("RAG_D")
+
+    assert statement.startswith("MERGE INTO RAG_D t USING (SELECT :id AS id FROM dual) s ON (t.id = s.id)")
+    assert "WHEN MATCHED THEN UPDATE SET" in statement
+    assert "WHEN NOT MATCHED THEN INSERT (id, document_id, content, metadata, embedding)" in statement
+
+def test_query_sql_is_an_approximate_search():
+    statement = query_sql("RAG_D", "COSINE", 90)
+
+    assert "VECTOR_DISTANCE(embedding, :query_vector, COSINE) AS distance FROM RAG_D" in statement
+    assert statement.endswith("FETCH APPROX FIRST :n_results ROWS ONLY WITH TARGET ACCURACY 90")
+    assert "distance, embedding" in query_sql("RAG_D", "COSINE", 90, include_embeddings=True)
+
+def test_batches():
+    assert list(batches([1, 2, 3, 4, 5], 2)) == [[1, 2], [3, 4], [5]]
+    assert list(batches([], 2)) == []
+
+def test_store_embeddings_sends_one_executemany_per_batch():
+    connection = FakeConnection()
+    store = make_store(connection)
+
+    store.store_embeddings(
+        embeddings=[[0.1, 0.2]] * 5,
+        metadata=[{"document_id": "d_0"}] * 5,
+        ids=[f"c{i}" for i in range(5)],
+        documents=["text"] * 5
+    )
+
+    assert [statement for statement, _ in connection.executed_many] == [merge_sql("RAG_MY_DOMAIN")] * 3
+    assert [len(rows) for _, rows in connection.executed_many] == [2, 2, 1]
+    row = connection.executed_many[0][1][0]
+    assert row["id"] == "c0" and row["document_id"] == "d_0"
+    assert row["embedding"] == array.array("f", [0.1, 0.2])
+    assert connection.commits == 1
+
+def test_store_embeddings_creates_the_missing_table():
+    connection = FakeConnection(table_exists=False)
+    store = make_store(connection)
+
+    store.store_embeddings(embeddings=[[0.1, 0.2, 0.3]], metadata=[{}], ids=["c0"], documents=["text"])
+
+    statements = [statement for statement, _ in connection.executed]
+    assert statements[1:] == create_table_sql("RAG_MY_DOMAIN", 3)
+    assert store._table_ready
+
+def test_delete_documents_sends_one_executemany_per_batch():
+    connection = FakeConnection()
+    store = make_store(connection)
+
+    store.delete_documents(["d_0", "d_1", "d_2"])
+
+    assert [rows for _, rows in connection.executed_many] == [
+        [{"document_id": "d_0"}, {"document_id": "d_1"}], [{"document_id": "d_2"}]
+    ]
+    assert connection.commits == 1
+
+def test_query_formats_the_rows():
+    connection = FakeConnection(rows=[("c0", "text", {"document_id": "d_0"}, 0.25)])
+    store = make_store(connection, ORACLE_TARGET_ACCURACY=80)
+
+    results = store.query([0.1, 0.2], n_results=3)
+
+    statement, parameters = connection.executed[-1]
+    assert statement == query_sql("RAG_MY_DOMAIN", "COSINE", 80)
+    assert parameters["n_results"] == 3
+    assert results == [{"id": "c0", "distance": 0.25, "metadata": {"document_id": "d_0"}, "document": "text"}]
@@ -0,0 +1,32 @@
+import os
+from concurrent.futures import ThreadPoolExecutor
+from rag_app import profiling
+
+def work():
+    return sum(i * i for i in range(1000))
+
+def test_disabled_profiling_does_nothing(tmp_path):
+    profiling.configure(False, str(tmp_path))
+
+    assert profiling.start_profile("1", "/ask", "request-1") is None
+    assert profiling.wrap(work) is work
+    assert os.listdir(tmp_path) == []
+
+def test_requested_profile_is_saved(tmp_path):
+    profiling.configure(True, str(tmp_path))
+    try:
+        assert profiling.start_profile("0", "/ask", "request-1") is None
+        profile = profiling.start_profile("1", "/ask", "request-1")
+        with ThreadPoolExecutor(max_workers=1) as executor:
+            executor.submit(profiling.wrap(work)).result()
+        path = profile.stop()
+        names = [entry["name"] for entry in profiling.get_profiler().list_profiles()]
+    finally:
+        profiling.configure(False, str(tmp_path))
+
+    assert path.endswith("_request-1.prof") and os.path.isfile(path)
+    assert sorted(names) == sorted([os.path.basename(path), os.path.basename(path)[:-len(".prof")] + ".txt"])
+    with open(path[:-len(".prof")] + ".txt", encoding="utf-8") as f:
+        summary = f.read()
+    assert summary.startswith("/ask - request request-1")
+    assert "1 worker thread profile(s) merged" in summary
@@ -0,0 +1,41 @@
+from types import SimpleNamespace
+from benchmarks.fakes import FakeEmbeddingModel, FakeChatModel, InMemoryVectorStore
+from rag_app.core.implementations.query_engine.query_engine import QueryEngine, MMR_CANDIDATE_FACTOR
+from src.rag_app.core.implementations.reranker.reranker import ResultReRanker
+
+def make_query_engine(re_ranker, n_results=3):
+    embedding_model = FakeEmbeddingModel(dimension=16)
+    vector_stores = {}
+    for domain in ("a", "b"):
+        store = InMemoryVectorStore()
+        texts = [f"{domain} text {i}" for i in range(20)]
+        store.store_embeddings(embedding_model.generate_embedding(texts), [{"document_id": domain} for _ in texts],
+                               [f"{domain}_{i}" for i in range(20)], texts)
+        vector_stores[domain] = store
+    return QueryEngine(
+        domain_manager=SimpleNamespace(vector_stores=vector_stores),
+        vector_stores=vector_stores,
+        embedding_model=embedding_model,
+        chat_model=FakeChatModel(),
+        chunk_strategy=None,
+        query_optimizer=None,
+        result_re_ranker=re_ranker,
+        n_results=n_results,
+        retrieval_mode="adaptive"
+    ), embedding_model.generate_embedding("question")
+
+def test_adaptive_retrieval_fetches_the_global_top_k():
+    query_engine, query_embedding = make_query_engine(ResultReRanker(mode="distance"))
+
+    results = query_engine._retrieve_adaptive(query_embedding, ["a", "b"], include_embeddings=False)
+
+    everything = query_engine._retrieve_fixed(query_embedding, ["a", "b"], include_embeddings=False)
+    assert [result["id"] for result in results] == [result["id"] for result in sorted(everything, key=lambda x: x["distance"])][:3]
+
+def test_adaptive_retrieval_fetches_candidates_for_mmr():
+    query_engine, query_embedding = make_query_engine(ResultReRanker(mode="mmr", top_k=4))
+
+    results = query_engine._retrieve_adaptive(query_embedding, ["a", "b"], include_embeddings=True)
+
+    assert len(results) == 4 * MMR_CANDIDATE_FACTOR
+    assert all("embedding" in result for result in results)
@@ -0,0 +1,35 @@
+from src.rag_app.core.implementations.reranker.reranker import ResultReRanker
+
+def make_result(id, distance, embedding=None):
+    result = {"id": id, "document": id, "distance": distance, "metadata": {}}
+    if embedding is not None:
+        result["embedding"] = embedding
+    return result
+
+def test_mmr_without_embeddings_ranks_by_relevance():
+    results = [make_result("a", 0.5), make_result("b", 0.1), make_result("c", 0.3)]
+
+    ranked = ResultReRanker(mode="mmr").re_rank(results, "q")
+
+    assert [result["id"] for result in ranked] == ["b", "c", "a"]
+    assert [result["rank"] for result in ranked] == [0, 1, 2]
+
+def test_mmr_single_result_without_embedding():
+    ranked = ResultReRanker(mode="mmr").re_rank([make_result("a", 0.1)], "q")
+
+    assert [result["id"] for result in ranked] == ["a"]
+    assert ranked[0]["rank"] == 0
+
+def test_mmr_with_some_embeddings_missing():
+    results = [
+        make_result("a", 0.1, [1.0, 0.0]),
+        make_result("b", 0.2, [1.0, 0.0]),
+        make_result("c", 0.3, [0.0, 1.0]),
+        make_result("d", 0.05)
+    ]
+
+    ranked = ResultReRanker(mode="mmr", lambda_mult=0.5, top_k=3).re_rank(results, "q")
+
+    # "d" competes by relevance alone: picked first, it does not penalize the others
+    assert [result["id"] for result in ranked] == ["d", "a", "c", "b"]
+    assert [result["rank"] for result in ranked] == [0, 1, 2, 3]
@@ -0,0 +1,72 @@
+import asyncio
+import os
+import time
+from benchmarks.fakes import FakeChatModel
+from rag_app.core.implementations.chat_model.response_cache import ResponseCache, CachedChatModel
+
+class Message:
+    def __init__(self, content):
+        self.content = content
+
+class MessageChatModel(FakeChatModel):
+    """Returns a message object, like the OCI chat model, when not streaming."""
+
+    async def chat(self, system_prompt, query, conversation=None, stream=False):
+        self.calls = getattr(self, "calls", 0) + 1
+        if stream:
+            return await super().chat(system_prompt, query, conversation, stream)
+        return Message(f"answer to {query}")
+
+def entry_files(directory):
+    return sorted(name for name in os.listdir(directory) if name.endswith(".json"))
+
+def test_entries_are_read_back_from_disk(tmp_path):
+    ResponseCache(directory=str(tmp_path)).put("k", ["a", "b"])
+
+    assert ResponseCache(directory=str(tmp_path)).get("k") == ["a", "b"]
+
+def test_disk_is_bounded_without_rescanning(tmp_path):
+    cache = ResponseCache(directory=str(tmp_path), max_disk_bytes=160)
+    for key in ("k1", "k2", "k3"):
+        cache.put(key, ["x" * 30])
+
+    assert entry_files(tmp_path) == ["k2.json", "k3.json"]
+    assert cache._disk_bytes == sum(os.path.getsize(tmp_path / name) for name in entry_files(tmp_path))
+
+    # A lower bound applies to the entries of the previous runs
+    ResponseCache(directory=str(tmp_path), max_disk_bytes=80)
+    assert entry_files(tmp_path) == ["k3.json"]
+
+def test_expired_entries_are_not_returned(tmp_path):
+    cache = ResponseCache(ttl=60)
+    cache.put("k", ["a"])
+    cache._memory["k"] = (time.time() - 120, ["a"])
+
+    assert cache.get("k") is None
+
+def test_non_streamed_responses_are_strings_on_hits_and_misses(tmp_path):
+    chat_model = MessageChatModel()
+    cached = CachedChatModel(chat_model, ResponseCache(directory=str(tmp_path)), {"TEMPERATURE": 0})
+
+    async def ask_twice():
+        return [await cached.chat("system", "question") for _ in range(2)]
+
+    assert asyncio.run(ask_twice()) == ["answer to question", "answer to question"]
+    assert chat_model.calls == 1
+
+def test_streamed_responses_are_replayed(tmp_path):
+    chat_model = MessageChatModel(tokens=5)
+    cached = CachedChatModel(chat_model, ResponseCache(directory=str(tmp_path)), {"TEMPERATURE": 0})
+
+    async def stream_twice():
+        responses = []
+        for _ in range(2):
+            responses.append([token async for token in await cached.chat("system", "question", stream=True)])
+        # The disk write is not awaited by the response
+        await asyncio.sleep(0.1)
+        return responses
+
+    first, second = asyncio.run(stream_twice())
+    assert first == second and len(first) == 5
+    assert chat_model.calls == 1
+    assert len(entry_files(tmp_path)) == 1
@@ -0,0 +1,92 @@
+import asyncio
+from rag_app.core.implementations.query_engine.single_flight import SingleFlight
+
+def producer(tokens, release=None, started=None, error=None):
+    """Streams the tokens, waiting for release before the first one."""
+    async def produce(stream):
+        if started is not None:
+            started.set()
+        if release is not None:
+            await release.wait()
+        for token in tokens:
+            stream.append(token)
+            await asyncio.sleep(0)
+        if error is not None:
+            raise error
+        stream.finish([{"id": "source"}])
+    return produce
+
+async def consume(subscription):
+    return [chunk async for chunk in subscription]
+
+def test_every_subscriber_receives_the_whole_stream():
+    async def run():
+        flight = SingleFlight()
+        release = asyncio.Event()
+        produce = producer(["a", "b", "c"], release)
+        first, joined_first = flight.join("q", produce)
+        second, joined_second = flight.join("q", produce)
+        tasks = [asyncio.create_task(consume(first)), asyncio.create_task(consume(second))]
+        await asyncio.sleep(0)
+        release.set()
+        return await asyncio.gather(*tasks), (joined_first, joined_second), len(flight)
+
+    received, joined, in_flight = asyncio.run(run())
+
+    expected = [("a", None), ("b", None), ("c", None), ("", [{"id": "source"}])]
+    assert received == [expected, expected]
+    assert joined == (False, True)
+    assert in_flight == 0
+
+def test_cancelled_subscriber_leaves_the_others_streaming():
+    async def run():
+        flight = SingleFlight()
+        release = asyncio.Event()
+        produce = producer(["a", "b"], release)
+        first, _ = flight.join("q", produce)
+        second, _ = flight.join("q", produce)
+        leaving = asyncio.create_task(consume(first))
+        staying = asyncio.create_task(consume(second))
+        await asyncio.sleep(0)
+        leaving.cancel()
+        await asyncio.sleep(0)
+        release.set()
+        return await staying, leaving.cancelled()
+
+    received, cancelled = asyncio.run(run())
+
+    assert cancelled
+    assert [chunk for chunk, _ in received] == ["a", "b", ""]
+
+def test_last_subscriber_leaving_cancels_the_request():
+    async def run():
+        flight = SingleFlight()
+        started = asyncio.Event()
+        produce = producer(["a"], asyncio.Event(), started)
+        subscription, _ = flight.join("q", produce)
+        stream = flight._in_flight["q"]
+        consumer = asyncio.create_task(consume(subscription))
+        await started.wait()
+        consumer.cancel()
+        await asyncio.gather(consumer, return_exceptions=True)
+        await asyncio.gather(stream.task, return_exceptions=True)
+        return stream, len(flight)
+
+    stream, in_flight = asyncio.run(run())
+
+    assert stream.abandoned
+    assert stream.task.cancelled()
+    assert in_flight == 0
+
+def test_upstream_error_reaches_every_subscriber():
+    async def run():
+        flight = SingleFlight()
+        produce = producer(["a"], error=RuntimeError("model error"))
+        subscriptions = [flight.join("q", produce)[0] for _ in range(2)]
+        results = await asyncio.gather(*map(consume, subscriptions), return_exceptions=True)
+        return results, len(flight)
+
+    results, in_flight = asyncio.run(run())
+
+    assert all(isinstance(result, RuntimeError) and str(result) == "model error" for result in results)
+    assert in_flight == 0
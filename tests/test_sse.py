@@ -0,0 +1,60 @@
+import asyncio
+import time
+import pytest
+from api.sse import coalesce
+
+async def tokens(schedule):
+    """Yield each token after its delay in seconds."""
+    for delay, token in schedule:
+        await asyncio.sleep(delay)
+        yield token
+
+async def collect(chunks):
+    start = time.monotonic()
+    return [(round(time.monotonic() - start, 2), chunk) async for chunk in chunks]
+
+def test_zero_interval_passes_every_chunk_through():
+    received = asyncio.run(collect(coalesce(tokens([(0, "a"), (0, "b")]), 0)))
+
+    assert [chunk for _, chunk in received] == ["a", "b"]
+
+def test_chunks_within_the_interval_are_grouped():
+    received = asyncio.run(collect(coalesce(tokens([(0.2, "a"), (0, "b"), (0, "c"), (0.2, "d")]), 0.1)))
+
+    assert [chunk for _, chunk in received] == ["a", "bc", "d"]
+
+def test_buffer_is_flushed_when_the_model_stalls():
+    received = asyncio.run(collect(coalesce(tokens([(0.2, "a"), (0, "b"), (1.0, "c")]), 0.1)))
+
+    assert [chunk for _, chunk in received] == ["a", "b", "c"]
+    # "b" is sent once the interval has elapsed, not with "c"
+    assert received[1][0] < 0.5
+
+def test_errors_of_the_stream_are_raised():
+    async def failing():
+        yield "a"
+        raise RuntimeError("model error")
+
+    with pytest.raises(RuntimeError, match="model error"):
+        asyncio.run(collect(coalesce(failing(), 0.1)))
+
+def test_closing_stops_reading_the_stream():
+    closed = []
+
+    async def endless():
+        try:
+            while True:
+                await asyncio.sleep(0.01)
+                yield "a"
+        finally:
+            closed.append(True)
+
+    async def read_one():
+        chunks = coalesce(endless(), 0.05)
+        first = await chunks.__anext__()
+        await chunks.aclose()
+        await asyncio.sleep(0.05)
+        return first
+
+    assert asyncio.run(read_one())
+    assert closed == [True]
@@ -0,0 +1,55 @@
+import asyncio
+import json
+from rag_app import tracing
+
+def read_traces(path):
+    return [json.loads(line) for line in path.read_text().splitlines()]
+
+def test_nested_spans_keep_their_parent_across_threads(tmp_path):
+    def retrieve():
+        with tracing.start_span("retrieve") as span:
+            return span.span_id
+
+    async def request():
+        root = tracing.start_trace("request")
+        with tracing.use_span(root):
+            with tracing.start_span("prepare") as prepare:
+                retrieve_id = await asyncio.to_thread(retrieve)
+        root.end()
+        return root, prepare, retrieve_id
+
+    path = tmp_path / "traces.jsonl"
+    tracing.configure(True, str(path), sample_rate=1.0)
+    try:
+        root, prepare, retrieve_id = asyncio.run(request())
+    finally:
+        # Stops the writer thread once the queued traces are written
+        tracing.configure(False, str(path))
+
+    (trace,) = read_traces(path)
+    parents = {span["span_id"]: span["parent_id"] for span in trace["spans"]}
+    assert trace["trace_id"] == root.trace_id
+    assert parents == {root.span_id: None, prepare.span_id: root.span_id, retrieve_id: prepare.span_id}
+
+def test_only_sampled_traces_are_written(tmp_path):
+    path = tmp_path / "traces.jsonl"
+    tracing.configure(True, str(path), sample_rate=0.0, slow_threshold_ms=60000)
+    try:
+        fast = tracing.start_trace("fast")
+        fast.end()
+        failed = tracing.start_trace("failed")
+        failed.record_error(RuntimeError("model error"))
+        failed.end()
+    finally:
+        tracing.configure(False, str(path))
+
+    (trace,) = read_traces(path)
+    assert trace["name"] == "failed"
+    assert trace["error"] is True
+    assert trace["spans"][0]["error"] == "RuntimeError: model error"
+
+def test_spans_do_nothing_without_tracing():
+    tracing.configure(False, "")
+
+    assert tracing.start_trace("request") is tracing.NOOP_SPAN
+    assert tracing.start_span("child") is tracing.NOOP_SPAN